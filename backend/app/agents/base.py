@@ -1,6 +1,5 @@
-from datetime import datetime
 from sqlalchemy.orm import Session
-from ..models import AgentLog
+from ..log_sink import log_sink
 
 class BaseAgent:
     def __init__(self, name: str, db: Session):
@@ -9,12 +8,4 @@ class BaseAgent:
 
     def log(self, message: str, level: str = "INFO"):
         """Log an action to the database for the UI stream."""
-        print(f"[{datetime.now().strftime('%H:%M:%S')}] {self.name}: {message}")
-        log_entry = AgentLog(
-            agent_name=self.name,
-            message=message,
-            level=level,
-            timestamp=datetime.utcnow()
-        )
-        self.db.add(log_entry)
-        self.db.commit()
+        log_sink.emit(self.name, message, level)
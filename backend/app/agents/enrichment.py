@@ -2,18 +2,30 @@ import os
 import json
 import google.generativeai as genai
 from .base import BaseAgent
+from ..tools.registry_client import AsyncRegistryClient
 from sqlalchemy.orm import Session
+from typing import Optional
 import asyncio
 
 class EnrichmentAgent(BaseAgent):
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, registry_client: Optional[AsyncRegistryClient] = None):
         super().__init__("Enrichment Agent", db)
         self.api_key = os.getenv("GEMINI_API_KEY")
         if self.api_key:
             genai.configure(api_key=self.api_key)
+        # Set (per job) to query the real CMS registry instead of simulating it
+        self.registry_client = registry_client
 
     async def enrich(self, extracted_data: dict) -> dict:
         npi = extracted_data.get("npi")
+
+        if self.registry_client and npi:
+            self.log(f"Querying CMS NPI Registry for NPI: {npi}")
+            registry_data = await self.registry_client.lookup(npi)
+            level = "SUCCESS" if registry_data.get("registry_found") else "WARN"
+            self.log(f"Registry Data Retrieved: {registry_data.get('provider_name') or registry_data.get('status')}", level)
+            return registry_data
+
         self.log(f"Querying CMS NPI Registry (Simulated via Gemini) for NPI: {npi}")
         
         if not self.api_key:
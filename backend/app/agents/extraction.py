@@ -12,6 +12,7 @@ import os
 import json
 import google.generativeai as genai
 from typing import Optional
+from ..tools.image_prep import IMAGE_PREP_ENABLED, prepare_image
 
 class ExtractionAgent(BaseAgent):
     def __init__(self, db: Session):
@@ -43,6 +44,16 @@ class ExtractionAgent(BaseAgent):
             elif filename.lower().endswith(".txt"):
                 mime_type = "text/plain"
 
+            # Downscale/recompress photos before sending them inline
+            if mime_type.startswith("image/") and IMAGE_PREP_ENABLED:
+                try:
+                    prepared, prepared_mime, stats = prepare_image(file_content)
+                    if prepared_mime:
+                        file_content, mime_type = prepared, prepared_mime
+                        self.log(f"Image prepared: {stats['original_bytes']} -> {stats['prepared_bytes']} bytes ({stats['bytes_saved']} saved)", "INFO")
+                except Exception as e:
+                    self.log(f"Image preprocessing failed, sending original: {e}", "WARN")
+
             # Create generation config
             model_name = "gemini-2.5-flash-lite" 
             generation_config = {
@@ -4,7 +4,9 @@ from .base import BaseAgent
 from .extraction import ExtractionAgent
 from .enrichment import EnrichmentAgent
 from .qa import QAAgent
-from ..models import Provider, Validation
+from ..models import Provider, Validation, SystemConfig
+from ..tools.registry_client import AsyncRegistryClient
+from ..log_sink import LogScope, log_sink
 
 class Orchestrator(BaseAgent):
     def __init__(self, db: Session):
@@ -14,6 +16,12 @@ class Orchestrator(BaseAgent):
         self.qa = QAAgent(db)
 
     async def run_validation(self, file_content: bytes, filename: str):
+        try:
+            return await self._run_validation(file_content, filename)
+        finally:
+            log_sink.flush()  # Buffered agent logs are visible as soon as the workflow ends
+
+    async def _run_validation(self, file_content: bytes, filename: str):
         self.log(f"Starting validation workflow for file: {filename}")
 
         # Step 1: Extraction
@@ -33,18 +41,31 @@ class Orchestrator(BaseAgent):
         
         self.log(f"Processing {len(extracted_data)} extracted entities...")
 
-        for i, item in enumerate(extracted_data):
-            # Step 2: Enrichment
-            self.log(f"[{i+1}/{len(extracted_data)}] Enriching and Validating: {item.get('full_name', 'Unknown')}")
-            
-            try:
-                registry_data = await self.enricher.enrich(item)
-                
-                # Step 3: QA / Validation
-                result = await self.qa.validate(item, registry_data)
-                results.append(result)
-            except Exception as e:
-                self.log(f"Error processing item {i+1}: {str(e)}", "ERROR")
+        config = self.db.query(SystemConfig).first()
+        live_registry = config.live_registry_enrichment if config else True
+
+        async with AsyncRegistryClient() as registry_client:
+            if live_registry:
+                # Warm the per-job client: all distinct NPIs are fetched concurrently, once each
+                self.enricher.registry_client = registry_client
+                await registry_client.lookup_many([item["npi"] for item in extracted_data if item.get("npi")])
+
+            for i, item in enumerate(extracted_data):
+                with LogScope() as scope:
+                    # Step 2: Enrichment
+                    self.log(f"[{i+1}/{len(extracted_data)}] Enriching and Validating: {item.get('full_name', 'Unknown')}")
+
+                    try:
+                        registry_data = await self.enricher.enrich(item)
+
+                        # Step 3: QA / Validation
+                        result = await self.qa.validate(item, registry_data)
+                        scope.link_validation(result.id)
+                        results.append(result)
+                    except Exception as e:
+                        self.log(f"Error processing item {i+1}: {str(e)}", "ERROR")
+
+            self.enricher.registry_client = None
 
         self.log(f"Workflow completed for {filename}. Processed {len(results)}/{len(extracted_data)} items.")
         return results
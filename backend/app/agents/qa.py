@@ -1,8 +1,9 @@
 from .base import BaseAgent
+from .scoring import score_provider
 from sqlalchemy.orm import Session
 from ..models import Validation, Provider
+from ..provider_stats import record_provider_change, snapshot
 from datetime import datetime
-import asyncio
 
 class QAAgent(BaseAgent):
     def __init__(self, db: Session):
@@ -10,42 +11,18 @@ class QAAgent(BaseAgent):
 
     async def validate(self, extracted: dict, registry: dict) -> Validation:
         self.log("Comparing Source vs. Registry...")
-        await asyncio.sleep(0.5)
 
-        discrepancies = []
-        score = 100.0
-
-        # Logic: Compare fields
-        # 1. Name
-        if extracted["full_name"].lower() != registry["full_name"].lower():
-             discrepancies.append("Name mismatch")
-             score -= 20
-        
-        # 2. Specialty (Fuzzy match logic simulation)
-        if extracted["specialty"].lower() not in registry["specialty"].lower():
-             discrepancies.append(f"Specialty mismatch: '{extracted['specialty']}' vs '{registry['specialty']}'")
-             score -= 10
-        elif extracted["specialty"] != registry["specialty"]:
-             # Partial match (e.g. Surgery vs General Surgery)
-             discrepancies.append("Specialty (Extracted is less specific)")
-             score -= 5
-
-        # 3. Address
-        if extracted["address"] != registry["address"]:
-             discrepancies.append("Address format/detail")
-             score -= 5 # Minor penalty for format
-
-        # 4. License
-        if extracted["license"] != registry["license"]:
-             discrepancies.append("License Number mismatch")
-             score -= 15
-
-        # Get Threshold from DB
+        # Get Threshold / matching mode from DB
         from ..models import SystemConfig
         config = self.db.query(SystemConfig).first()
-        threshold = config.confidence_threshold * 100 if config else 85.0
-        
-        status = "Validated" if score >= threshold else "Flagged"
+        threshold = config.confidence_threshold if config else 0.85
+        fuzzy = config.fuzzy_matching if config else True
+
+        # Penalty rules live in the shared deterministic scoring engine
+        result = score_provider(extracted, registry, threshold, fuzzy)
+        score = result["confidence_score"]
+        status = result["status"]
+        discrepancies = result["discrepancies"]
         
         self.log(f"Validation Complete. Score: {score}% ({status})", "SUCCESS" if status == "Validated" else "WARN")
 
@@ -61,6 +38,7 @@ class QAAgent(BaseAgent):
         )
         self.db.add(provider)
         self.db.flush() # get ID
+        record_provider_change(self.db, None, snapshot(provider))
 
         validation = Validation(
             provider_id=provider.id,
@@ -72,6 +50,8 @@ class QAAgent(BaseAgent):
             timestamp=datetime.utcnow()
         )
         self.db.add(validation)
+        self.db.flush()
+        provider.latest_validation_id = validation.id
         self.db.commit()
         
         return validation
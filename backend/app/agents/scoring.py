@@ -0,0 +1,217 @@
+"""
+Deterministic QA scoring engine.
+
+Applies the penalty rules from info/confidence_calculation.md locally instead of
+asking the LLM QA agent to do it:
+
+    Name mismatch               -20
+    License mismatch            -15
+    Specialty mismatch (major)  -10
+    Specialty mismatch (minor)   -5
+    Address difference           -5
+
+`score_batch` scores a whole list of (extracted, registry) pairs in one pass;
+string normalization is memoized so repeated registry values (group practices,
+re-uploads) are only normalized once. Output matches the crew QA JSON:
+{"confidence_score", "status", "discrepancies", "summary"}.
+"""
+
+import re
+from difflib import SequenceMatcher
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+PENALTIES = {
+    "name": 20,
+    "license": 15,
+    "specialty_major": 10,
+    "specialty_minor": 5,
+    "address": 5,
+}
+
+# Fuzzy thresholds on normalized SequenceMatcher ratio
+NAME_MATCH_RATIO = 0.85
+SPECIALTY_MATCH_RATIO = 0.9
+SPECIALTY_MINOR_RATIO = 0.6
+# Shortest license number (after dropping a state/type prefix) a fuzzy match may rely on
+MIN_LICENSE_CORE_LENGTH = 4
+
+_NAME_NOISE = {"dr", "mr", "mrs", "ms", "md", "do", "phd", "np", "pa", "rn", "dds", "dmd", "facs", "jr", "sr", "ii", "iii"}
+_ADDRESS_ABBREVIATIONS = {
+    "st": "street", "ave": "avenue", "av": "avenue", "rd": "road", "blvd": "boulevard", "dr": "drive",
+    "ln": "lane", "ct": "court", "pl": "place", "pkwy": "parkway", "hwy": "highway", "ste": "suite",
+    "apt": "apartment", "fl": "floor", "n": "north", "s": "south", "e": "east", "w": "west",
+}
+
+
+@lru_cache(maxsize=65536)
+def normalize(value: str) -> str:
+    """Lowercase, strip punctuation and collapse whitespace."""
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", value.lower()).split())
+
+
+@lru_cache(maxsize=65536)
+def _name_tokens(value: str) -> frozenset:
+    return frozenset(t for t in normalize(value).split() if t not in _NAME_NOISE and len(t) > 1)
+
+
+@lru_cache(maxsize=65536)
+def _name_initials(value: str) -> frozenset:
+    return frozenset(t for t in normalize(value).split() if len(t) == 1 and t.isalpha())
+
+
+@lru_cache(maxsize=65536)
+def _address_tokens(value: str) -> Tuple[str, ...]:
+    return tuple(_ADDRESS_ABBREVIATIONS.get(t, t) for t in normalize(value).split())
+
+
+def similarity(a: str, b: str) -> float:
+    """Normalized string similarity in [0, 1]."""
+    a, b = normalize(a), normalize(b)
+    if a == b:
+        return 1.0
+    return SequenceMatcher(None, a, b).ratio()
+
+
+def _text(value) -> str:
+    if value is None:
+        return ""
+    value = str(value).strip()
+    return "" if value.lower() in ("null", "none", "unknown", "n/a") else value
+
+
+def _discrepancy(field: str, penalty: int, extracted: str, registry: str, reason: str) -> dict:
+    return {"field": field, "penalty": penalty, "extracted": extracted, "registry": registry, "reason": reason}
+
+
+def _names_match(extracted: str, registry: str, fuzzy: bool) -> bool:
+    if not fuzzy:
+        return normalize(extracted) == normalize(registry)
+    a, b = _name_tokens(extracted), _name_tokens(registry)
+    if a and b and (a <= b or b <= a):
+        (shorter, shorter_name), (longer, _) = sorted(((a, extracted), (b, registry)), key=lambda side: len(side[0]))
+        # "Stephen Strange" vs "Stephen V. Strange" / "Strange, Stephen"
+        if len(shorter) >= 2:
+            return True
+        # "S. Strange" vs "Stephen Strange": last name plus a matching first initial
+        initials = _name_initials(shorter_name)
+        if any(token[0] in initials for token in longer - shorter):
+            return True
+    return similarity(" ".join(sorted(a)), " ".join(sorted(b))) >= NAME_MATCH_RATIO
+
+
+@lru_cache(maxsize=65536)
+def _license_core(value: str) -> str:
+    """License number without separators and a leading alphabetic state/type prefix."""
+    compact = normalize(value).replace(" ", "")
+    return re.sub(r"^[a-z]+", "", compact) or compact
+
+
+def _licenses_match(extracted: str, registry: str, fuzzy: bool) -> bool:
+    if not fuzzy:
+        return extracted.strip().upper() == registry.strip().upper()
+    if normalize(extracted).replace(" ", "") == normalize(registry).replace(" ", ""):
+        return True
+    # Registry numbers often omit the state prefix ("NY-123456" vs "123456"); the
+    # remaining numbers must be identical and long enough to mean something
+    a, b = _license_core(extracted), _license_core(registry)
+    return a == b and len(a) >= MIN_LICENSE_CORE_LENGTH
+
+
+def _specialty_penalty(extracted: str, registry: str, fuzzy: bool) -> Optional[str]:
+    """Return None (match), "specialty_minor" or "specialty_major"."""
+    a, b = normalize(extracted), normalize(registry)
+    if a == b:
+        return None
+    if a in b or b in a:
+        return "specialty_minor"
+    if not fuzzy:
+        return "specialty_major"
+    ratio = SequenceMatcher(None, a, b).ratio()
+    if ratio >= SPECIALTY_MATCH_RATIO:
+        return None
+    if ratio >= SPECIALTY_MINOR_RATIO or set(a.split()) & set(b.split()):
+        return "specialty_minor"
+    return "specialty_major"
+
+
+def _addresses_match(extracted: str, registry: str, fuzzy: bool) -> bool:
+    if not fuzzy:
+        return extracted.strip() == registry.strip()
+    a, b = _address_tokens(extracted), _address_tokens(registry)
+    # Registry addresses usually add a ZIP / second line the source omits
+    return a == b or set(a) <= set(b)
+
+
+def _score_one(extracted: dict, registry: dict, threshold_percent: float, fuzzy: bool) -> dict:
+    if not registry or registry.get("registry_found") is False or registry.get("error"):
+        return {
+            "confidence_score": 0,
+            "status": "Flagged",
+            "discrepancies": [_discrepancy("NPI Registry", 100, str(extracted.get("npi")), "Not Found",
+                                           "Provider not found in CMS NPI Registry.")],
+            "summary": "Automatic failure: Provider not found in registry.",
+        }
+
+    score = 100
+    discrepancies = []
+
+    # 1. Name
+    ext_name = _text(extracted.get("full_name"))
+    reg_name = _text(registry.get("provider_name") or registry.get("full_name"))
+    if ext_name and reg_name and not _names_match(ext_name, reg_name, fuzzy):
+        score -= PENALTIES["name"]
+        discrepancies.append(_discrepancy("full_name", PENALTIES["name"], ext_name, reg_name, "Name mismatch"))
+
+    # 2. License (only comparable when the registry reports one)
+    ext_license = _text(extracted.get("license"))
+    reg_license = _text(registry.get("license"))
+    if ext_license and reg_license and not _licenses_match(ext_license, reg_license, fuzzy):
+        score -= PENALTIES["license"]
+        discrepancies.append(_discrepancy("license", PENALTIES["license"], ext_license, reg_license, "License number mismatch"))
+
+    # 3. Specialty
+    ext_specialty = _text(extracted.get("specialty"))
+    reg_specialty = _text(registry.get("primary_specialty") or registry.get("specialty"))
+    if ext_specialty and reg_specialty:
+        kind = _specialty_penalty(ext_specialty, reg_specialty, fuzzy)
+        if kind:
+            reason = "Specialty mismatch" if kind == "specialty_major" else "Specialty differs (sub-specialty or wording)"
+            score -= PENALTIES[kind]
+            discrepancies.append(_discrepancy("specialty", PENALTIES[kind], ext_specialty, reg_specialty, reason))
+
+    # 4. Address
+    ext_address = _text(extracted.get("address"))
+    reg_address = _text(registry.get("address"))
+    if ext_address and reg_address and not _addresses_match(ext_address, reg_address, fuzzy):
+        score -= PENALTIES["address"]
+        discrepancies.append(_discrepancy("address", PENALTIES["address"], ext_address, reg_address, "Address format/detail differs"))
+
+    status = "Validated" if score >= threshold_percent else "Flagged"
+    if discrepancies:
+        summary = f"{len(discrepancies)} discrepanc{'y' if len(discrepancies) == 1 else 'ies'}: " + \
+            ", ".join(d["field"] for d in discrepancies) + "."
+    else:
+        summary = "Matched perfectly."
+    return {"confidence_score": score, "status": status, "discrepancies": discrepancies, "summary": summary}
+
+
+def score_batch(pairs: List[Tuple[dict, dict]], confidence_threshold: float = 0.78, fuzzy_matching: bool = True) -> List[dict]:
+    """
+    Score a batch of (extracted, registry) pairs.
+
+    Args:
+        pairs: List of (extracted provider, registry record) dicts
+        confidence_threshold: Minimum score (0-1) to be considered "Validated"
+        fuzzy_matching: Use normalized similarity instead of exact comparison
+
+    Returns:
+        One validation dict per pair, in input order
+    """
+    threshold_percent = confidence_threshold * 100
+    return [_score_one(extracted or {}, registry or {}, threshold_percent, fuzzy_matching) for extracted, registry in pairs]
+
+
+def score_provider(extracted: dict, registry: dict, confidence_threshold: float = 0.78, fuzzy_matching: bool = True) -> dict:
+    """Score a single provider. See `score_batch`."""
+    return score_batch([(extracted, registry)], confidence_threshold, fuzzy_matching)[0]
@@ -3,112 +3,513 @@ AVE Crew Orchestration using CrewAI
 
 This module defines the main Crew that coordinates all agents
 to run the validation workflow.
+
+Environment:
+    AVE_PERSIST_BATCH_SIZE   Finished providers saved per transaction (default 25)
+    AVE_PERSIST_MAX_SECONDS  Longest a finished provider waits for its chunk to fill (default 2)
 """
 
 import base64
 import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from contextvars import copy_context
 from typing import Optional
 from crewai import Crew, Process
 from sqlalchemy.orm import Session
 
-from .agents import extraction_agent, enrichment_agent, qa_agent
-from .tasks import create_extraction_task, create_enrichment_task, create_qa_task
-from ..models import Provider, Validation, AgentLog, SystemConfig, ValidationJob
+from .agents import get_qa_agent
+from .tasks import create_extraction_task, create_qa_task
+from ..log_sink import LogScope, log_sink
+from ..events import publish_job
+from ..job_state import job_states
+from ..provider_stats import record_provider_changes, snapshot
+from ..agents.scoring import score_provider
+from ..models import Provider, Validation, SystemConfig, ValidationJob
+from ..tools.registry import NPIRegistrySearchTool
+from ..tools.registry_client import prefetch_registry
+from ..tools.cancellation import JobCancelled
+from ..tools.rate_limit import CallCounter, get_rate_limiter, estimate_tokens, record_calls
+from ..tools.extraction import EXTRACTION_MODEL, FileExtractionTool
+from ..tools.direct_qa import run_direct_qa
+from ..tools.pdf_chunking import PDF_CHUNK_PAGES, count_pdf_pages, extract_pdf_chunked, parse_provider_json
+from ..tools.pdf_text import extract_pdf_text_layer
+from ..tools.image_prep import is_image_file, prepare_image_file
+from ..tools.roster_parser import is_structured_file, parse_roster, describe_mapping
+from ..tools.extraction_cache import file_sha256, cache_key, get_cached_extraction, store_extraction
 from datetime import datetime
+from sqlalchemy import bindparam, insert, update
+
+PERSIST_BATCH_SIZE = int(os.getenv("AVE_PERSIST_BATCH_SIZE", 25))  # Providers saved per transaction
+PERSIST_MAX_SECONDS = float(os.getenv("AVE_PERSIST_MAX_SECONDS", 2))  # Max wait before a partial chunk is saved
 
 
 def log_to_db(db: Session, agent_name: str, message: str, level: str = "INFO"):
-    """Log agent activity to database for UI streaming."""
-    print(f"[{datetime.now().strftime('%H:%M:%S')}] {agent_name}: {message}")
-    log_entry = AgentLog(
-        agent_name=agent_name,
-        message=message,
-        level=level,
-        timestamp=datetime.utcnow()
-    )
-    db.add(log_entry)
-    db.commit()
+    """
+    Log agent activity to database for UI streaming.
+
+    Entries are queued on the shared log sink and bulk-inserted shortly after
+    (see app/log_sink.py); `db` is kept for call-site compatibility and is not
+    committed here.
+    """
+    log_sink.emit(agent_name, message, level)
+
+
+class StageMetrics:
+    """
+    Wall time and LLM round-trips per pipeline stage for one job.
+
+    Stored on ValidationJob.stage_metrics so "crew" and "direct" runs of the
+    same file can be compared. QA time is summed over providers, so with
+    parallel workers it exceeds the wall time of the validation loop.
+    """
+
+    def __init__(self, pipeline_mode: str):
+        self.pipeline_mode = pipeline_mode
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float, llm_calls: int = 0):
+        with self._lock:
+            entry = self.stages.setdefault(stage, {"seconds": 0.0, "llm_calls": 0, "runs": 0})
+            entry["seconds"] += seconds
+            entry["llm_calls"] += llm_calls
+            entry["runs"] += 1
+
+    @contextmanager
+    def measure(self, stage: str):
+        """Time a block and count the Gemini requests made inside it."""
+        start = time.perf_counter()
+        with CallCounter() as calls:
+            try:
+                yield calls
+            finally:
+                self.add(stage, time.perf_counter() - start, calls.get("gemini"))
+
+    def as_dict(self) -> dict:
+        return {
+            "pipeline_mode": self.pipeline_mode,
+            "stages": {
+                name: {"seconds": round(v["seconds"], 3), "llm_calls": v["llm_calls"], "runs": v["runs"]}
+                for name, v in self.stages.items()
+            },
+        }
+
+    def summary(self) -> str:
+        return ", ".join(
+            f"{name} {v['seconds']:.1f}s / {v['llm_calls']} LLM calls" for name, v in self.stages.items()
+        )
+
+
+def crew_llm_requests(crew_output) -> int:
+    """LLM requests CrewAI made during a kickoff (its agent loop bypasses our limiter's counting)."""
+    usage = getattr(crew_output, "token_usage", None)
+    return getattr(usage, "successful_requests", 0) or 0
 
 
 def update_job_progress(db: Session, job_id: int, **kwargs):
-    """Update validation job progress."""
+    """Update validation job progress (in memory for jobs run by this process's worker, see app/job_state.py)."""
+    if job_states.update(job_id, **kwargs):
+        return
     job = db.query(ValidationJob).filter(ValidationJob.id == job_id).first()
     if job:
         for key, value in kwargs.items():
             setattr(job, key, value)
         db.commit()
+        publish_job(job)
 
 
 def is_job_cancelled(db: Session, job_id: int) -> bool:
     """Check if job has been cancelled."""
+    cancelled = job_states.is_cancelled(job_id)
+    if cancelled is not None:
+        return cancelled
     db.expire_all()  # Refresh from DB
     job = db.query(ValidationJob).filter(ValidationJob.id == job_id).first()
     return job and job.status == "cancelled"
 
 
-def run_validation_crew(file_content: bytes, filename: str, db: Session, job_id: int = None) -> list:
+def is_lookup_npi(npi) -> bool:
+    """True if the NPI is present and plausible enough to query the registry for."""
+    return bool(npi) and str(npi).lower() != "null" and len(str(npi)) >= 5
+
+
+def process_provider(provider_data: dict, index: int, total: int, confidence_threshold: float,
+                     qa_mode: str = "crew", fuzzy_matching: bool = True, prefetched_registry: dict = None,
+                     pipeline_mode: str = "crew", metrics: StageMetrics = None) -> tuple:
     """
-    Run the complete validation workflow using CrewAI.
-    
-    Args:
-        file_content: Raw bytes of the uploaded file
-        filename: Name of the uploaded file
-        db: Database session for logging and storage
-        job_id: ID of the ValidationJob for progress tracking
-        
+    Run registry enrichment and QA for a single extracted provider.
+
+    qa_mode "rules" scores locally with the deterministic engine in
+    app/agents/scoring.py; otherwise the LLM scores it, through the QA agent
+    (pipeline_mode "crew") or one structured-output request (pipeline_mode
+    "direct"). When `prefetched_registry` is given the registry lookup is skipped.
+
+    Safe to call from worker threads: logs go through the shared log sink and
+    QA uses its own copy of the agent. Nothing is persisted here.
+
     Returns:
-        List of validation results
+        Tuple of (provider_data, registry_data, validation_data)
     """
-    log_to_db(db, "System", f"Received file: {filename}. Initializing agents...")
-    log_to_db(db, "CrewAI Orchestrator", f"Starting validation workflow for: {filename}")
-    if job_id:
-        update_job_progress(db, job_id, current_step="extraction")
-    
-    # Get system configuration
-    config = db.query(SystemConfig).first()
-    extraction_mode = config.extraction_mode if config else "batch"
-    confidence_threshold = config.confidence_threshold if config else 0.78
+    db = None  # Logging is buffered by the log sink; no session needed here
+    provider_name = provider_data.get('full_name')
+    if not provider_name or provider_name.lower() in ['unknown', 'none', 'null', '']:
+         if provider_data.get('npi'):
+             provider_name = f"Unknown Provider (NPI: {provider_data.get('npi')})"
+         else:
+             provider_name = "Unknown Provider"
 
-    import tempfile
-    import os
-    import uuid
-    
-    # Create temp file with unique name to prevent collisions and file system issues
-    import re
-    clean_filename = re.sub(r'[^a-zA-Z0-9_.-]', '_', filename)
-    
-    temp_dir = tempfile.gettempdir()
-    unique_filename = f"{uuid.uuid4()}_{clean_filename}"
-    temp_file_path = os.path.join(temp_dir, unique_filename)
-    
-    with open(temp_file_path, "wb") as f:
-        f.write(file_content)
-        
-    file_path = temp_file_path
-    file_size = os.path.getsize(file_path)
-    log_to_db(db, "System", f"Saved temp file: {unique_filename} ({file_size} bytes)")
+    # Update provider_data so we use this name consistently
+    provider_data['full_name'] = provider_name
 
-    
-    # Check for cancellation
-    if job_id and is_job_cancelled(db, job_id):
-        log_to_db(db, "CrewAI Orchestrator", "Job cancelled by user.", "WARN")
+    log_to_db(db, "CrewAI Orchestrator", f"[{index+1}/{total}] Processing: {provider_name}")
+
+    # Determine data sources based on mode
+    registry_data = {}
+    validation_data = {}
+
+    npi = provider_data.get('npi')
+
+    # SKIP LOGIC: If NPI is missing or obviously fake, skip the lookup
+    if not is_lookup_npi(npi):
+         log_to_db(db, "System", f"Skipping registry lookup: NPI missing or invalid ({npi})")
+         registry_data = {"npi_number": npi, "registry_found": False, "status": "Not Found (No NPI)"}
+    elif prefetched_registry is not None:
+        # Already resolved by the batch prefetch (pooled, de-duplicated async lookups)
+        registry_data = prefetched_registry
+        log_to_db(db, "System", f"Registry lookup complete: {registry_data.get('status')}")
+    else:
+        # --- DIRECT TOOL CALL (No Agent) ---
+        # Agents can get stuck in loops. We use the tool directly for deterministic lookup.
+        log_to_db(db, "System", f"Looking up registry data for: {provider_name} (NPI: {npi})")
+
+        lookup_started = time.perf_counter()
+        try:
+            tool = NPIRegistrySearchTool()
+            registry_json = tool._run(npi)
+            registry_data = json.loads(registry_json)
+            log_to_db(db, "System", f"Registry lookup complete: {registry_data.get('status')}")
+        except Exception as e:
+            log_to_db(db, "System", f"Registry lookup failed: {e}", "ERROR")
+            registry_data = {"error": str(e), "registry_found": False}
+        if metrics:
+            metrics.add("enrichment", time.perf_counter() - lookup_started)
+
+    # --- REAL QA ---
+    # Short-circuit: If registry data is not found, we don't need the QA agent to tell us that.
+    # This prevents "hanging" or "hallucinating" on empty data.
+    if registry_data.get("registry_found") is False:
+         log_to_db(db, "System", f"Skipping QA Agent: Registry not found. Auto-flagging.")
+         validation_data = {
+            "confidence_score": 0,
+            "status": "Flagged",
+            "discrepancies": [{"field": "NPI Registry", "penalty": 100, "extracted": str(npi), "registry": "Not Found", "reason": "Provider not found in CMS NPI Registry."}],
+            "summary": "Automatic failure: Provider not found in registry."
+         }
+    elif qa_mode == "rules":
+        validation_data = score_provider(provider_data, registry_data, confidence_threshold, fuzzy_matching)
+        log_to_db(db, "QA Agent", f"Rule-based validation complete for: {provider_name} ({validation_data['confidence_score']}%)")
+    elif pipeline_mode == "direct":
+        log_to_db(db, "QA Agent", f"Validating (direct): {provider_name}")
+        with metrics.measure("qa") if metrics else CallCounter():
+            try:
+                validation_data = run_direct_qa(provider_data, registry_data, confidence_threshold)
+                log_to_db(db, "QA Agent", f"Validation complete for: {provider_name}")
+            except Exception as e:
+                log_to_db(db, "CrewAI Orchestrator", f"Failed to parse QA output: {str(e)}", "ERROR")
+                validation_data = {
+                    "confidence_score": 0,
+                    "status": "Flagged",
+                    "discrepancies": [{"field": "System Error", "penalty": 100, "extracted": "Invalid Format", "registry": "N/A", "reason": "AI validation response was not valid JSON."}],
+                    "summary": "Validation parsing failed due to invalid AI response."
+                }
+    else:
+        log_to_db(db, "QA Agent", f"Validating: {provider_name}")
+        # Each worker gets its own agent copy so concurrent crews don't share executor state
+        qa_task = create_qa_task(provider_data, registry_data, confidence_threshold, agent=get_qa_agent().copy())
+
+        qa_crew = Crew(
+            agents=[qa_task.agent],
+            tasks=[qa_task],
+            process=Process.sequential,
+            verbose=True
+        )
+
+        qa_started = time.perf_counter()
+        qa_requests = 0
+        try:
+            # Rate limited and retried on 429 so transient throttling doesn't fail the provider
+            qa_result = get_rate_limiter("gemini").call(
+                qa_crew.kickoff, estimated_tokens=estimate_tokens(qa_task.description) * 2, counted=False
+            )
+            qa_requests = crew_llm_requests(qa_result)
+            log_to_db(db, "QA Agent", f"Validation complete for: {provider_name}")
+
+            # Try to clean up markdown via regex first
+            qa_str = str(qa_result).strip()
+            # Look for JSON block
+            json_match = re.search(r'\{.*\}', qa_str, re.DOTALL)
+            if json_match:
+                qa_str = json_match.group(0)
+
+            validation_data = json.loads(qa_str)
+        except (json.JSONDecodeError, AttributeError, Exception) as e:
+            log_to_db(db, "CrewAI Orchestrator", f"Failed to parse QA output: {str(e)}", "ERROR")
+            validation_data = {
+                "confidence_score": 0,
+                "status": "Flagged",
+                "discrepancies": [{"field": "System Error", "penalty": 100, "extracted": "Invalid Format", "registry": "N/A", "reason": "AI validation response was not valid JSON."}],
+                "summary": "Validation parsing failed due to invalid AI response."
+            }
+        if metrics:
+            metrics.add("qa", time.perf_counter() - qa_started, qa_requests)
+
+    return provider_data, registry_data, validation_data
+
+
+def _dialect_insert(db: Session):
+    """INSERT construct with ON CONFLICT support for the session's dialect, or None."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert
+
+
+def _save_validation_results_per_row(db: Session, results: list) -> list:
+    """
+    save_validation_results for dialects without INSERT ... ON CONFLICT: one ORM
+    upsert per provider (existing row locked by NPI), still a single transaction.
+    """
+    now = datetime.utcnow()
+    saved, changes = [], []
+    for provider_data, registry_data, validation_data, scope in results:
+        npi_value = provider_data.get('npi')
+        npi = str(npi_value) if npi_value else None
+        provider = db.query(Provider).filter(Provider.npi == npi).with_for_update().first() if npi else None
+        before = snapshot(provider)
+        if provider is None:
+            provider = Provider(npi=npi)
+            db.add(provider)
+        # Ensure full_name is not None to avoid API crashes
+        provider.full_name = provider_data.get('full_name') or "Unknown"
+        provider.specialty = provider_data.get('specialty')
+        provider.address = provider_data.get('address')
+        provider.license = provider_data.get('license')
+        provider.status = validation_data.get('status', 'Flagged')
+        provider.confidence_score = validation_data.get('confidence_score', 0)
+        provider.last_updated = now
+        db.flush()
+
+        validation = Validation(
+            provider_id=provider.id,
+            job_id=scope.job_id if scope else None,
+            extracted_data=provider_data,
+            registry_data=registry_data,
+            discrepancies=validation_data.get('discrepancies', []),
+            confidence_score=validation_data.get('confidence_score', 0),
+            status=validation_data.get('status', 'Flagged'),
+            timestamp=now,
+        )
+        db.add(validation)
+        db.flush()
+        # Denormalized pointer read by GET /providers
+        provider.latest_validation_id = validation.id
+        changes.append((before, snapshot(provider)))
+        saved.append((provider.full_name, npi, before is not None, validation.id))
+
+    # Dashboard counters, same transaction
+    record_provider_changes(db, changes)
+    db.commit()
+
+    for (full_name, npi, updated, validation_id), (_, _, validation_data, scope) in zip(saved, results):
+        with scope or nullcontext():
+            if updated:
+                log_to_db(db, "CrewAI Orchestrator", f"Updated existing provider: {full_name} (NPI: {npi})")
+            else:
+                log_to_db(db, "CrewAI Orchestrator", f"Created new provider: {full_name}")
+            log_to_db(db, "CrewAI Orchestrator", f"Saved: {full_name} -> {validation_data.get('status')} ({validation_data.get('confidence_score')}%)")
+        if scope:
+            scope.link_validation(validation_id)
+    return [validation_id for _, _, _, validation_id in saved]
+
+
+def save_validation_results(db: Session, results: list) -> list:
+    """
+    Persist a chunk of finished providers in one transaction.
+
+    Providers with an NPI are written with INSERT ... ON CONFLICT (npi) (SQLite and
+    Postgres): DO NOTHING for the whole chunk, then DO UPDATE for the NPIs that
+    already existed. Workers saving the same NPI concurrently never trip the unique
+    constraint, and rows are sent in NPI order so concurrent chunks lock them in
+    the same order. Providers without an NPI are inserted.
+    Validations are bulk-inserted, latest_validation_id is set with one
+    executemany UPDATE and the dashboard counters get one delta. Other dialects
+    fall back to one ORM upsert per provider.
+
+    Args:
+        results: List of (provider_data, registry_data, validation_data, log_scope),
+            in the order they should be applied (a later row for the same NPI wins)
+
+    Returns:
+        Validation ids, in input order
+    """
+    if not results:
         return []
-        
+    dialect_insert = _dialect_insert(db)
+    if dialect_insert is None:
+        return _save_validation_results_per_row(db, results)
+    providers = Provider.__table__
+    validations = Validation.__table__
+    now = datetime.utcnow()
 
-    
-    # Step 1: Extraction (Always runs now)
+    rows = []
+    for provider_data, registry_data, validation_data, scope in results:
+        npi_value = provider_data.get('npi')
+        rows.append({
+            # Ensure full_name is not None to avoid API crashes
+            "full_name": provider_data.get('full_name') or "Unknown",
+            "npi": str(npi_value) if npi_value else None,
+            "specialty": provider_data.get('specialty'),
+            "address": provider_data.get('address'),
+            "license": provider_data.get('license'),
+            "status": validation_data.get('status', 'Flagged'),
+            "confidence_score": validation_data.get('confidence_score', 0),
+            "last_updated": now,
+        })
+
+    final_by_npi = {row["npi"]: row for row in rows if row["npi"]}
+    npis = sorted(final_by_npi)
+    provider_ids, existing = {}, {}
+    if npis:
+        # New NPIs first: the INSERT decides atomically which rows are new (and takes
+        # SQLite's write lock), so the counters never count one provider twice
+        inserted = dialect_insert(providers).values([final_by_npi[npi] for npi in npis])
+        inserted = inserted.on_conflict_do_nothing(index_elements=[providers.c.npi]).returning(providers.c.id, providers.c.npi)
+        provider_ids = {npi: provider_id for provider_id, npi in db.execute(inserted)}
+
+        conflicting = [npi for npi in npis if npi not in provider_ids]
+        if conflicting:
+            # Previous status/score of the existing rows, locked until commit
+            query = db.query(Provider.npi, Provider.status, Provider.confidence_score).filter(Provider.npi.in_(conflicting))
+            existing = {npi: (status, score) for npi, status, score in query.with_for_update()}
+            upsert = dialect_insert(providers).values([final_by_npi[npi] for npi in conflicting])
+            upsert = upsert.on_conflict_do_update(
+                index_elements=[providers.c.npi],
+                set_={column: upsert.excluded[column] for column in
+                      ("full_name", "specialty", "address", "license", "status", "confidence_score", "last_updated")},
+            ).returning(providers.c.id, providers.c.npi)
+            provider_ids.update({npi: provider_id for provider_id, npi in db.execute(upsert)})
+
+    anonymous = [row for row in rows if not row["npi"]]
+    anonymous_ids = iter(db.execute(
+        insert(providers).returning(providers.c.id, sort_by_parameter_order=True), anonymous
+    ).scalars().all() if anonymous else [])
+    row_provider_ids = [provider_ids[row["npi"]] if row["npi"] else next(anonymous_ids) for row in rows]
+
+    validation_ids = db.execute(
+        insert(validations).returning(validations.c.id, sort_by_parameter_order=True),
+        [
+            {
+                "provider_id": provider_id,
+                "job_id": scope.job_id if scope else None,
+                "extracted_data": provider_data,
+                "registry_data": registry_data,
+                "discrepancies": validation_data.get('discrepancies', []),
+                "confidence_score": validation_data.get('confidence_score', 0),
+                "status": validation_data.get('status', 'Flagged'),
+                "timestamp": now,
+            }
+            for provider_id, (provider_data, registry_data, validation_data, scope) in zip(row_provider_ids, results)
+        ],
+    ).scalars().all()
+
+    # Denormalized pointer read by GET /providers: the newest validation per provider
+    latest = dict(zip(row_provider_ids, validation_ids))
+    db.execute(
+        update(providers).where(providers.c.id == bindparam("pid")).values(latest_validation_id=bindparam("vid")),
+        [{"pid": provider_id, "vid": latest[provider_id]} for provider_id in sorted(latest)],
+    )
+
+    # Dashboard counters, same transaction
+    record_provider_changes(db, [(existing.get(npi), (final_by_npi[npi]["status"], final_by_npi[npi]["confidence_score"]))
+                                 for npi in npis] +
+                                [(None, (row["status"], row["confidence_score"])) for row in anonymous])
+    db.commit()
+
+    seen = set(existing)
+    for row, validation_id, (_, _, validation_data, scope) in zip(rows, validation_ids, results):
+        with scope or nullcontext():
+            if row["npi"] in seen:
+                log_to_db(db, "CrewAI Orchestrator", f"Updated existing provider: {row['full_name']} (NPI: {row['npi']})")
+            else:
+                log_to_db(db, "CrewAI Orchestrator", f"Created new provider: {row['full_name']}")
+            log_to_db(db, "CrewAI Orchestrator", f"Saved: {row['full_name']} -> {validation_data.get('status')} ({validation_data.get('confidence_score')}%)")
+        if row["npi"]:
+            seen.add(row["npi"])
+        if scope:
+            scope.link_validation(validation_id)
+    return validation_ids
+
+
+class ValidationWriter:
+    """
+    Collects finished providers and saves them with save_validation_results once
+    `batch_size` are waiting or the oldest has waited `max_delay` seconds.
+    """
+
+    def __init__(self, db: Session, batch_size: int = PERSIST_BATCH_SIZE, max_delay: float = PERSIST_MAX_SECONDS):
+        self.db = db
+        self.batch_size = max(1, batch_size)
+        self.max_delay = max_delay
+        self.pending = []
+        self.oldest = None
+        self.saved = 0
+
+    def add(self, provider_data: dict, registry_data: dict, validation_data: dict, scope: LogScope = None):
+        if not self.pending:
+            self.oldest = time.monotonic()
+        self.pending.append((provider_data, registry_data, validation_data, scope))
+        if len(self.pending) >= self.batch_size or time.monotonic() - self.oldest >= self.max_delay:
+            self.flush()
+
+    def flush(self):
+        batch, self.pending = self.pending, []
+        save_validation_results(self.db, batch)
+        self.saved += len(batch)
+
+
+def run_extraction(db: Session, file_path: str, filename: str, extraction_mode: str, job_id: int = None) -> Optional[list]:
+    """
+    Run the extraction crew on a file and parse its JSON output.
+
+    Returns:
+        List of extracted provider dicts, or None if extraction failed (job already updated)
+    """
     log_to_db(db, "Extraction Agent", f"Processing file: {filename}")
     extraction_task = create_extraction_task(file_path, filename, extraction_mode)
     
     extraction_crew = Crew(
-        agents=[extraction_agent],
+        agents=[extraction_task.agent],
         tasks=[extraction_task],
         process=Process.sequential,
         verbose=True
     )
     
     try:
-        extraction_result = extraction_crew.kickoff()
+        extraction_result = get_rate_limiter("gemini").call(
+            extraction_crew.kickoff, estimated_tokens=estimate_tokens(extraction_task.description), counted=False
+        )
+        # The tool's own Gemini request is counted by the limiter; add the agent's turns
+        record_calls("gemini", crew_llm_requests(extraction_result))
         log_to_db(db, "Extraction Agent", f"Extraction complete: {str(extraction_result)[:200]}...")
     except Exception as e:
         error_msg = f"Extraction failed: {str(e)}"
@@ -118,7 +519,7 @@ def run_validation_crew(file_content: bytes, filename: str, db: Session, job_id:
         
         if job_id:
             update_job_progress(db, job_id, status="error", current_step="failed")
-        return []
+        return None
     
     # Parse extraction result
     try:
@@ -136,165 +537,303 @@ def run_validation_crew(file_content: bytes, filename: str, db: Session, job_id:
         log_to_db(db, "CrewAI Orchestrator", f"Failed to parse extraction result: {e}", "ERROR")
         if job_id:
             update_job_progress(db, job_id, status="completed", current_step="error")
+        return None
+    return extracted_providers
+
+
+def run_direct_extraction(db: Session, file_path: str, filename: str, extraction_mode: str, job_id: int = None) -> Optional[list]:
+    """
+    Run FileExtractionTool without an agent wrapper and parse its JSON output.
+
+    Returns:
+        List of extracted provider dicts, or None if extraction failed (job already updated)
+    """
+    log_to_db(db, "Extraction Agent", f"Processing file (direct): {filename}")
+    result_str = FileExtractionTool()._run(file_path)
+    if result_str.startswith(("Error:", "Extraction Error:")):
+        log_to_db(db, "Extraction Agent", f"Extraction failed: {result_str}", "ERROR")
+        if "429" in result_str or "Quota exceeded" in result_str:
+             log_to_db(db, "System", "🚫 GEMINI API QUOTA EXCEEDED. Please try again later.", "ERROR")
+        if job_id:
+            update_job_progress(db, job_id, status="error", current_step="failed")
+        return None
+    log_to_db(db, "Extraction Agent", f"Extraction complete: {result_str[:200]}...")
+
+    try:
+        extracted_providers = parse_provider_json(result_str)
+    except ValueError as e:
+        log_to_db(db, "CrewAI Orchestrator", f"Failed to parse extraction result: {e}", "ERROR")
+        if job_id:
+            update_job_progress(db, job_id, status="completed", current_step="error")
+        return None
+    if extraction_mode == "single":
+        extracted_providers = extracted_providers[:1]
+    return extracted_providers
+
+
+def should_chunk_pdf(file_path: str) -> bool:
+    """True for PDFs long enough to be split into page-range chunks."""
+    if not file_path.lower().endswith(".pdf"):
+        return False
+    try:
+        return count_pdf_pages(file_path) > PDF_CHUNK_PAGES
+    except Exception as e:
+        print(f"Could not count PDF pages, extracting as a single document: {e}")
+        return False
+
+
+def log_extraction_progress(message: str):
+    """Progress callback for extraction helpers (safe to call from worker threads)."""
+    log_to_db(None, "Extraction Agent", message)
+
+
+def run_pdf_text_extraction(db: Session, file_path: str) -> Optional[list]:
+    """
+    Extract a digital PDF from its text layer (scanned pages still go through vision).
+
+    Returns None when the PDF has no usable text layer or local extraction fails,
+    in which case the caller falls back to sending the PDF to the multimodal model.
+    """
+    try:
+        return extract_pdf_text_layer(file_path, on_progress=log_extraction_progress)
+    except Exception as e:
+        log_to_db(db, "Extraction Agent", f"Text-layer extraction failed, falling back to vision: {e}", "WARN")
+        return None
+
+
+def run_image_preprocessing(db: Session, file_path: str, job_id: int = None) -> str:
+    """Downscale/recompress an uploaded image before extraction. Returns the path to extract from."""
+    try:
+        prepared_path, stats = prepare_image_file(file_path)
+    except Exception as e:
+        log_to_db(db, "Extraction Agent", f"Image preprocessing failed, sending original: {e}", "WARN")
+        return file_path
+    if prepared_path != file_path:
+        log_to_db(db, "Extraction Agent",
+                  f"Image prepared: {stats['original_size'][0]}x{stats['original_size'][1]} -> "
+                  f"{stats['prepared_size'][0]}x{stats['prepared_size'][1]}{' grayscale' if stats['grayscale'] else ''}, "
+                  f"{stats['original_bytes']} -> {stats['prepared_bytes']} bytes ({stats['bytes_saved']} saved)")
+        if job_id:
+            update_job_progress(db, job_id, image_bytes_saved=stats["bytes_saved"])
+    return prepared_path
+
+
+def run_chunked_pdf_extraction(db: Session, file_path: str, job_id: int = None) -> Optional[list]:
+    """Extract a large PDF by page-range chunks in parallel. Returns None on failure."""
+    try:
+        return extract_pdf_chunked(file_path, on_progress=log_extraction_progress)
+    except Exception as e:
+        log_to_db(db, "Extraction Agent", f"Extraction failed: {str(e)}", "ERROR")
+        if "429" in str(e) or "Quota exceeded" in str(e):
+             log_to_db(db, "System", "🚫 GEMINI API QUOTA EXCEEDED. Please try again later.", "ERROR")
+        if job_id:
+            update_job_progress(db, job_id, status="error", current_step="failed")
+        return None
+
+
+def extract_providers(db: Session, file_path: str, filename: str, extraction_mode: str,
+                      pipeline_mode: str = "crew", job_id: int = None) -> Optional[list]:
+    """
+    Extract providers from a stored upload, cheapest route first.
+
+    Structured rosters are parsed locally, then the extraction cache is checked;
+    on a miss, digital PDFs use their text layer, long PDFs are chunked, images
+    are downscaled and everything else goes to FileExtractionTool through the
+    extraction agent ("crew") or directly ("direct").
+
+    Returns:
+        List of provider dicts, or None if extraction failed (job already updated)
+    """
+    extract_file = run_direct_extraction if pipeline_mode == "direct" else run_extraction
+
+    # Step 1a: Structured rosters (CSV/TSV/XLSX) with recognised headers are parsed locally
+    extracted_providers = None
+    if is_structured_file(file_path):
+        try:
+            extracted_providers = parse_roster(file_path, extraction_mode)
+        except Exception as e:
+            log_to_db(db, "Extraction Agent", f"Structured roster parsing failed: {e}", "WARN")
+        if extracted_providers is not None:
+            log_to_db(db, "Extraction Agent", f"Structured roster parsed locally ({describe_mapping(file_path)}): {len(extracted_providers)} providers, LLM skipped", "SUCCESS")
+        else:
+            log_to_db(db, "Extraction Agent", "Roster layout not recognised, falling back to LLM extraction")
+
+    # Step 1b: LLM extraction (skipped when this exact file was already extracted with the same mode/model)
+    if extracted_providers is None:
+        file_hash = file_sha256(file_path)
+        extraction_key = cache_key(file_hash, extraction_mode, EXTRACTION_MODEL)
+        extracted_providers = get_cached_extraction(db, extraction_key)
+        if extracted_providers is not None:
+            log_to_db(db, "Extraction Agent", f"Extraction cache hit (sha256 {file_hash[:12]}): reusing {len(extracted_providers)} providers, Gemini skipped", "SUCCESS")
+        else:
+            if extraction_mode == "batch" and file_path.lower().endswith(".pdf"):
+                extracted_providers = run_pdf_text_extraction(db, file_path)
+            if extracted_providers is None:
+                if extraction_mode == "batch" and should_chunk_pdf(file_path):
+                    extracted_providers = run_chunked_pdf_extraction(db, file_path, job_id)
+                elif is_image_file(file_path):
+                    prepared_path = run_image_preprocessing(db, file_path, job_id)
+                    try:
+                        extracted_providers = extract_file(db, prepared_path, filename, extraction_mode, job_id)
+                    finally:
+                        if prepared_path != file_path:
+                            os.remove(prepared_path)
+                else:
+                    extracted_providers = extract_file(db, file_path, filename, extraction_mode, job_id)
+            if extracted_providers is None:
+                return None
+            if extracted_providers:
+                store_extraction(db, extraction_key, file_hash, extraction_mode, EXTRACTION_MODEL, extracted_providers)
+
+    return extracted_providers
+
+
+def run_validation_crew(file_path: str, filename: str, db: Session, job_id: int = None) -> list:
+    """
+    Run the complete validation workflow using CrewAI.
+    
+    Args:
+        file_path: Path of the stored upload (owned by the caller, not deleted here)
+        filename: Name of the uploaded file
+        db: Database session for logging and storage
+        job_id: ID of the ValidationJob for progress tracking
+        
+    Returns:
+        List of validation results
+    """
+    try:
+        return _run_validation_crew(file_path, filename, db, job_id)
+    except JobCancelled:
+        # Cancelled during extraction or the registry prefetch (see app/tools/cancellation.py)
+        log_to_db(db, "CrewAI Orchestrator", "Job cancelled by user. In-flight requests abandoned.", "WARN")
         return []
+
+
+def _run_validation_crew(file_path: str, filename: str, db: Session, job_id: int = None) -> list:
+    log_to_db(db, "System", f"Received file: {filename}. Initializing agents...")
+    log_to_db(db, "CrewAI Orchestrator", f"Starting validation workflow for: {filename}")
+    if job_id:
+        update_job_progress(db, job_id, current_step="extraction")
     
+    # Get system configuration
+    config = db.query(SystemConfig).first()
+    extraction_mode = config.extraction_mode if config else "batch"
+    confidence_threshold = config.confidence_threshold if config else 0.78
+    qa_mode = (config.qa_mode if config else None) or "crew"
+    pipeline_mode = (config.pipeline_mode if config else None) or "crew"
+    fuzzy_matching = config.fuzzy_matching if config and config.fuzzy_matching is not None else True
+
+    # The upload is already stored on disk (see app/worker.py, which also removes it
+    # once the job finishes); extraction helpers only ever read it by path.
+    file_size = os.path.getsize(file_path)
+    log_to_db(db, "System", f"Processing stored upload: {os.path.basename(file_path)} ({file_size} bytes)")
+
+    # Check for cancellation
+    if job_id and is_job_cancelled(db, job_id):
+        log_to_db(db, "CrewAI Orchestrator", "Job cancelled by user.", "WARN")
+        return []
+        
+
+    
+    # Step 1: Extraction
+    metrics = StageMetrics(pipeline_mode)
+    started = time.perf_counter()
+    with metrics.measure("extraction"):
+        extracted_providers = extract_providers(db, file_path, filename, extraction_mode, pipeline_mode, job_id)
+    if extracted_providers is None:
+        return []
+
     log_to_db(db, "CrewAI Orchestrator", f"Found {len(extracted_providers)} providers to validate")
     if job_id:
         update_job_progress(db, job_id, total_providers=len(extracted_providers), current_step="enrichment")
     
-    # Step 2 & 3: Process each provider
+    # Step 2 & 3: Process providers through a bounded worker pool.
+    # Lookups and QA overlap across providers; results are persisted in order.
+    concurrency = max(1, (config.validation_concurrency or 1) if config else 1)
+    total = len(extracted_providers)
+    if concurrency > 1:
+        log_to_db(db, "CrewAI Orchestrator", f"Validating with {concurrency} parallel workers")
+    if qa_mode == "rules":
+        log_to_db(db, "CrewAI Orchestrator", f"QA mode: rules (fuzzy matching {'on' if fuzzy_matching else 'off'})")
+    elif pipeline_mode == "direct":
+        log_to_db(db, "CrewAI Orchestrator", "Pipeline mode: direct (agent-free extraction and QA)")
+
+    # Resolve every distinct NPI of the batch up front over one pooled async client,
+    # so enrichment takes roughly as long as the slowest lookup rather than the sum.
+    lookup_npis = [str(p.get('npi')) for p in extracted_providers if is_lookup_npi(p.get('npi'))]
+    prefetched = {}
+    if lookup_npis:
+        try:
+            with metrics.measure("enrichment"):
+                prefetched = prefetch_registry(lookup_npis)
+            log_to_db(db, "System", f"Prefetched registry data for {len(prefetched)} unique NPIs ({len(lookup_npis)} providers)")
+        except Exception as e:
+            log_to_db(db, "System", f"Registry prefetch failed, falling back to per-provider lookups: {e}", "WARN")
+
     results = []
-    for i, provider_data in enumerate(extracted_providers):
-        # Check for cancellation before each provider
-        if job_id and is_job_cancelled(db, job_id):
-            log_to_db(db, "CrewAI Orchestrator", f"Job cancelled. Stopped at provider {i+1}.", "WARN")
-            return results
-        
-        provider_name = provider_data.get('full_name')
-        if not provider_name or provider_name.lower() in ['unknown', 'none', 'null', '']:
-             if provider_data.get('npi'):
-                 provider_name = f"Unknown Provider (NPI: {provider_data.get('npi')})"
-             else:
-                 provider_name = "Unknown Provider"
-        
-        # Update provider_data so we use this name consistently
-        provider_data['full_name'] = provider_name
+    pending = deque()
+    next_index = 0
+    cancelled = False
 
-        log_to_db(db, "CrewAI Orchestrator", f"[{i+1}/{len(extracted_providers)}] Processing: {provider_name}")
-        
-        # Determine data sources based on mode
-        registry_data = {}
-        validation_data = {}
+    # Finished providers are saved in chunks (one transaction each), in extraction order
+    writer = ValidationWriter(db)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        try:
+            while next_index < total or pending:
+                # Keep the pool full, checking for cancellation before each new provider
+                while next_index < total and len(pending) < concurrency and not cancelled:
+                    if job_id and is_job_cancelled(db, job_id):
+                        log_to_db(db, "CrewAI Orchestrator", f"Job cancelled. Stopped at provider {next_index+1}.", "WARN")
+                        cancelled = True
+                        break
+                    # Each provider's log lines are linked to its Validation once it is saved
+                    # copy_context carries the job's CancelToken into the worker thread
+                    scope = LogScope(job_id)
+                    future = executor.submit(
+                        copy_context().run, scope.run, process_provider, extracted_providers[next_index], next_index, total, confidence_threshold,
+                        qa_mode, fuzzy_matching, prefetched.get(str(extracted_providers[next_index].get('npi'))),
+                        pipeline_mode, metrics
+                    )
+                    pending.append((next_index, future, scope))
+                    next_index += 1
+
+                if not pending:
+                    break
+
+                # Persist strictly in extraction order
+                i, future, scope = pending.popleft()
+                try:
+                    provider_data, registry_data, validation_data = future.result()
+                except JobCancelled:
+                    # In-flight calls were abandoned; don't wait for the rest of the batch
+                    log_to_db(db, "CrewAI Orchestrator", f"Job cancelled. Stopped at provider {i+1}.", "WARN")
+                    cancelled = True
+                    for _, other, _ in pending:
+                        other.cancel()
+                    pending.clear()
+                    break
+                writer.add(provider_data, registry_data, validation_data, scope)
+                results.append(validation_data)
+
+                # Update progress
+                if job_id:
+                    update_job_progress(db, job_id, processed_providers=i+1, current_step="qa" if i < total-1 else "complete")
+        finally:
+            # Save what finished, also when the job was cancelled or failed part-way
+            writer.flush()
+
+    metrics.add("total", time.perf_counter() - started, sum(v["llm_calls"] for v in metrics.stages.values()))
+    if job_id:
+        update_job_progress(db, job_id, stage_metrics=metrics.as_dict())
+
+    if cancelled:
+        return results
 
-        npi = provider_data.get('npi')
-        
-        # SKIP LOGIC: If NPI is missing or obviously fake, skip the lookup
-        if not npi or npi.lower() == "null" or len(str(npi)) < 5:
-             log_to_db(db, "System", f"Skipping registry lookup: NPI missing or invalid ({npi})")
-             registry_data = {"npi_number": npi, "registry_found": False, "status": "Not Found (No NPI)"}
-        else:
-            # --- DIRECT TOOL CALL (No Agent) ---
-            # Agents can get stuck in loops. We use the tool directly for deterministic lookup.
-            log_to_db(db, "System", f"Looking up registry data for: {provider_name} (NPI: {npi})")
-            
-            try:
-                from ..tools.registry import NPIRegistrySearchTool
-                tool = NPIRegistrySearchTool()
-                registry_json = tool._run(npi)
-                registry_data = json.loads(registry_json)
-                log_to_db(db, "System", f"Registry lookup complete: {registry_data.get('status')}")
-            except Exception as e:
-                log_to_db(db, "System", f"Registry lookup failed: {e}", "ERROR")
-                registry_data = {"error": str(e), "registry_found": False}
-        
-        # --- REAL QA ---
-        # Short-circuit: If registry data is not found, we don't need the QA agent to tell us that.
-        # This prevents "hanging" or "hallucinating" on empty data.
-        if registry_data.get("registry_found") is False:
-             log_to_db(db, "System", f"Skipping QA Agent: Registry not found. Auto-flagging.")
-             validation_data = {
-                "confidence_score": 0,
-                "status": "Flagged",
-                "discrepancies": [{"field": "NPI Registry", "penalty": 100, "extracted": str(npi), "registry": "Not Found", "reason": "Provider not found in CMS NPI Registry."}],
-                "summary": "Automatic failure: Provider not found in registry."
-             }
-        else:
-            if job_id: update_job_progress(db, job_id, processed_providers=i+1, current_step="qa")
-            log_to_db(db, "QA Agent", f"Validating: {provider_name}")
-            qa_task = create_qa_task(provider_data, registry_data, confidence_threshold)
-            
-            qa_crew = Crew(
-                agents=[qa_agent],
-                tasks=[qa_task],
-                process=Process.sequential,
-                verbose=True
-            )
-            
-            try:
-                qa_result = qa_crew.kickoff()
-                log_to_db(db, "QA Agent", f"Validation complete for: {provider_name}")
-                
-                # Try to clean up markdown via regex first
-                import re
-                qa_str = str(qa_result).strip()
-                # Look for JSON block
-                json_match = re.search(r'\{.*\}', qa_str, re.DOTALL)
-                if json_match:
-                    qa_str = json_match.group(0)
-                
-                validation_data = json.loads(qa_str)
-            except (json.JSONDecodeError, AttributeError, Exception) as e:
-                log_to_db(db, "CrewAI Orchestrator", f"Failed to parse QA output: {str(e)}", "ERROR")
-                validation_data = {
-                    "confidence_score": 0,
-                    "status": "Flagged",
-                    "discrepancies": [{"field": "System Error", "penalty": 100, "extracted": "Invalid Format", "registry": "N/A", "reason": "AI validation response was not valid JSON."}],
-                    "summary": "Validation parsing failed due to invalid AI response."
-                }
-        
-        # Rate limit protection for batch mode
-        import time
-        time.sleep(1)
-        
-        # Save to database (Upsert Logic)
-        # Ensure full_name is not None to avoid API crashes
-        db_full_name = provider_data.get('full_name') or "Unknown"
-        npi_value = provider_data.get('npi')
-        
-        provider = None
-        if npi_value:
-            provider = db.query(Provider).filter(Provider.npi == npi_value).first()
-        
-        if provider:
-            # Update existing provider
-            provider.full_name = db_full_name
-            provider.specialty = provider_data.get('specialty')
-            provider.address = provider_data.get('address')
-            provider.license = provider_data.get('license')
-            provider.status = validation_data.get('status', 'Flagged')
-            provider.confidence_score = validation_data.get('confidence_score', 0)
-            provider.last_updated = datetime.utcnow()
-            log_to_db(db, "CrewAI Orchestrator", f"Updating existing provider: {db_full_name} (NPI: {npi_value})")
-        else:
-            # Create new provider
-            provider = Provider(
-                full_name=db_full_name,
-                npi=npi_value,
-                specialty=provider_data.get('specialty'),
-                address=provider_data.get('address'),
-                license=provider_data.get('license'),
-                status=validation_data.get('status', 'Flagged'),
-                confidence_score=validation_data.get('confidence_score', 0)
-            )
-            db.add(provider)
-            log_to_db(db, "CrewAI Orchestrator", f"Creating new provider: {db_full_name}")
-            
-        db.flush()  # Get the ID (or ensure update is staged)
-        
-        validation = Validation(
-            provider_id=provider.id,
-            extracted_data=provider_data,
-            registry_data=registry_data,
-            discrepancies=validation_data.get('discrepancies', []),
-            confidence_score=validation_data.get('confidence_score', 0),
-            status=validation_data.get('status', 'Flagged')
-        )
-        db.add(validation)
-        db.commit()
-        
-        provider.latest_validation_id = validation.id
-        db.commit()
-        
-        results.append(validation_data)
-        log_to_db(db, "CrewAI Orchestrator", f"Saved: {provider_name} -> {validation_data.get('status')} ({validation_data.get('confidence_score')}%)")
-        
-        # Update progress
-        if job_id:
-            update_job_progress(db, job_id, processed_providers=i+1, current_step="qa" if i < len(extracted_providers)-1 else "complete")
-    
     # Mark job as completed
     if job_id:
         update_job_progress(db, job_id, status="completed", current_step="complete")
     
     log_to_db(db, "CrewAI Orchestrator", f"Workflow complete. Processed {len(results)}/{len(extracted_providers)} providers.")
+    log_to_db(db, "CrewAI Orchestrator", f"Stage metrics ({pipeline_mode} mode): {metrics.summary()}")
     return results
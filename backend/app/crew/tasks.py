@@ -6,7 +6,8 @@ based on the input data at runtime.
 """
 
 from crewai import Task
-from .agents import extraction_agent, enrichment_agent, qa_agent
+from .agents import get_extraction_agent, get_enrichment_agent, get_qa_agent
+from ..tools.direct_qa import build_qa_prompt
 
 
 def create_extraction_task(file_path: str, filename: str, extraction_mode: str = "batch") -> Task:
@@ -50,7 +51,7 @@ IMPORTANT:
     "license": "NY-123456"
   }
 ]""",
-        agent=extraction_agent
+        agent=get_extraction_agent()
     )
 
 
@@ -89,11 +90,11 @@ CRITICAL RULES:
   "status": "Active",
   "registry_found": true
 }""",
-        agent=enrichment_agent
+        agent=get_enrichment_agent()
     )
 
 
-def create_qa_task(extracted_data: dict, registry_data: dict, confidence_threshold: float = 0.78) -> Task:
+def create_qa_task(extracted_data: dict, registry_data: dict, confidence_threshold: float = 0.78, agent=None) -> Task:
     """
     Create a QA task to validate extracted data against registry data.
     
@@ -101,34 +102,10 @@ def create_qa_task(extracted_data: dict, registry_data: dict, confidence_thresho
         extracted_data: Provider data from extraction
         registry_data: Official data from registry lookup
         confidence_threshold: Minimum score to be considered "Validated"
+        agent: Agent to bind the task to (defaults to the shared qa_agent)
     """
-    threshold_percent = int(confidence_threshold * 100)
-    
     return Task(
-        description=f"""Compare the extracted provider data with the official registry data.
-
-EXTRACTED DATA:
-{extracted_data}
-
-REGISTRY DATA:
-{registry_data}
-
-Calculate a confidence score using these rules:
-- CRITICAL: If 'registry_found' is false or REGISTRY DATA is empty/error -> Score = 0. Stop there.
-- Otherwise, start at 100% and apply penalties:
-- Name mismatch: -20 points
-- License mismatch: -15 points
-- Specialty mismatch (total): -10 points
-- Specialty mismatch (minor): -5 points
-- Address format difference: -5 points
-
-Threshold for "Validated" status: {threshold_percent}%
-Below threshold = "Flagged" status
-
-IMPORTANT OUTPUT RULES:
-- Return ONLY the raw JSON object.
-- Do NOT use markdown formatting (no ```json ... ```).
-- Do NOT include any introductory text.""",
+        description=build_qa_prompt(extracted_data, registry_data, confidence_threshold),
         expected_output=f"""A valid JSON object (no markdown) with validation results:
 {{
   "confidence_score": 85,
@@ -136,5 +113,5 @@ IMPORTANT OUTPUT RULES:
   "discrepancies": [],
   "summary": "Matched perfectly."
 }}""",
-        agent=qa_agent
+        agent=agent or get_qa_agent()
     )
@@ -1,4 +1,36 @@
-from sqlalchemy import create_engine
+"""
+Database engine and sessions.
+
+The engine is tuned for the DATABASE_URL dialect (DB_ENGINE_PROFILE=tuned):
+
+- SQLite: every connection switches to WAL, so API reads no longer wait for a
+  job's writes (and vice versa); busy_timeout makes a writer queue for the
+  write lock instead of failing with "database is locked"; synchronous=NORMAL
+  (durable with WAL), a larger page cache and memory-mapped reads.
+- Postgres: a sized QueuePool with pre-ping and recycling, so connections
+  dropped by the server or a proxy are replaced before use, and a per-session
+  statement_timeout. Read-only GET endpoints can be served by a replica
+  (DATABASE_READ_URL) through `get_read_db`.
+
+`python benchmark_db_concurrency.py` measures API read latency while a job writes.
+
+Environment:
+    DATABASE_URL             Primary database (default sqlite:///./ave.db)
+    DATABASE_READ_URL        Read replica for read-only GET endpoints (default: the primary)
+    DB_ENGINE_PROFILE        "tuned" (default) or "default" (driver defaults, for comparison)
+    SQLITE_BUSY_TIMEOUT_MS   How long a write waits for the lock (default 15000)
+    SQLITE_SYNCHRONOUS       PRAGMA synchronous (default NORMAL)
+    SQLITE_CACHE_SIZE_MB     Page cache per connection (default 64)
+    SQLITE_MMAP_SIZE_MB      Memory-mapped I/O size (default 256)
+    DB_POOL_SIZE             Pooled Postgres connections per engine (default 10)
+    DB_MAX_OVERFLOW          Extra connections under load (default 20)
+    DB_POOL_TIMEOUT          Seconds to wait for a free connection (default 30)
+    DB_POOL_RECYCLE_SECONDS  Replace connections older than this (default 1800)
+    DB_STATEMENT_TIMEOUT_MS  Postgres statement_timeout, 0 disables (default 30000)
+"""
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -9,16 +41,74 @@ load_dotenv()
 
 # Default to SQLite if not set, but support Postgres
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./ave.db")
+SQLALCHEMY_READ_DATABASE_URL = os.getenv("DATABASE_READ_URL")
+DB_ENGINE_PROFILE = os.getenv("DB_ENGINE_PROFILE", "tuned")
+
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 15000))
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_CACHE_SIZE_MB = int(os.getenv("SQLITE_CACHE_SIZE_MB", 64))
+SQLITE_MMAP_SIZE_MB = int(os.getenv("SQLITE_MMAP_SIZE_MB", 256))
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", 1800))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 30000))
+
+
+def _sqlite_engine(url: str) -> Engine:
+    engine = create_engine(url, connect_args={"check_same_thread": False})
+    if DB_ENGINE_PROFILE != "tuned":
+        return engine
+    in_memory = make_url(url).database in (None, "", ":memory:")
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if not in_memory:
+            # Persistent: WAL is a property of the database file
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_MB * 1024}")  # negative = KiB
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE_MB * 1024 * 1024}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+
+    return engine
 
-connect_args = {}
-if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
-    connect_args = {"check_same_thread": False}
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args=connect_args
-)
+def _server_engine(url: str) -> Engine:
+    if DB_ENGINE_PROFILE != "tuned":
+        return create_engine(url)
+    connect_args = {}
+    if DB_STATEMENT_TIMEOUT_MS and make_url(url).get_backend_name() == "postgresql":
+        connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+    return create_engine(
+        url,
+        connect_args=connect_args,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE_SECONDS,
+        pool_pre_ping=True,
+    )
+
+
+def make_engine(url: str) -> Engine:
+    """Engine for `url` with the profile of its dialect."""
+    if url.startswith("sqlite"):
+        return _sqlite_engine(url)
+    return _server_engine(url)
+
+
+engine = make_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Read-only GET endpoints; replica lag is acceptable there
+read_engine = make_engine(SQLALCHEMY_READ_DATABASE_URL) if SQLALCHEMY_READ_DATABASE_URL else engine
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
 Base = declarative_base()
 
 def get_db():
@@ -27,3 +117,11 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def get_read_db():
+    """Session on the read replica (the primary when DATABASE_READ_URL is unset)."""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
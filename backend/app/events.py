@@ -0,0 +1,220 @@
+"""
+In-process event broadcaster for the live dashboard stream (GET /api/events).
+
+Agent log rows (published by the log sink after each bulk insert) and
+ValidationJob progress snapshots (published wherever a job row changes) are fanned
+out to every connected Server-Sent Events subscriber. Viewers therefore add no
+database load and see updates as they happen instead of at poll intervals.
+
+Every event gets an increasing id and the last EVENT_BUFFER_SIZE events are kept,
+so a reconnecting client (EventSource sends Last-Event-ID automatically) is replayed
+what it missed. If the id is older than the buffer, e.g. after a server restart, the
+client gets a fresh snapshot instead.
+
+When jobs run in separate worker processes (AVE_EMBEDDED_WORKERS=0), their events
+never reach this process, so the API tails agent_logs / validation_jobs instead.
+That is one query per AVE_EVENT_TAIL_SECONDS per API process, and only while
+someone is subscribed.
+
+Environment:
+    AVE_EVENT_SOURCE        "local" (publish from in-process workers) or "db" (tail the tables);
+                            defaults to "db" when AVE_EMBEDDED_WORKERS=0, else "local"
+    AVE_EVENT_TAIL_SECONDS  Tail interval in "db" mode (default 1)
+    EVENT_BUFFER_SIZE       Events kept for resume (default 2000)
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Optional
+
+EVENT_SOURCE = os.getenv("AVE_EVENT_SOURCE") or ("db" if os.getenv("AVE_EMBEDDED_WORKERS", "1") == "0" else "local")
+EVENT_TAIL_SECONDS = float(os.getenv("AVE_EVENT_TAIL_SECONDS", 1))
+EVENT_BUFFER_SIZE = int(os.getenv("EVENT_BUFFER_SIZE", 2000))
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+ACTIVE_JOB_STATUSES = ("running", "queued")
+
+
+def job_snapshot(job) -> dict:
+    """Progress view of a ValidationJob (the /jobs/active response shape)."""
+    if job is None:
+        return {"active": False}
+    if job.status not in ACTIVE_JOB_STATUSES:
+        return {"active": False, "job_id": job.id, "status": job.status}
+    return {
+        "active": True,
+        "job_id": job.id,
+        "filename": job.filename,
+        "status": job.status,
+        "current_step": job.current_step,
+        "total_providers": job.total_providers,
+        "processed_providers": job.processed_providers,
+        "image_bytes_saved": job.image_bytes_saved or 0
+    }
+
+
+def log_event(row: dict) -> dict:
+    timestamp = row["timestamp"]
+    return {
+        "id": row["id"],
+        "agent_name": row["agent_name"],
+        "message": row["message"],
+        "level": row["level"],
+        "timestamp": timestamp.isoformat() if isinstance(timestamp, datetime) else timestamp,
+        "job_id": row.get("job_id"),
+        "validation_id": row.get("validation_id"),
+    }
+
+
+class Subscription:
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def push(self, event: Optional[dict]):
+        """Runs on the subscriber's loop. A consumer that falls too far behind is disconnected (it resumes by id)."""
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+
+class EventBroadcaster:
+    def __init__(self, buffer_size: int = EVENT_BUFFER_SIZE):
+        self._events = deque(maxlen=buffer_size)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        # Ids continue across restarts (ms clock), so a stale Last-Event-ID is never mistaken for a new one
+        self._last_id = int(time.time() * 1000)
+        self._tail_task = None
+
+    @property
+    def last_id(self) -> int:
+        return self._last_id
+
+    def publish(self, event_type: str, data: dict) -> int:
+        """Record an event and deliver it to every subscriber. Safe to call from any thread."""
+        with self._lock:
+            self._last_id += 1
+            event = {"id": self._last_id, "type": event_type, "data": data}
+            self._events.append(event)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.push, event)
+            except RuntimeError:
+                pass  # Loop already closed; the subscription is cleaned up by its stream
+        return event["id"]
+
+    def subscribe(self, last_event_id: Optional[int] = None):
+        """
+        Register a subscriber on the running loop.
+
+        Returns:
+            (subscription, replay) where replay lists the buffered events after
+            `last_event_id`, or is None when the client needs a full snapshot
+        """
+        subscription = Subscription(asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.add(subscription)
+            replay = None
+            if last_event_id is not None and self._events and last_event_id >= self._events[0]["id"] - 1:
+                replay = [e for e in self._events if e["id"] > last_event_id]
+            elif last_event_id is not None and not self._events and last_event_id == self._last_id:
+                replay = []
+        if EVENT_SOURCE == "db":
+            self._ensure_tail()
+        return subscription, replay
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    # ---- "db" mode: tail the tables on behalf of out-of-process workers ----
+
+    def _ensure_tail(self):
+        if self._tail_task is None or self._tail_task.done():
+            self._tail_task = asyncio.get_running_loop().create_task(self._tail())
+
+    async def _tail(self):
+        last_log_id = await asyncio.to_thread(_max_log_id)
+        last_job = None
+        while self.subscriber_count:
+            try:
+                rows, job = await asyncio.to_thread(_poll_tables, last_log_id)
+                for row in rows:
+                    self.publish("log", row)
+                    last_log_id = row["id"]
+                if job != last_job:
+                    self.publish("job", job)
+                    last_job = job
+            except Exception as e:
+                print(f"[Events] Tail failed: {e}")
+            await asyncio.sleep(EVENT_TAIL_SECONDS)
+
+
+def _max_log_id() -> int:
+    from sqlalchemy import func
+    from .database import SessionLocal
+    from .models import AgentLog
+    db = SessionLocal()
+    try:
+        return db.query(func.max(AgentLog.id)).scalar() or 0
+    finally:
+        db.close()
+
+
+def _poll_tables(after_log_id: int):
+    from .database import SessionLocal
+    from .models import AgentLog
+    db = SessionLocal()
+    try:
+        logs = db.query(AgentLog).filter(AgentLog.id > after_log_id).order_by(AgentLog.id).limit(500).all()
+        job = active_job(db)
+        return [log_event(vars(log)) for log in logs], job_snapshot(job)
+    finally:
+        db.close()
+
+
+def active_job(db):
+    from .models import ValidationJob
+    return (
+        db.query(ValidationJob)
+        .filter(ValidationJob.status.in_(ACTIVE_JOB_STATUSES))
+        .order_by(ValidationJob.created_at.desc())
+        .first()
+    )
+
+
+def publish_job(job):
+    """Publish a job's progress after its row was committed (no-op in "db" mode, where the tailer sees it)."""
+    if EVENT_SOURCE == "local" and job is not None:
+        broadcaster.publish("job", job_snapshot(job))
+
+
+def publish_logs(rows: list):
+    """Publish freshly inserted agent_logs rows (dicts with id) in order."""
+    if EVENT_SOURCE == "local":
+        for row in rows:
+            broadcaster.publish("log", log_event(row))
+
+
+def format_sse(event: dict) -> str:
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+
+
+broadcaster = EventBroadcaster()
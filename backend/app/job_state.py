@@ -0,0 +1,166 @@
+"""
+In-memory progress and cancellation for jobs running in this process.
+
+The pipeline reports progress several times per provider and used to check for
+cancellation before every provider, each a SELECT (+ COMMIT) on validation_jobs.
+Running jobs now keep that state here instead:
+
+- `update()` changes the in-memory JobState and publishes it to live
+  subscribers (app/events.py). The row is written by `persist()`, which the
+  worker's heartbeat thread calls every AVE_JOB_PROGRESS_PERSIST_SECONDS while
+  something changed. Status changes (completed, ...) are written immediately.
+- Each job has a CancelToken (app/tools/cancellation.py). `POST /jobs/{id}/cancel`
+  sets it directly when the job runs in the same process, which also stops the
+  job's in-flight Gemini / NPI calls. A job running in another process notices
+  the cancelled row on its next heartbeat poll.
+
+validation_jobs stays the source of truth for other processes and after restarts.
+
+Environment:
+    AVE_JOB_PROGRESS_PERSIST_SECONDS  Max age of progress in validation_jobs (default 2)
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from sqlalchemy import update
+
+from .database import SessionLocal
+from .events import publish_job
+from .models import ValidationJob
+from .tools.cancellation import CancelToken
+
+JOB_PROGRESS_PERSIST_SECONDS = float(os.getenv("AVE_JOB_PROGRESS_PERSIST_SECONDS", 2))
+
+# Fields kept in memory; mirrors the progress columns of ValidationJob
+PROGRESS_FIELDS = ("status", "current_step", "total_providers", "processed_providers",
+                   "image_bytes_saved", "stage_metrics")
+# Only written while the row is not cancelled
+CANCEL_GUARDED_FIELDS = ("status", "current_step")
+
+
+class JobState:
+    """Progress of one running job; has the ValidationJob attributes job_snapshot() reads."""
+
+    def __init__(self, job: ValidationJob):
+        self.id = job.id
+        self.filename = job.filename
+        for field in PROGRESS_FIELDS:
+            setattr(self, field, getattr(job, field))
+        self.token = CancelToken(job.id)
+        self.lock = threading.Lock()
+        self.dirty = {}
+        self.persisted_at = time.monotonic()
+
+
+class JobStateRegistry:
+    def __init__(self):
+        self._jobs: Dict[int, JobState] = {}
+        self._lock = threading.Lock()
+
+    def start(self, job: ValidationJob) -> JobState:
+        """Track a job this process has just claimed."""
+        state = JobState(job)
+        with self._lock:
+            self._jobs[job.id] = state
+        return state
+
+    def get(self, job_id: int) -> Optional[JobState]:
+        return self._jobs.get(job_id)
+
+    def finish(self, job_id: int):
+        """Write any remaining progress and stop tracking the job."""
+        self.persist(job_id)
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def update(self, job_id: int, **fields) -> bool:
+        """
+        Record progress for a tracked job.
+
+        Returns:
+            False if the job is not tracked here (the caller falls back to the row)
+        """
+        state = self.get(job_id)
+        if state is None:
+            return False
+        with state.lock:
+            if state.token.cancelled:
+                # A cancelled job stays cancelled
+                fields.pop("status", None)
+                fields.pop("current_step", None)
+            for key, value in fields.items():
+                setattr(state, key, value)
+                state.dirty[key] = value
+        publish_job(state)
+        if "status" in fields:
+            self.persist(job_id)
+        return True
+
+    def persist(self, job_id: int, min_age: float = 0.0):
+        """Write a tracked job's changed fields to validation_jobs (if older than `min_age` seconds)."""
+        state = self.get(job_id)
+        if state is None:
+            return
+        with state.lock:
+            if not state.dirty or time.monotonic() - state.persisted_at < min_age:
+                return
+            if state.token.cancelled:
+                self._drop_cancelled_fields(state)
+            fields, state.dirty = state.dirty, {}
+            state.persisted_at = time.monotonic()
+        if not fields:
+            return
+
+        # status and current_step never overwrite a cancellation made elsewhere (another process, the API)
+        guarded = {key: fields.pop(key) for key in CANCEL_GUARDED_FIELDS if key in fields}
+        db = SessionLocal()
+        try:
+            if fields:
+                db.execute(update(ValidationJob).where(ValidationJob.id == job_id).values(**fields))
+            if guarded:
+                changed = db.execute(
+                    update(ValidationJob)
+                    .where(ValidationJob.id == job_id, ValidationJob.status != "cancelled")
+                    .values(**guarded)
+                ).rowcount
+                if not changed:
+                    state.token.cancel()
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            with state.lock:
+                state.dirty = {**fields, **guarded, **state.dirty}
+                if state.token.cancelled:
+                    self._drop_cancelled_fields(state)
+            print(f"[JobState] Persisting job {job_id} failed, will retry: {e}")
+        finally:
+            db.close()
+
+    @staticmethod
+    def _drop_cancelled_fields(state: JobState):
+        # Caller holds state.lock; the cancel itself writes status/current_step
+        for key in CANCEL_GUARDED_FIELDS:
+            state.dirty.pop(key, None)
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancel a job running in this process. Returns False if it isn't running here."""
+        state = self.get(job_id)
+        if state is None:
+            return False
+        with state.lock:
+            state.status = "cancelled"
+            state.current_step = "cancelled"
+            state.token.cancel()
+            self._drop_cancelled_fields(state)
+        return True
+
+    def is_cancelled(self, job_id: int) -> Optional[bool]:
+        """In-memory cancellation check; None if the job is not tracked here."""
+        state = self.get(job_id)
+        return None if state is None else state.token.cancelled
+
+
+job_states = JobStateRegistry()
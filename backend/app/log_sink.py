@@ -0,0 +1,308 @@
+"""
+Buffered writer for the agent execution stream (agent_logs).
+
+A single provider produces 6-8 log lines; committing each one separately turns
+logging into thousands of tiny transactions per batch that compete with the
+real upserts (and take SQLite's write lock every time). Log calls instead
+append to an in-memory queue, and a background thread writes the queue in one
+bulk INSERT whenever LOG_FLUSH_SIZE entries are waiting or LOG_FLUSH_SECONDS
+have passed.
+
+Ordering: entries are written in the order they were emitted (one flusher,
+FIFO queue, executemany in queue order), and each keeps the timestamp taken
+when it was emitted, which is what the UI sorts by.
+
+Callers that need the rows visible now (job finished or failed, shutdown)
+call `log_sink.flush()`.
+
+Scoping: lines emitted inside a LogScope carry its job_id / validation_id. A
+provider's lines are logged before its Validation row exists, so the provider
+scope links them afterwards (`LogScope.link_validation`): lines still queued
+pick the id up at flush time, and lines already written are updated in the
+next flush's transaction.
+
+Retention: `prune_agent_logs` deletes rows older than AGENT_LOG_RETENTION_DAYS
+in id-ranged chunks, folding them into daily agent_log_rollups counts (and
+optionally appending them to JSONL files under AGENT_LOG_ARCHIVE_DIR) first.
+
+Environment:
+    LOG_FLUSH_SIZE                 Queued entries that trigger an immediate flush (default 100)
+    LOG_FLUSH_SECONDS              Max delay before queued entries are written (default 0.5)
+    LOG_BUFFER_MAX                 Entries kept while the database is unavailable (default 10000)
+    AGENT_LOG_RETENTION_DAYS       Age after which rows are pruned (default 30, 0 = keep forever)
+    AGENT_LOG_PRUNE_BATCH          Rows deleted per transaction (default 5000)
+    AGENT_LOG_PRUNE_INTERVAL_SECONDS  How often workers prune (default 3600)
+    AGENT_LOG_ARCHIVE_DIR          If set, pruned rows are appended here as JSONL before deletion
+    LOG_ECHO                       "1" also prints every entry to stdout, for debugging (default 0)
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, func, insert, update
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .events import publish_logs
+from .models import AgentLog, AgentLogRollup
+
+LOG_FLUSH_SIZE = int(os.getenv("LOG_FLUSH_SIZE", 100))
+LOG_FLUSH_SECONDS = float(os.getenv("LOG_FLUSH_SECONDS", 0.5))
+LOG_BUFFER_MAX = int(os.getenv("LOG_BUFFER_MAX", 10000))
+AGENT_LOG_RETENTION_DAYS = float(os.getenv("AGENT_LOG_RETENTION_DAYS", 30))
+AGENT_LOG_PRUNE_BATCH = int(os.getenv("AGENT_LOG_PRUNE_BATCH", 5000))
+AGENT_LOG_PRUNE_INTERVAL_SECONDS = float(os.getenv("AGENT_LOG_PRUNE_INTERVAL_SECONDS", 3600))
+AGENT_LOG_ARCHIVE_DIR = os.getenv("AGENT_LOG_ARCHIVE_DIR")
+LOG_ECHO = os.getenv("LOG_ECHO", "0") == "1"
+
+_log_scope: ContextVar = ContextVar("agent_log_scope", default=None)
+
+
+class LogScope:
+    """
+    Job / validation that log lines emitted while the scope is active belong to.
+
+    Use as a context manager (`with LogScope(job_id):`) or run a callable in it
+    (`executor.submit(scope.run, fn, ...)`), which also works from worker threads.
+    """
+
+    def __init__(self, job_id: Optional[int] = None, validation_id: Optional[int] = None):
+        self.job_id = job_id
+        self.validation_id = validation_id
+        self._unlinked_ids = []  # Rows written before validation_id was known
+        self._tokens = []
+
+    def __enter__(self):
+        self._tokens.append(_log_scope.set(self))
+        return self
+
+    def __exit__(self, *exc):
+        _log_scope.reset(self._tokens.pop())
+
+    def run(self, fn, *args, **kwargs):
+        with self:
+            return fn(*args, **kwargs)
+
+    def child(self) -> "LogScope":
+        """A fresh scope in the same job, e.g. for one provider."""
+        return LogScope(self.job_id)
+
+    def link_validation(self, validation_id: int):
+        """Attach every line of this scope, already written or not, to a Validation row."""
+        log_sink.link_validation(self, validation_id)
+
+
+def current_log_scope() -> Optional[LogScope]:
+    return _log_scope.get()
+
+
+class AgentLogSink:
+    def __init__(self, flush_size: int = LOG_FLUSH_SIZE, flush_seconds: float = LOG_FLUSH_SECONDS,
+                 buffer_max: int = LOG_BUFFER_MAX):
+        self.flush_size = max(1, flush_size)
+        self.flush_seconds = flush_seconds
+        self.buffer_max = buffer_max
+        self._queue = deque()
+        self._queue_lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # One writer at a time keeps batches in order
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._links = []  # (validation_id, [log ids]) applied with the next flush
+
+        # Counters for observability
+        self.written = 0
+        self.flushes = 0
+        self.dropped = 0
+
+    def emit(self, agent_name: str, message: str, level: str = "INFO"):
+        """Queue one log entry (timestamped now), tagged with the current LogScope."""
+        scope = _log_scope.get()
+        if LOG_ECHO:
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] {agent_name}: {message}")
+        with self._queue_lock:
+            # Timestamp under the lock so timestamp order always matches queue (insert) order
+            self._queue.append({"agent_name": agent_name, "message": message, "level": level,
+                                "timestamp": datetime.utcnow(), "scope": scope})
+            queued = len(self._queue)
+        self._ensure_thread()
+        if queued >= self.flush_size:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write everything queued so far, in order. Safe to call from any thread."""
+        with self._flush_lock:
+            with self._queue_lock:
+                batch = list(self._queue)
+                self._queue.clear()
+            links, self._links = self._links, []
+            if not batch and not links:
+                return
+            rows = [self._row(entry) for entry in batch]
+            db = SessionLocal()
+            try:
+                ids = []
+                if rows:
+                    ids = db.execute(
+                        insert(AgentLog).returning(AgentLog.id, sort_by_parameter_order=True), rows
+                    ).scalars().all()
+                for validation_id, log_ids in links:
+                    db.execute(update(AgentLog).where(AgentLog.id.in_(log_ids)).values(validation_id=validation_id))
+                db.commit()
+                self.written += len(batch)
+                self.flushes += 1
+                for entry, row, row_id in zip(batch, rows, ids):
+                    if entry["scope"] is not None and row["validation_id"] is None:
+                        entry["scope"]._unlinked_ids.append(row_id)
+                # Push the committed rows to live dashboard subscribers (app/events.py)
+                publish_logs([dict(row, id=row_id) for row, row_id in zip(rows, ids)])
+            except Exception as e:
+                db.rollback()
+                self._links = links + self._links
+                with self._queue_lock:
+                    # Put the batch back in front of newer entries; shed the oldest if the DB stays down
+                    self._queue.extendleft(reversed(batch))
+                    overflow = len(self._queue) - self.buffer_max
+                    for _ in range(max(0, overflow)):
+                        self._queue.popleft()
+                        self.dropped += 1
+                print(f"[LogSink] Flush of {len(batch)} log entries failed, will retry: {e}")
+            finally:
+                db.close()
+
+    def link_validation(self, scope: LogScope, validation_id: int):
+        """See LogScope.link_validation."""
+        # Under the flush lock no batch of this scope is half-written, so every row
+        # is either already in _unlinked_ids or will read validation_id at flush time
+        with self._flush_lock:
+            scope.validation_id = validation_id
+            log_ids, scope._unlinked_ids = scope._unlinked_ids, []
+            if log_ids:
+                self._links.append((validation_id, log_ids))
+
+    @staticmethod
+    def _row(entry: dict) -> dict:
+        scope = entry["scope"]
+        return {
+            "agent_name": entry["agent_name"],
+            "message": entry["message"],
+            "level": entry["level"],
+            "timestamp": entry["timestamp"],
+            "job_id": scope.job_id if scope else None,
+            "validation_id": scope.validation_id if scope else None,
+        }
+
+    def close(self):
+        """Stop the background thread after a final flush."""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=5)
+        self.flush()
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._queue_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._stop.clear()
+                    self._thread = threading.Thread(target=self._run, name="agent-log-sink", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(self.flush_seconds)
+            self._wakeup.clear()
+            self.flush()
+
+
+log_sink = AgentLogSink()
+atexit.register(log_sink.flush)
+
+
+def prune_agent_logs(db: Session, retention_days: float = AGENT_LOG_RETENTION_DAYS,
+                     batch_size: int = AGENT_LOG_PRUNE_BATCH) -> int:
+    """
+    Delete agent_logs rows older than `retention_days`, oldest first, in chunks.
+
+    Each chunk is one transaction that deletes an id range (RETURNING the rows)
+    and adds them to agent_log_rollups, so a row is counted exactly once even if
+    several workers prune at the same time.
+
+    Returns:
+        Number of rows removed
+    """
+    if retention_days <= 0:
+        return 0
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    boundary = db.query(func.max(AgentLog.id)).filter(AgentLog.timestamp < cutoff).scalar()
+    if boundary is None:
+        return 0
+
+    removed = 0
+    while True:
+        chunk = [row_id for (row_id,) in
+                 db.query(AgentLog.id).filter(AgentLog.id <= boundary).order_by(AgentLog.id).limit(batch_size)]
+        if not chunk:
+            break
+        rows = db.execute(
+            delete(AgentLog)
+            .where(AgentLog.id.between(chunk[0], chunk[-1]))
+            .returning(AgentLog.id, AgentLog.timestamp, AgentLog.agent_name, AgentLog.message,
+                       AgentLog.level, AgentLog.job_id, AgentLog.validation_id)
+        ).all()
+        if AGENT_LOG_ARCHIVE_DIR:
+            _archive_rows(rows)
+        _add_rollups(db, rows)
+        db.commit()
+        removed += len(rows)
+
+    if removed:
+        print(f"[LogSink] Pruned {removed} agent log rows older than {retention_days:g} days")
+    return removed
+
+
+def _add_rollups(db: Session, rows):
+    counts = Counter(
+        (row.timestamp.strftime("%Y-%m-%d") if row.timestamp else "unknown", row.agent_name or "", row.level or "")
+        for row in rows
+    )
+    for (day, agent_name, level), count in counts.items():
+        rollup = db.get(AgentLogRollup, (day, agent_name, level))
+        if rollup:
+            rollup.count += count
+        else:
+            db.add(AgentLogRollup(day=day, agent_name=agent_name, level=level, count=count))
+
+
+def _archive_rows(rows):
+    os.makedirs(AGENT_LOG_ARCHIVE_DIR, exist_ok=True)
+    path = os.path.join(AGENT_LOG_ARCHIVE_DIR, f"agent_logs-{datetime.utcnow():%Y-%m}.jsonl")
+    with open(path, "a") as f:
+        for row in rows:
+            f.write(json.dumps(dict(row._mapping), default=str) + "\n")
+
+
+_last_prune = 0.0
+_prune_lock = threading.Lock()
+
+
+def maybe_prune_agent_logs(db: Session) -> int:
+    """Run prune_agent_logs at most once per AGENT_LOG_PRUNE_INTERVAL_SECONDS in this process."""
+    global _last_prune
+    with _prune_lock:
+        if _last_prune and time.monotonic() - _last_prune < AGENT_LOG_PRUNE_INTERVAL_SECONDS:
+            return 0
+        _last_prune = time.monotonic()
+    try:
+        return prune_agent_logs(db)
+    except Exception as e:
+        db.rollback()
+        print(f"[LogSink] Agent log pruning failed: {e}")
+        return 0
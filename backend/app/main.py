@@ -14,8 +14,21 @@ from contextlib import asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup: Create tables
     Base.metadata.create_all(bind=engine)
+    # FTS5 tables (SQLite) or a pg_trgm index (Postgres) for provider name search
+    from .provider_search import ensure_search_index
+    ensure_search_index(engine)
+
+    # Embedded queue workers so a single `uvicorn` still processes uploads.
+    # Set AVE_EMBEDDED_WORKERS=0 and run `python -m app.worker` to scale out.
+    from .worker import start_worker_threads
+    embedded_workers = int(os.getenv("AVE_EMBEDDED_WORKERS", 1))
+    stop_workers = start_worker_threads(embedded_workers) if embedded_workers > 0 else None
     yield
-    # Shutdown: Clean up if needed
+    # Shutdown: Stop claiming new jobs and write any buffered agent logs
+    if stop_workers:
+        stop_workers.set()
+    from .log_sink import log_sink
+    log_sink.close()
 
 app = FastAPI(title="AVE - Autonomous Validation Engine", lifespan=lifespan)
 
@@ -26,6 +39,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # Keyset pagination of GET /providers
 )
 
 # Include Routers
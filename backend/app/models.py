@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON, Boolean, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
@@ -17,15 +17,25 @@ class Provider(Base):
     status = Column(String, default="Pending") # Validated, Flagged, Pending
     confidence_score = Column(Float, default=0.0)
     last_updated = Column(DateTime, default=datetime.utcnow)
+    latest_validation_id = Column(Integer)  # Newest Validation.id, set by the pipeline on every save
     
     # Relationships
     validations = relationship("Validation", back_populates="provider", cascade="all, delete-orphan")
 
+    # Keyset pagination and filters of GET /providers(/search), newest first
+    __table_args__ = (
+        Index("ix_providers_last_updated_id", "last_updated", "id"),
+        Index("ix_providers_status_last_updated_id", "status", "last_updated", "id"),
+        Index("ix_providers_specialty_last_updated_id", "specialty", "last_updated", "id"),
+        Index("ix_providers_confidence_score", "confidence_score"),
+    )
+
 class Validation(Base):
     __tablename__ = "validations"
 
     id = Column(Integer, primary_key=True, index=True)
-    provider_id = Column(Integer, ForeignKey("providers.id"))
+    provider_id = Column(Integer, ForeignKey("providers.id"), index=True)
+    job_id = Column(Integer, ForeignKey("validation_jobs.id", ondelete="SET NULL"), index=True)  # Job that produced it
     timestamp = Column(DateTime, default=datetime.utcnow)
     
     status = Column(String) # Validated, Flagged
@@ -46,6 +56,35 @@ class AgentLog(Base):
     agent_name = Column(String) # Extraction, Enrichment, QA, Orchestrator
     message = Column(String)
     level = Column(String, default="INFO") # INFO, WARN, ERROR, SUCCESS
+    job_id = Column(Integer, ForeignKey("validation_jobs.id", ondelete="SET NULL"))  # Job that emitted the line
+    validation_id = Column(Integer, ForeignKey("validations.id", ondelete="SET NULL"))  # Provider validation it belongs to
+
+    # Per-job / per-validation views are range scans in id order; timestamp drives retention
+    __table_args__ = (
+        Index("ix_agent_logs_job_id_id", "job_id", "id"),
+        Index("ix_agent_logs_validation_id_id", "validation_id", "id"),
+        Index("ix_agent_logs_timestamp", "timestamp"),
+    )
+
+class AgentLogRollup(Base):
+    """Daily per-agent/level counts of agent_logs rows removed by retention (see prune_agent_logs)."""
+    __tablename__ = "agent_log_rollups"
+
+    day = Column(String, primary_key=True)  # YYYY-MM-DD (UTC)
+    agent_name = Column(String, primary_key=True)
+    level = Column(String, primary_key=True)
+    count = Column(Integer, default=0)
+
+class ProviderStats(Base):
+    """Running provider counters behind /dashboard/stats (single row, see app/provider_stats.py)."""
+    __tablename__ = "provider_stats"
+
+    id = Column(Integer, primary_key=True)
+    total = Column(Integer, default=0)
+    validated = Column(Integer, default=0)
+    flagged = Column(Integer, default=0)
+    confidence_sum = Column(Float, default=0.0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
 
 class SystemConfig(Base):
     __tablename__ = "system_config"
@@ -56,6 +95,9 @@ class SystemConfig(Base):
     fuzzy_matching = Column(Boolean, default=True)
     live_registry_enrichment = Column(Boolean, default=True)
     extraction_mode = Column(String, default="batch") # "batch" or "single"
+    validation_concurrency = Column(Integer, default=4) # Providers validated in parallel (1 = sequential)
+    qa_mode = Column(String, default="crew") # "crew" (LLM QA agent) or "rules" (local scoring engine)
+    pipeline_mode = Column(String, default="crew") # "crew" (CrewAI agents) or "direct" (tool + structured prompts, no agent loop)
 
 class ValidationJob(Base):
     """Tracks the progress of a validation job for UI display."""
@@ -63,8 +105,41 @@ class ValidationJob(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String)
-    status = Column(String, default="running")  # running, completed, cancelled
+    status = Column(String, default="queued", index=True)  # queued, running, completed, cancelled, error
     total_providers = Column(Integer, default=0)
     processed_providers = Column(Integer, default=0)
     current_step = Column(String, default="starting")  # extraction, enrichment, qa
     created_at = Column(DateTime, default=datetime.utcnow)
+
+    # Durable queue bookkeeping (see app/worker.py)
+    file_path = Column(String)  # Stored upload, removed once the job finishes
+    worker_id = Column(String)  # host:pid:thread of the worker that claimed the job
+    attempts = Column(Integer, default=0)
+    claimed_at = Column(DateTime)
+    heartbeat_at = Column(DateTime)
+
+    image_bytes_saved = Column(Integer, default=0)  # Upload bytes saved by image preprocessing
+    stage_metrics = Column(JSON)  # Per-stage seconds / LLM calls (see StageMetrics in crew.py)
+
+class RegistryCacheEntry(Base):
+    """Durable tier of the NPI registry response cache (see app/tools/registry_cache.py)."""
+    __tablename__ = "registry_cache"
+
+    npi = Column(String, primary_key=True)
+    payload = Column(JSON)  # Formatted NPIRegistrySearchTool output
+    registry_found = Column(Boolean, default=False)
+    fetched_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class ExtractionCacheEntry(Base):
+    """Extraction output keyed by file content, mode and model (see app/tools/extraction_cache.py)."""
+    __tablename__ = "extraction_cache"
+
+    cache_key = Column(String, primary_key=True)  # sha256(file sha256 + mode + model)
+    file_sha256 = Column(String, index=True)
+    extraction_mode = Column(String)
+    model_name = Column(String)
+    result = Column(JSON)  # Parsed list of extracted providers
+    size_bytes = Column(Integer, default=0)
+    hit_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)
@@ -0,0 +1,94 @@
+"""
+Set-based deletion of providers and their validations.
+
+Deleting through the ORM cascade loads every provider and every validation into
+the session and issues one DELETE per row. Here each chunk of provider ids is
+removed with a handful of statements instead:
+
+    UPDATE agent_logs SET validation_id = NULL  (validations of the chunk)
+    DELETE FROM validations WHERE provider_id IN (...)
+    DELETE FROM providers WHERE id IN (...)
+
+Each chunk is its own transaction, so a large wipe never holds the database
+write lock for more than one chunk and the pipeline's writers interleave with
+it. The statements don't rely on ON DELETE CASCADE, which SQLite only enforces
+with PRAGMA foreign_keys and can't be added to existing tables.
+
+Environment:
+    PROVIDER_DELETE_BATCH  Providers deleted per transaction (default 1000)
+"""
+
+import os
+from typing import List, Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+
+from .models import AgentLog, Provider, Validation
+from .provider_stats import rebuild_provider_stats, record_provider_changes
+
+PROVIDER_DELETE_BATCH = int(os.getenv("PROVIDER_DELETE_BATCH", 1000))
+
+
+def _delete_chunk(db: Session, provider_ids: List[int]) -> int:
+    """Delete one chunk of providers and commit. Returns the number deleted."""
+    validation_ids = select(Validation.id).where(Validation.provider_id.in_(provider_ids))
+    db.execute(
+        update(AgentLog).where(AgentLog.validation_id.in_(validation_ids)).values(validation_id=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(delete(Validation).where(Validation.provider_id.in_(provider_ids)).execution_options(synchronize_session=False))
+    # RETURNING gives the counters exactly what was deleted, even if a row changed since the SELECT
+    deleted = db.execute(
+        delete(Provider).where(Provider.id.in_(provider_ids))
+        .returning(Provider.status, Provider.confidence_score)
+        .execution_options(synchronize_session=False)
+    ).all()
+    record_provider_changes(db, [(tuple(row), None) for row in deleted])
+    db.commit()
+    return len(deleted)
+
+
+def delete_providers(db: Session, status: Optional[str] = None, job_id: Optional[int] = None,
+                     provider_ids: Optional[List[int]] = None, batch_size: int = PROVIDER_DELETE_BATCH) -> int:
+    """
+    Delete providers (and their validations) matching every given filter, in chunks.
+
+    Args:
+        status: Only providers with this status
+        job_id: Only providers validated by this job
+        provider_ids: Only these providers
+        batch_size: Providers per transaction
+
+    Returns:
+        Number of providers deleted
+    """
+    query = select(Provider.id)
+    if status:
+        query = query.where(Provider.status == status)
+    if job_id is not None:
+        query = query.where(Provider.id.in_(select(Validation.provider_id).where(Validation.job_id == job_id)))
+    if provider_ids is not None:
+        query = query.where(Provider.id.in_(provider_ids))
+    query = query.order_by(Provider.id).limit(max(1, batch_size))
+
+    deleted = 0
+    last_id = 0
+    while True:
+        # Walk the primary key so every chunk starts with an index seek
+        chunk = db.execute(query.where(Provider.id > last_id)).scalars().all()
+        if not chunk:
+            break
+        deleted += _delete_chunk(db, chunk)
+        last_id = chunk[-1]
+    return deleted
+
+
+def clear_providers(db: Session, batch_size: int = PROVIDER_DELETE_BATCH) -> int:
+    """Delete every provider and validation, then reset the dashboard counters."""
+    deleted = delete_providers(db, batch_size=batch_size)
+    # Anything saved while the wipe ran is counted again from scratch
+    rebuild_provider_stats(db)
+    db.commit()
+    print(f"[Registry] Cleared {deleted} providers")
+    return deleted
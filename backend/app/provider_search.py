@@ -0,0 +1,233 @@
+"""
+Server-side provider search (GET /providers, GET /providers/search).
+
+Filters (status, specialty, confidence range, last-updated window) are served
+by composite B-tree indexes on providers; results are ordered newest first and
+paginated by keyset on (last_updated, id), so every page is one index range scan.
+
+Name search depends on the DATABASE_URL dialect; `ensure_search_index` creates
+what it needs at startup (and from migrate_db.py):
+
+- SQLite: two FTS5 tables kept in sync with providers by triggers.
+  providers_fts (unicode61, prefix indexes) answers word-prefix queries
+  ("joh smi" matches "John Smith"); providers_trgm (trigram tokenizer) produces
+  candidates for fuzzy queries, which are then ranked by name similarity.
+- Postgres: the pg_trgm extension and a GIN trigram index on full_name, used
+  for word-prefix regex matches and for `%` similarity matches.
+- Anything else (or if the index could not be created): LIKE scans.
+
+A query made only of digits is treated as an NPI prefix (range scan on the npi index).
+
+Environment:
+    PROVIDER_SEARCH_FUZZY_CANDIDATES  Trigram candidates ranked per fuzzy query on SQLite (default 500)
+    PROVIDER_SEARCH_MIN_SIMILARITY    Lowest name similarity a fuzzy match may have (default 0.3)
+"""
+
+import base64
+import os
+import re
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func, text, tuple_
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from .agents.scoring import similarity
+from .models import Provider
+
+PROVIDER_PAGE_MAX = 500
+FUZZY_CANDIDATES = int(os.getenv("PROVIDER_SEARCH_FUZZY_CANDIDATES", 500))
+FUZZY_MIN_SIMILARITY = float(os.getenv("PROVIDER_SEARCH_MIN_SIMILARITY", 0.3))
+
+# Only the columns ProviderResponse needs; rows come back as tuples, not ORM objects
+PROVIDER_LIST_COLUMNS = (
+    Provider.id, Provider.full_name, Provider.npi, Provider.specialty, Provider.address, Provider.license,
+    Provider.status, Provider.confidence_score, Provider.last_updated, Provider.latest_validation_id,
+)
+
+_SQLITE_FTS_TABLES = {
+    "providers_fts": "tokenize='unicode61 remove_diacritics 2', prefix='1 2 3'",
+    "providers_trgm": "tokenize='trigram'",
+}
+
+_search_backend = None
+
+
+def ensure_search_index(engine: Engine) -> str:
+    """
+    Create the dialect's name-search index if it is missing.
+
+    Returns:
+        The search backend in use: "fts5", "pg_trgm" or "like"
+    """
+    global _search_backend
+    dialect = engine.dialect.name
+    backend = "like"
+    try:
+        with engine.begin() as conn:
+            if dialect == "sqlite":
+                for table, options in _SQLITE_FTS_TABLES.items():
+                    _create_sqlite_fts(conn, table, options)
+                backend = "fts5"
+            elif dialect == "postgresql":
+                conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                conn.execute(text(
+                    "CREATE INDEX IF NOT EXISTS ix_providers_full_name_trgm "
+                    "ON providers USING gin (full_name gin_trgm_ops)"
+                ))
+                backend = "pg_trgm"
+    except Exception as e:
+        print(f"[Search] Could not create the {dialect} name index, falling back to LIKE: {e}")
+    _search_backend = backend
+    return backend
+
+
+def _create_sqlite_fts(conn, table: str, options: str):
+    exists = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": table}
+    ).first()
+    if exists:
+        return
+    conn.execute(text(
+        f"CREATE VIRTUAL TABLE {table} USING fts5(full_name, content='providers', content_rowid='id', {options})"
+    ))
+    # External-content table: triggers mirror every change of providers.full_name
+    conn.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS {table}_ai AFTER INSERT ON providers BEGIN "
+        f"INSERT INTO {table}(rowid, full_name) VALUES (new.id, new.full_name); END"
+    ))
+    conn.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS {table}_ad AFTER DELETE ON providers BEGIN "
+        f"INSERT INTO {table}({table}, rowid, full_name) VALUES ('delete', old.id, old.full_name); END"
+    ))
+    conn.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS {table}_au AFTER UPDATE OF full_name ON providers BEGIN "
+        f"INSERT INTO {table}({table}, rowid, full_name) VALUES ('delete', old.id, old.full_name); "
+        f"INSERT INTO {table}(rowid, full_name) VALUES (new.id, new.full_name); END"
+    ))
+    conn.execute(text(f"INSERT INTO {table}({table}) VALUES ('rebuild')"))
+    print(f"[Search] Built {table} over existing providers")
+
+
+def search_backend(db: Session) -> str:
+    if _search_backend is None:
+        ensure_search_index(db.get_bind())
+    return _search_backend
+
+
+def encode_cursor(last_updated: datetime, provider_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{last_updated.isoformat()}|{provider_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Raises ValueError for a malformed cursor."""
+    try:
+        last_updated, provider_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(last_updated), int(provider_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def _tokens(q: str) -> List[str]:
+    return re.findall(r"\w+", q.lower())
+
+
+def _npi_prefix(query, digits: str):
+    # Range instead of LIKE so the npi index is used on every dialect
+    upper = digits[:-1] + chr(ord(digits[-1]) + 1)
+    return query.filter(Provider.npi >= digits, Provider.npi < upper)
+
+
+def _name_prefix(db: Session, query, tokens: List[str]):
+    backend = search_backend(db)
+    if backend == "fts5":
+        match = " ".join(f'"{token}"*' for token in tokens)
+        return query.filter(Provider.id.in_(
+            text("SELECT rowid FROM providers_fts WHERE providers_fts MATCH :match").bindparams(match=match)
+        ))
+    if backend == "pg_trgm":
+        # Word-prefix regex per token; pg_trgm's GIN index accelerates it
+        return query.filter(*(Provider.full_name.op("~*")(f"\\m{token}") for token in tokens))
+    return query.filter(*(Provider.full_name.ilike(f"%{token}%") for token in tokens))
+
+
+def _fuzzy_candidates(db: Session, q: str, tokens: List[str]) -> Optional[List[int]]:
+    """Provider ids sharing trigrams with `q` on SQLite (None when the trigram table is unavailable)."""
+    grams = {token[i:i + 3] for token in tokens for i in range(len(token) - 2)}
+    if not grams:
+        return None
+    match = " OR ".join(f'"{gram}"' for gram in sorted(grams))
+    rows = db.execute(
+        text("SELECT rowid FROM providers_trgm WHERE providers_trgm MATCH :match ORDER BY rank LIMIT :limit"),
+        {"match": match, "limit": FUZZY_CANDIDATES},
+    ).all()
+    return [row[0] for row in rows]
+
+
+def search_providers(db: Session, q: Optional[str] = None, match: str = "prefix", status: Optional[str] = None,
+                     specialty: Optional[str] = None, min_confidence: Optional[float] = None,
+                     max_confidence: Optional[float] = None, updated_after: Optional[datetime] = None,
+                     updated_before: Optional[datetime] = None, limit: int = 100,
+                     cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+    """
+    Filter and search providers.
+
+    Args:
+        q: Name words (word-prefix or fuzzy, see `match`) or an NPI prefix (digits only)
+        match: "prefix" or "fuzzy"; fuzzy results are ranked by similarity and not paginated
+        cursor: X-Next-Cursor of the previous page (raises ValueError if malformed)
+
+    Returns:
+        (rows as dicts, cursor of the next page or None)
+    """
+    limit = min(max(limit, 1), PROVIDER_PAGE_MAX)
+    query = db.query(*PROVIDER_LIST_COLUMNS)
+    if status:
+        query = query.filter(Provider.status == status)
+    if specialty:
+        query = query.filter(Provider.specialty == specialty)
+    if min_confidence is not None:
+        query = query.filter(Provider.confidence_score >= min_confidence)
+    if max_confidence is not None:
+        query = query.filter(Provider.confidence_score <= max_confidence)
+    if updated_after is not None:
+        query = query.filter(Provider.last_updated >= updated_after)
+    if updated_before is not None:
+        query = query.filter(Provider.last_updated < updated_before)
+
+    tokens = _tokens(q or "")
+    if tokens and match == "fuzzy" and not q.strip().isdigit():
+        return _fuzzy_search(db, query, q, tokens, limit), None
+    if tokens:
+        query = _npi_prefix(query, q.strip()) if q.strip().isdigit() else _name_prefix(db, query, tokens)
+
+    if cursor:
+        query = query.filter(tuple_(Provider.last_updated, Provider.id) < decode_cursor(cursor))
+    rows = query.order_by(Provider.last_updated.desc(), Provider.id.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].last_updated, rows[-1].id)
+    return [row._asdict() for row in rows], next_cursor
+
+
+def _fuzzy_search(db: Session, query, q: str, tokens: List[str], limit: int) -> List[dict]:
+    backend = search_backend(db)
+    if backend == "pg_trgm":
+        score = func.similarity(Provider.full_name, q)
+        rows = query.filter(Provider.full_name.op("%")(q)).order_by(score.desc()).limit(limit).all()
+        return [row._asdict() for row in rows]
+
+    candidates = _fuzzy_candidates(db, q, tokens) if backend == "fts5" else None
+    if candidates is not None:
+        query = query.filter(Provider.id.in_(candidates))
+    else:
+        # Query too short for trigrams (or no index): fall back to word prefixes
+        query = _name_prefix(db, query, tokens)
+    ranked = sorted(
+        ((similarity(q, row.full_name or ""), row) for row in query.limit(FUZZY_CANDIDATES).all()),
+        key=lambda pair: pair[0], reverse=True,
+    )
+    return [row._asdict() for score, row in ranked if score >= FUZZY_MIN_SIMILARITY][:limit]
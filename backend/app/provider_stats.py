@@ -0,0 +1,148 @@
+"""
+Dashboard statistics over the providers table.
+
+`aggregate_provider_stats` computes the counts and average confidence in one
+aggregate query. That is still a full scan, so provider writes also keep a
+one-row provider_stats table current: every insert, status/score change and
+delete applies its delta in the same transaction (`record_provider_change`, or
+`record_provider_changes` for a chunk of writes), and /dashboard/stats reads
+that row in O(1) regardless of registry size.
+
+The row is rebuilt from the aggregate query whenever it is missing, and after
+bulk operations that don't track individual rows (`rebuild_provider_stats`).
+It is created with INSERT ... ON CONFLICT DO NOTHING, so concurrent first
+writers (or first dashboard reads) don't collide on its id.
+
+Environment:
+    AVE_DASHBOARD_STATS  "counters" (default) reads provider_stats; "query" always aggregates
+"""
+
+import os
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import case, func, update
+from sqlalchemy.orm import Session
+
+from .models import Provider, ProviderStats
+
+DASHBOARD_STATS_SOURCE = os.getenv("AVE_DASHBOARD_STATS", "counters")
+STATS_ROW_ID = 1
+
+# (status, confidence_score) of a provider row before / after a change; None = no row
+ProviderSnapshot = Optional[Tuple[Optional[str], Optional[float]]]
+
+
+def aggregate_provider_stats(db: Session) -> dict:
+    """Counts by status and confidence total, in a single query."""
+    total, validated, flagged, confidence_sum = db.query(
+        func.count(Provider.id),
+        func.coalesce(func.sum(case((Provider.status == "Validated", 1), else_=0)), 0),
+        func.coalesce(func.sum(case((Provider.status == "Flagged", 1), else_=0)), 0),
+        func.coalesce(func.sum(func.coalesce(Provider.confidence_score, 0)), 0.0),
+    ).one()
+    return {"total": total, "validated": validated, "flagged": flagged, "confidence_sum": float(confidence_sum)}
+
+
+def _create_stats_row(db: Session):
+    """Insert the counters row if it is missing; concurrent callers don't collide on the id."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        if db.get(ProviderStats, STATS_ROW_ID) is None:
+            db.add(ProviderStats(id=STATS_ROW_ID))
+            db.flush()
+        return
+    db.execute(insert(ProviderStats).values(id=STATS_ROW_ID).on_conflict_do_nothing(index_elements=["id"]))
+
+
+def rebuild_provider_stats(db: Session) -> ProviderStats:
+    """Recompute the counters row from the providers table (not committed)."""
+    _create_stats_row(db)
+    stats = db.get(ProviderStats, STATS_ROW_ID)
+    for key, value in aggregate_provider_stats(db).items():
+        setattr(stats, key, value)
+    stats.updated_at = datetime.utcnow()
+    db.flush()
+    return stats
+
+
+def _counts(snapshot: ProviderSnapshot) -> dict:
+    if snapshot is None:
+        return {"total": 0, "validated": 0, "flagged": 0, "confidence_sum": 0.0}
+    status, score = snapshot
+    return {
+        "total": 1,
+        "validated": int(status == "Validated"),
+        "flagged": int(status == "Flagged"),
+        "confidence_sum": float(score or 0),
+    }
+
+
+def record_provider_change(db: Session, before: ProviderSnapshot, after: ProviderSnapshot):
+    """
+    Apply one provider write to the counters, in the caller's transaction.
+
+    Args:
+        before: (status, confidence_score) before the write, None for an insert
+        after: (status, confidence_score) after the write, None for a delete
+    """
+    record_provider_changes(db, [(before, after)])
+
+
+def record_provider_changes(db: Session, changes: List[Tuple[ProviderSnapshot, ProviderSnapshot]]):
+    """Apply a batch of (before, after) provider writes to the counters with one UPDATE."""
+    delta = {"total": 0, "validated": 0, "flagged": 0, "confidence_sum": 0.0}
+    for before, after in changes:
+        old, new = _counts(before), _counts(after)
+        for key in delta:
+            delta[key] += new[key] - old[key]
+    if not any(delta.values()):
+        return
+    # Relative UPDATE, so concurrent writers never lose each other's increments
+    changed = db.execute(
+        update(ProviderStats)
+        .where(ProviderStats.id == STATS_ROW_ID)
+        .values(
+            total=ProviderStats.total + delta["total"],
+            validated=ProviderStats.validated + delta["validated"],
+            flagged=ProviderStats.flagged + delta["flagged"],
+            confidence_sum=ProviderStats.confidence_sum + delta["confidence_sum"],
+            updated_at=datetime.utcnow(),
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not changed:
+        # First write (or the row was removed): the aggregate already includes this change
+        db.flush()
+        rebuild_provider_stats(db)
+
+
+def snapshot(provider: Optional[Provider]) -> ProviderSnapshot:
+    return None if provider is None else (provider.status, provider.confidence_score)
+
+
+def dashboard_stats(db: Session) -> dict:
+    """The /dashboard/stats payload."""
+    stats = None
+    if DASHBOARD_STATS_SOURCE == "counters":
+        stats = db.get(ProviderStats, STATS_ROW_ID)
+        if stats is None:
+            stats = rebuild_provider_stats(db)
+            db.commit()
+        stats = {"total": stats.total, "validated": stats.validated,
+                 "flagged": stats.flagged, "confidence_sum": stats.confidence_sum}
+    else:
+        stats = aggregate_provider_stats(db)
+
+    total = stats["total"] or 0
+    avg_conf = (stats["confidence_sum"] or 0.0) / total if total > 0 else 0.0
+    return {
+        "total_profiles": total,
+        "validated": stats["validated"] or 0,
+        "action_required": stats["flagged"] or 0,
+        "avg_confidence": int(avg_conf)
+    }
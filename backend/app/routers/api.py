@@ -1,74 +1,106 @@
-from fastapi import APIRouter, Depends, UploadFile, File, BackgroundTasks
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import update
 from sqlalchemy.orm import Session
-from ..database import get_db
+from ..database import SessionLocal, get_db, get_read_db
 from ..schemas import ProviderResponse, ValidationResponse, AgentLogResponse, SystemConfigResponse
-from ..models import Provider, Validation, AgentLog, SystemConfig, ValidationJob
-from ..crew.crew import run_validation_crew
-from typing import List
+from ..models import Validation, AgentLog, SystemConfig, ValidationJob
+from ..worker import MAX_UPLOAD_BYTES, UploadTooLarge, enqueue_job, store_upload
+from ..events import active_job, broadcaster, format_sse, job_snapshot, log_event, publish_job
+from ..log_sink import LogScope, log_sink
+from ..job_state import job_states
+from ..provider_search import search_providers
+from ..provider_delete import clear_providers, delete_providers
+from ..provider_stats import dashboard_stats
+from datetime import datetime
+from typing import List, Optional
+import asyncio
+import os
 
 router = APIRouter()
 
-def run_crew_task(file_content: bytes, filename: str, job_id: int):
-    """Background task to run CrewAI validation crew."""
-    from ..database import SessionLocal
-    new_db = SessionLocal()
+@router.post("/validate")
+async def trigger_validation(file: UploadFile = File(...), db: Session = Depends(get_db)):
+    if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds the {MAX_UPLOAD_BYTES // (1024 * 1024)} MB limit")
+
+    # Persist the upload so any worker process can pick the job up (and retry it after a restart).
+    # The multipart body is already spooled to a temp file; copy it across in chunks.
     try:
-        run_validation_crew(file_content, filename, new_db, job_id)
+        file_path = await run_in_threadpool(store_upload, file.file, file.filename)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     finally:
-        new_db.close()
+        await file.close()
 
-@router.post("/validate")
-async def trigger_validation(background_tasks: BackgroundTasks, file: UploadFile = File(...), db: Session = Depends(get_db)):
-    content = await file.read()
-    
-    # Create a validation job to track progress
-    job = ValidationJob(filename=file.filename, status="running", current_step="starting")
-    db.add(job)
-    db.commit()
-    db.refresh(job)
-    
-    # Run CrewAI validation in background
-    background_tasks.add_task(run_crew_task, content, file.filename, job.id)
-    
-    return {"message": "CrewAI Validation workflow started", "filename": file.filename, "job_id": job.id}
+    # Queue a validation job; workers claim it from validation_jobs
+    try:
+        job = enqueue_job(db, file.filename, file_path)
+    except Exception:
+        os.remove(file_path)
+        raise
+
+    return {"message": "CrewAI Validation workflow queued", "filename": file.filename, "job_id": job.id}
 
 @router.get("/dashboard/stats")
 def get_stats(db: Session = Depends(get_db)):
-    total = db.query(Provider).count()
-    validated = db.query(Provider).filter(Provider.status == "Validated").count()
-    flagged = db.query(Provider).filter(Provider.status == "Flagged").count()
-    
-    avg_conf = 0.0
-    if total > 0:
-        providers = db.query(Provider).all()
-        avg_conf = sum([p.confidence_score for p in providers]) / total
-
-    return {
-        "total_profiles": total, 
-        "validated": validated, 
-        "action_required": flagged, 
-        "avg_confidence": int(avg_conf)
-    }
+    # One-row counters table (or a single aggregate query), see app/provider_stats.py
+    return dashboard_stats(db)
 
+# Read-only endpoints that tolerate replica lag use get_read_db (see app/database.py)
 @router.get("/logs", response_model=List[AgentLogResponse])
-def get_logs(db: Session = Depends(get_db)):
+def get_logs(db: Session = Depends(get_read_db)):
     return db.query(AgentLog).order_by(AgentLog.timestamp.desc()).limit(50).all()
 
 @router.get("/providers", response_model=List[ProviderResponse])
-def get_providers(db: Session = Depends(get_db)):
-    providers = db.query(Provider).order_by(Provider.last_updated.desc()).all()
-    # Enrich with latest validation ID
-    for p in providers:
-        latest_val = db.query(Validation).filter(Validation.provider_id == p.id).order_by(Validation.timestamp.desc()).first()
-        p.latest_validation_id = latest_val.id if latest_val else None
-    return providers
+def get_providers(response: Response, limit: int = 100, cursor: Optional[str] = None,
+                  status: Optional[str] = None, db: Session = Depends(get_read_db)):
+    """
+    Providers, most recently updated first, one page per call.
+
+    Keyset pagination on (last_updated, id): pass the X-Next-Cursor response
+    header back as `cursor` to get the next page. The header is absent on the
+    last page.
+    """
+    return search_provider_page(response, db, status=status, limit=limit, cursor=cursor)
+
+@router.get("/providers/search", response_model=List[ProviderResponse])
+def provider_search(response: Response, q: Optional[str] = None, match: str = "prefix",
+                    status: Optional[str] = None, specialty: Optional[str] = None,
+                    min_confidence: Optional[float] = None, max_confidence: Optional[float] = None,
+                    updated_after: Optional[datetime] = None, updated_before: Optional[datetime] = None,
+                    limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(get_read_db)):
+    """
+    Indexed provider search (see app/provider_search.py).
+
+    `q` matches name word prefixes ("joh smi") or, with match=fuzzy, similar
+    names ranked by similarity (no pagination); a digits-only `q` is an NPI
+    prefix. Other results are paginated like GET /providers.
+    """
+    if match not in ("prefix", "fuzzy"):
+        raise HTTPException(status_code=400, detail="match must be 'prefix' or 'fuzzy'")
+    return search_provider_page(
+        response, db, q=q, match=match, status=status, specialty=specialty,
+        min_confidence=min_confidence, max_confidence=max_confidence,
+        updated_after=updated_after, updated_before=updated_before, limit=limit, cursor=cursor,
+    )
+
+def search_provider_page(response: Response, db: Session, **filters) -> list:
+    try:
+        rows, next_cursor = search_providers(db, **filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows
 
 @router.get("/validation/{validation_id}", response_model=ValidationResponse)
-def get_validation_by_id(validation_id: int, db: Session = Depends(get_db)):
+def get_validation_by_id(validation_id: int, db: Session = Depends(get_read_db)):
     return db.query(Validation).filter(Validation.id == validation_id).first()
 
 @router.get("/validation/{validation_id}/discrepancies")
-def get_discrepancies(validation_id: int, db: Session = Depends(get_db)):
+def get_discrepancies(validation_id: int, db: Session = Depends(get_read_db)):
     val = db.query(Validation).filter(Validation.id == validation_id).first()
     if not val:
         return []
@@ -95,41 +127,56 @@ def get_discrepancies(validation_id: int, db: Session = Depends(get_db)):
     return formatted
 
 @router.get("/agent-logs/{validation_id}", response_model=List[AgentLogResponse])
-def get_agent_logs_by_validation(validation_id: int, db: Session = Depends(get_db)):
-    # Note: Currently AgentLog doesn't have validation_id. 
-    # We will return the most recent logs as a proxy or we need to migrate the model.
-    # For this "Fix", we'll just return general logs filtered by time if possible, 
-    # or just all recent logs since we don't have the link in the DB for AgentLog.
-    # However, the user said "Ensure agent_logs table stores messages with timestamps".
-    # It does, but no validation_id relationship. 
-    # We will return the recent logs.
-    return db.query(AgentLog).order_by(AgentLog.timestamp.desc()).limit(20).all()
+def get_agent_logs_by_validation(validation_id: int, limit: int = 200, db: Session = Depends(get_read_db)):
+    # Range scan on ix_agent_logs_validation_id_id, newest first like /logs
+    return (
+        db.query(AgentLog)
+        .filter(AgentLog.validation_id == validation_id)
+        .order_by(AgentLog.id.desc())
+        .limit(min(max(limit, 1), 1000))
+        .all()
+    )
+
+@router.get("/jobs/{job_id}/logs", response_model=List[AgentLogResponse])
+def get_job_logs(job_id: int, after_id: int = 0, limit: int = 500, db: Session = Depends(get_read_db)):
+    """A job's log stream in emit order; pass the last id seen as `after_id` for the next page."""
+    return (
+        db.query(AgentLog)
+        .filter(AgentLog.job_id == job_id, AgentLog.id > after_id)
+        .order_by(AgentLog.id)
+        .limit(min(max(limit, 1), 5000))
+        .all()
+    )
 
 @router.delete("/logs")
 def clear_logs(db: Session = Depends(get_db)):
     db.query(AgentLog).delete()
     db.commit()
+    broadcaster.publish("logs_cleared", {})
     return {"message": "All logs cleared"}
 
+@router.delete("/providers/bulk")
+def delete_providers_bulk(status: Optional[str] = None, job_id: Optional[int] = None, db: Session = Depends(get_db)):
+    """
+    Delete the providers (and their validations) matching the filters, e.g.
+    ?status=Flagged or ?job_id=12 (providers validated by that job).
+    """
+    if not status and job_id is None:
+        raise HTTPException(status_code=400, detail="Pass status and/or job_id (DELETE /providers clears everything)")
+    deleted = delete_providers(db, status=status, job_id=job_id)
+    return {"message": f"{deleted} providers deleted", "deleted": deleted}
+
 @router.delete("/providers/{provider_id}")
 def delete_provider(provider_id: int, db: Session = Depends(get_db)):
-    provider = db.query(Provider).filter(Provider.id == provider_id).first()
-    if provider:
-        db.delete(provider)
-        db.commit()
+    if delete_providers(db, provider_ids=[provider_id]):
         return {"message": f"Provider {provider_id} deleted"}
     return {"message": "Provider not found"}
 
 @router.delete("/providers")
 def clear_registry(db: Session = Depends(get_db)):
-    # Standard query.delete() does NOT trigger ORM cascades (like delete-orphan for validations)
-    # So we must fetch and delete individually to ensure validations are also removed.
-    providers = db.query(Provider).all()
-    for provider in providers:
-        db.delete(provider) 
-    
-    db.commit()
-    return {"message": "All providers and their reports deleted"}
+    # Set-based DELETEs in chunks of PROVIDER_DELETE_BATCH providers (see app/provider_delete.py)
+    deleted = clear_providers(db)
+    return {"message": "All providers and their reports deleted", "deleted": deleted}
 
 from ..schemas import SystemConfigUpdate
 
@@ -156,6 +203,12 @@ def update_config(config_in: SystemConfigUpdate, db: Session = Depends(get_db)):
     config.fuzzy_matching = config_in.fuzzy_matching
     config.live_registry_enrichment = config_in.live_registry_enrichment
     config.extraction_mode = config_in.extraction_mode
+    if config_in.validation_concurrency is not None:
+        config.validation_concurrency = max(1, config_in.validation_concurrency)
+    if config_in.qa_mode in ("crew", "rules"):
+        config.qa_mode = config_in.qa_mode
+    if config_in.pipeline_mode in ("crew", "direct"):
+        config.pipeline_mode = config_in.pipeline_mode
     
     db.commit()
     db.refresh(config)
@@ -165,40 +218,151 @@ def update_config(config_in: SystemConfigUpdate, db: Session = Depends(get_db)):
 
 @router.get("/jobs/active")
 def get_active_job(db: Session = Depends(get_db)):
-    """Get the currently running validation job (if any)."""
-    job = db.query(ValidationJob).filter(ValidationJob.status == "running").order_by(ValidationJob.created_at.desc()).first()
+    """Get the currently running (or queued) validation job, if any."""
+    job = active_job(db)
     if not job:
         return {"active": False}
+    # A job running in this process has fresher progress in memory than its row
+    return job_snapshot(job_states.get(job.id) or job)
+
+
+@router.get("/events")
+async def stream_events(request: Request, last_event_id: Optional[int] = None):
+    """
+    Server-Sent Events stream of agent logs ("log") and job progress ("job").
+
+    Pass the last seen id as Last-Event-ID (EventSource does this on reconnect)
+    or ?last_event_id= to resume. New or stale clients first get a "snapshot"
+    with the latest 50 logs and the active job.
+    """
+    header_id = request.headers.get("last-event-id")
+    if header_id and header_id.isdigit():
+        last_event_id = int(header_id)
+
+    subscription, replay = broadcaster.subscribe(last_event_id)
+
+    async def event_stream():
+        try:
+            if replay is None:
+                snapshot_id = broadcaster.last_id
+                snapshot = await run_in_threadpool(_events_snapshot)
+                yield format_sse({"id": snapshot_id, "type": "snapshot", "data": snapshot})
+            else:
+                for event in replay:
+                    yield format_sse(event)
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    break  # Fell too far behind; the client reconnects and resumes by id
+                yield format_sse(event)
+        finally:
+            broadcaster.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _events_snapshot() -> dict:
+    db = SessionLocal()
+    try:
+        logs = db.query(AgentLog).order_by(AgentLog.timestamp.desc()).limit(50).all()
+        job = active_job(db)
+        return {
+            "logs": [log_event(vars(log)) for log in logs],
+            "job": job_snapshot((job and job_states.get(job.id)) or job),
+        }
+    finally:
+        db.close()
+
+@router.get("/jobs/metrics")
+def get_job_metrics(limit: int = 20, db: Session = Depends(get_read_db)):
+    """
+    Per-stage latency and LLM round-trips of recent jobs, plus per-provider
+    averages grouped by pipeline mode for comparing "crew" against "direct".
+    """
+    jobs = (
+        db.query(ValidationJob)
+        .filter(ValidationJob.stage_metrics.isnot(None))
+        .order_by(ValidationJob.id.desc())
+        .limit(limit)
+        .all()
+    )
+    by_mode = {}
+    for job in jobs:
+        mode = job.stage_metrics.get("pipeline_mode", "crew")
+        totals = by_mode.setdefault(mode, {"jobs": 0, "providers": 0, "stages": {}})
+        totals["jobs"] += 1
+        totals["providers"] += job.processed_providers or 0
+        for stage, values in job.stage_metrics.get("stages", {}).items():
+            stage_totals = totals["stages"].setdefault(stage, {"seconds": 0.0, "llm_calls": 0})
+            stage_totals["seconds"] += values.get("seconds", 0)
+            stage_totals["llm_calls"] += values.get("llm_calls", 0)
+
+    comparison = {
+        mode: {
+            "jobs": totals["jobs"],
+            "providers": totals["providers"],
+            "per_provider": {
+                stage: {
+                    "seconds": round(v["seconds"] / max(1, totals["providers"]), 3),
+                    "llm_calls": round(v["llm_calls"] / max(1, totals["providers"]), 2),
+                }
+                for stage, v in totals["stages"].items()
+            },
+        }
+        for mode, totals in by_mode.items()
+    }
     return {
-        "active": True,
-        "job_id": job.id,
-        "filename": job.filename,
-        "status": job.status,
-        "current_step": job.current_step,
-        "total_providers": job.total_providers,
-        "processed_providers": job.processed_providers
+        "comparison": comparison,
+        "jobs": [
+            {"job_id": job.id, "filename": job.filename, "status": job.status,
+             "providers": job.processed_providers, "metrics": job.stage_metrics}
+            for job in jobs
+        ],
     }
 
 @router.post("/jobs/{job_id}/cancel")
 def cancel_job(job_id: int, db: Session = Depends(get_db)):
-    """Cancel a running validation job."""
-    job = db.query(ValidationJob).filter(ValidationJob.id == job_id).first()
-    if not job:
-        return {"success": False, "error": "Job not found"}
-    
-    job.status = "cancelled"
-    job.current_step = "cancelled"
+    """Cancel a queued or running validation job."""
+    # Conditional UPDATEs, so a job a worker claims, finishes or fails meanwhile
+    # is never flipped back to cancelled. Queued first: only then is the upload
+    # known to be unclaimed.
+    for previous in ("queued", "running"):
+        changed = db.execute(
+            update(ValidationJob)
+            .where(ValidationJob.id == job_id, ValidationJob.status == previous)
+            .values(status="cancelled", current_step="cancelled")
+            .returning(ValidationJob.filename, ValidationJob.file_path)
+            .execution_options(synchronize_session=False)
+        ).first()
+        if changed:
+            break
     db.commit()
-    
+    if not changed:
+        status = db.query(ValidationJob.status).filter(ValidationJob.id == job_id).scalar()
+        if status is None:
+            return {"success": False, "error": "Job not found"}
+        return {"success": False, "error": f"Job is already {status}"}
+
+    # Stops a job running in this process right away, including its in-flight
+    # Gemini / NPI requests; workers elsewhere see the row on their next poll
+    job_states.cancel(job_id)
+    publish_job(db.get(ValidationJob, job_id))
+
+    # No worker will ever claim it now, so drop the stored upload
+    if previous == "queued" and changed.file_path and os.path.exists(changed.file_path):
+        os.remove(changed.file_path)
+
     # Log cancellation to Agent Execution Stream
-    from datetime import datetime
-    cancel_log = AgentLog(
-        agent_name="System",
-        message=f"⛔ Validation cancelled by user for: {job.filename}",
-        level="WARN",
-        timestamp=datetime.utcnow()
-    )
-    db.add(cancel_log)
-    db.commit()
+    with LogScope(job_id):
+        log_sink.emit("System", f"⛔ Validation cancelled by user for: {changed.filename}", "WARN")
+    log_sink.flush()
     
     return {"success": True, "message": f"Job {job_id} cancelled"}
@@ -4,7 +4,6 @@ from sqlalchemy.orm import Session
 from sqlalchemy import text
 from ..database import get_db
 import os
-import google.generativeai as genai
 from dotenv import load_dotenv, set_key
 
 router = APIRouter()
@@ -44,6 +43,7 @@ def get_system_status(db: Session = Depends(get_db)):
     if api_key:
         status["masked_gemini_key"] = f"{api_key[:4]}...{api_key[-4:]}" if len(api_key) > 8 else "***"
         try:
+            import google.generativeai as genai  # Heavy import, only needed for this check
             genai.configure(api_key=api_key)
             # Lightweight call to list models to verify auth
             list(genai.list_models(page_size=1)) 
@@ -87,3 +87,18 @@ def update_secrets(secrets: SecretsUpdate):
         return {"message": "Secrets updated. Please restart the backend if Database URL was changed."}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to update .env: {str(e)}")
+
+@router.get("/system/registry-cache")
+def get_registry_cache_stats():
+    """Hit/miss counters for the NPI registry cache (this process only)."""
+    from ..tools.registry_cache import registry_cache
+    return registry_cache.get_stats()
+
+@router.delete("/system/registry-cache")
+def clear_registry_cache(expired_only: bool = False):
+    """Drop expired (or all) cached NPI registry responses."""
+    from ..tools.registry_cache import registry_cache
+    if expired_only:
+        return {"message": f"Purged {registry_cache.purge_expired()} expired cache entries"}
+    registry_cache.clear()
+    return {"message": "Registry cache cleared"}
@@ -18,7 +18,7 @@ class ProviderResponse(ProviderBase):
     status: str
     confidence_score: float
     last_updated: datetime
-    latest_validation_id: int | None = None
+    latest_validation_id: Optional[int] = None
 
     class Config:
         from_attributes = True
@@ -34,6 +34,7 @@ class ValidationBase(BaseModel):
 class ValidationResponse(ValidationBase):
     id: int
     provider_id: int
+    job_id: Optional[int] = None
     timestamp: datetime
     
     class Config:
@@ -48,6 +49,8 @@ class AgentLogCreate(BaseModel):
 class AgentLogResponse(AgentLogCreate):
     id: int
     timestamp: datetime
+    job_id: Optional[int] = None
+    validation_id: Optional[int] = None
 
     class Config:
         from_attributes = True
@@ -59,6 +62,9 @@ class SystemConfigBase(BaseModel):
     fuzzy_matching: bool
     live_registry_enrichment: bool
     extraction_mode: str = "batch"
+    validation_concurrency: int = 4
+    qa_mode: str = "crew"
+    pipeline_mode: str = "crew"
 
 class SystemConfigResponse(SystemConfigBase):
     id: int
@@ -71,4 +77,6 @@ class SystemConfigUpdate(BaseModel):
     fuzzy_matching: Optional[bool] = None
     live_registry_enrichment: Optional[bool] = None
     extraction_mode: Optional[str] = None
-    extraction_mode: Optional[str] = None
+    validation_concurrency: Optional[int] = None
+    qa_mode: Optional[str] = None
+    pipeline_mode: Optional[str] = None
@@ -0,0 +1,118 @@
+"""
+Cooperative cancellation for outbound calls made on behalf of a job.
+
+The worker runs each job under a CancelToken (a ContextVar, so it follows the
+job into thread pools submitted with `contextvars.copy_context().run` and into
+`asyncio.to_thread`). Cancelling the token makes the current and every later
+Gemini / NPI call of that job raise JobCancelled right away:
+
+- `check_cancelled()` / `cancellable_sleep()` are called by the rate limiter
+  before each attempt and while waiting for budget or backing off.
+- `call_cancellable()` runs a blocking request on a helper thread and stops
+  waiting for it as soon as the token is cancelled. The request itself runs to
+  completion in the background and its result is discarded.
+- `run_cancellable()` cancels an asyncio task (e.g. in-flight httpx requests).
+
+JobCancelled derives from BaseException (like asyncio.CancelledError) so the
+pipeline's broad `except Exception` handlers don't mistake it for a failure.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from contextvars import ContextVar, copy_context
+from typing import Callable, Optional
+
+CANCEL_POLL_SECONDS = 0.1
+
+_cancel_token: ContextVar = ContextVar("job_cancel_token", default=None)
+_call_pool = ThreadPoolExecutor(max_workers=64, thread_name_prefix="cancellable-call")
+
+
+class JobCancelled(BaseException):
+    """Raised inside a job's call stack once its CancelToken is cancelled."""
+
+
+class CancelToken:
+    def __init__(self, job_id: Optional[int] = None):
+        self.job_id = job_id
+        self._event = threading.Event()
+        self._tokens = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self):
+        self._event.set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise JobCancelled(f"Job {self.job_id} cancelled")
+
+    def wait(self, seconds: float) -> bool:
+        """Sleep up to `seconds`; returns True as soon as the token is cancelled."""
+        return self._event.wait(seconds)
+
+    def __enter__(self):
+        self._tokens.append(_cancel_token.set(self))
+        return self
+
+    def __exit__(self, *exc):
+        _cancel_token.reset(self._tokens.pop())
+
+
+def current_cancel_token() -> Optional[CancelToken]:
+    return _cancel_token.get()
+
+
+def check_cancelled():
+    """Raise JobCancelled if the current job has been cancelled."""
+    token = _cancel_token.get()
+    if token is not None:
+        token.raise_if_cancelled()
+
+
+def cancellable_sleep(seconds: float):
+    """time.sleep that wakes up (and raises JobCancelled) when the current job is cancelled."""
+    token = _cancel_token.get()
+    if token is None:
+        threading.Event().wait(seconds)
+        return
+    if token.wait(seconds):
+        token.raise_if_cancelled()
+
+
+def call_cancellable(fn: Callable, *args, **kwargs):
+    """Run a blocking call, but give up waiting for it once the current job is cancelled."""
+    token = _cancel_token.get()
+    if token is None:
+        return fn(*args, **kwargs)
+    token.raise_if_cancelled()
+    future = _call_pool.submit(copy_context().run, fn, *args, **kwargs)
+    while True:
+        try:
+            return future.result(timeout=CANCEL_POLL_SECONDS)
+        except FutureTimeout:
+            if token.cancelled:
+                future.cancel()
+                token.raise_if_cancelled()
+
+
+async def run_cancellable(coro):
+    """Await `coro`, cancelling it (and raising JobCancelled) once the current job is cancelled."""
+    token = _cancel_token.get()
+    task = asyncio.ensure_future(coro)
+    if token is None:
+        return await task
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=CANCEL_POLL_SECONDS)
+        if done:
+            return task.result()
+        if token.cancelled:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            token.raise_if_cancelled()
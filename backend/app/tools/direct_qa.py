@@ -0,0 +1,103 @@
+"""
+Agent-free LLM QA for the "direct" pipeline mode.
+
+The crew QA path wraps the comparison prompt in a CrewAI agent, whose reasoning
+loop adds LLM turns before the answer and returns free text that has to be
+scraped for JSON. Here the same prompt goes straight to Gemini with a response
+schema, so each provider costs exactly one request and the output is always a
+parseable validation object.
+"""
+
+import json
+import os
+
+import google.generativeai as genai
+
+from .extraction import EXTRACTION_MODEL
+from .rate_limit import get_rate_limiter, estimate_tokens
+
+QA_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "confidence_score": {"type": "integer"},
+        "status": {"type": "string", "enum": ["Validated", "Flagged"]},
+        "discrepancies": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "field": {"type": "string"},
+                    "penalty": {"type": "integer"},
+                    "extracted": {"type": "string"},
+                    "registry": {"type": "string"},
+                    "reason": {"type": "string"},
+                },
+                "required": ["field", "penalty", "reason"],
+            },
+        },
+        "summary": {"type": "string"},
+    },
+    "required": ["confidence_score", "status", "discrepancies", "summary"],
+}
+
+
+def build_qa_prompt(extracted_data: dict, registry_data: dict, confidence_threshold: float = 0.78) -> str:
+    """Comparison instructions shared by the crew QA task and direct QA."""
+    threshold_percent = int(confidence_threshold * 100)
+    return f"""Compare the extracted provider data with the official registry data.
+
+EXTRACTED DATA:
+{extracted_data}
+
+REGISTRY DATA:
+{registry_data}
+
+Calculate a confidence score using these rules:
+- CRITICAL: If 'registry_found' is false or REGISTRY DATA is empty/error -> Score = 0. Stop there.
+- Otherwise, start at 100% and apply penalties:
+- Name mismatch: -20 points
+- License mismatch: -15 points
+- Specialty mismatch (total): -10 points
+- Specialty mismatch (minor): -5 points
+- Address format difference: -5 points
+
+Threshold for "Validated" status: {threshold_percent}%
+Below threshold = "Flagged" status
+
+IMPORTANT OUTPUT RULES:
+- Return ONLY the raw JSON object.
+- Do NOT use markdown formatting (no ```json ... ```).
+- Do NOT include any introductory text."""
+
+
+def run_direct_qa(extracted_data: dict, registry_data: dict, confidence_threshold: float = 0.78,
+                  model_name: str = EXTRACTION_MODEL) -> dict:
+    """
+    Score one provider with a single structured-output Gemini request.
+
+    Returns:
+        Validation dict (confidence_score, status, discrepancies, summary)
+
+    Raises:
+        ValueError: if the response is not a JSON object
+    """
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+    prompt = build_qa_prompt(extracted_data, registry_data, confidence_threshold)
+    model = genai.GenerativeModel(model_name)
+    response = get_rate_limiter("gemini").call(
+        model.generate_content,
+        prompt,
+        generation_config={"response_mime_type": "application/json", "response_schema": QA_RESPONSE_SCHEMA},
+        estimated_tokens=estimate_tokens(prompt) * 2,
+    )
+    result = json.loads(response.text)
+    if not isinstance(result, dict):
+        raise ValueError("QA response is not a JSON object")
+
+    # Keep status consistent with the configured threshold whatever the model decided
+    score = result.get("confidence_score") or 0
+    result["confidence_score"] = score
+    result["status"] = "Validated" if score >= confidence_threshold * 100 else "Flagged"
+    result.setdefault("discrepancies", [])
+    result.setdefault("summary", "")
+    return result
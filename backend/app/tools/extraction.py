@@ -1,13 +1,139 @@
 from crewai.tools import BaseTool
-from typing import Type
+from typing import List, Type
 from pydantic import BaseModel, Field
+import contextvars
 import mimetypes
 import os
+from concurrent.futures import ThreadPoolExecutor
 import google.generativeai as genai
 from dotenv import load_dotenv
+from .rate_limit import get_rate_limiter, estimate_tokens
+from .roster_parser import is_structured_file, parse_roster, roster_to_text
+import json
 
 load_dotenv()
 
+# Gemini model used for extraction (also part of the extraction cache key)
+EXTRACTION_MODEL = "gemini-2.5-flash"
+# Max characters of text/CSV per Gemini request; longer files are split into row batches
+TEXT_BATCH_CHARS = int(os.getenv("EXTRACTION_TEXT_BATCH_CHARS", 30000))
+
+MULTIMODAL_PROMPT = """
+                Analyze this medical document (Image/PDF) and extract provider information.
+                
+                Return a JSON array of provider objects with these fields:
+                - full_name: The provider's full name
+                - npi: NPI number (digits only, or null if not found)
+                - specialty: Medical specialty
+                - address: Full address
+                - license: License number
+
+                IMPORTANT:
+                - Extract ONLY what is explicitly visible.
+                - If NPI is missing or not clear, set it to null.
+                - Do NOT guess or hallucinate values.
+                """
+
+
+def extract_from_text(content: str, model_name: str = EXTRACTION_MODEL) -> str:
+    """Send text/CSV content to Gemini and return the raw JSON text."""
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+    prompt = f"""
+                Analyze this text/CSV content and extract provider information.
+                
+                DATA:
+                {content}
+
+                Return a JSON array of provider objects with these fields:
+                - full_name: The provider's full name
+                - npi: NPI number (digits only, or null if not found)
+                - specialty: Medical specialty
+                - address: Full address
+                - license: License number
+
+                IMPORTANT:
+                - Extract ONLY what is explicitly visible.
+                - If NPI is missing or not clear, set it to null.
+                - Do NOT guess or hallucinate values.
+                """
+    model = genai.GenerativeModel(model_name)
+    response = get_rate_limiter("gemini").call(
+        model.generate_content,
+        prompt,
+        generation_config={"response_mime_type": "application/json"},
+        estimated_tokens=estimate_tokens(prompt) * 2,  # Input + similarly sized JSON output
+    )
+    return response.text
+
+
+def _batch_lines(content: str, max_chars: int) -> List[str]:
+    """Split text into batches of whole lines; every batch repeats the first (header) line."""
+    lines = content.splitlines()
+    if len(lines) < 2:
+        return [content[i:i + max_chars] for i in range(0, len(content), max_chars)]
+    header, rows = lines[0], lines[1:]
+    batches, current, size = [], [], len(header)
+    for row in rows:
+        if current and size + len(row) + 1 > max_chars:
+            batches.append("\n".join([header] + current))
+            current, size = [], len(header)
+        current.append(row)
+        size += len(row) + 1
+    if current:
+        batches.append("\n".join([header] + current))
+    return batches
+
+
+def extract_from_long_text(content: str, model_name: str = EXTRACTION_MODEL) -> str:
+    """
+    extract_from_text for content of any length.
+
+    Content over TEXT_BATCH_CHARS is sent as row batches (in parallel, like
+    PDF text pages) and the merged provider list is returned as JSON text.
+    """
+    if len(content) <= TEXT_BATCH_CHARS:
+        return extract_from_text(content, model_name)
+    from ..log_sink import log_sink
+    from .pdf_chunking import PDF_CHUNK_WORKERS, merge_providers, parse_provider_json
+
+    def extract_batch(batch: str) -> list:
+        try:
+            return parse_provider_json(extract_from_text(batch, model_name))
+        except ValueError:
+            header, *rows = batch.splitlines()
+            if len(rows) <= 1:
+                raise
+            # Truncated output: retry the data rows as two smaller requests, each with the header
+            middle = len(rows) // 2
+            return extract_batch("\n".join([header] + rows[:middle])) + extract_batch("\n".join([header] + rows[middle:]))
+
+    batches = _batch_lines(content, TEXT_BATCH_CHARS)
+    log_sink.emit("Extraction Agent", f"Text is {len(content)} chars; extracting in {len(batches)} batches "
+                                      f"of up to {TEXT_BATCH_CHARS} chars")
+    with ThreadPoolExecutor(max_workers=max(1, PDF_CHUNK_WORKERS)) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, extract_batch, b) for b in batches]
+        merged = merge_providers([future.result() for future in futures])
+    return json.dumps(merged)
+
+
+def extract_from_bytes(file_data: bytes, mime_type: str, model_name: str = EXTRACTION_MODEL) -> str:
+    """Send an inline Image/PDF part to Gemini and return the raw JSON text."""
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+    model = genai.GenerativeModel(model_name)
+
+    # Construct parts (rough estimate; reconciled with usage_metadata after the call)
+    response = get_rate_limiter("gemini").call(
+        model.generate_content,
+        [
+            {"mime_type": mime_type, "data": file_data},
+            MULTIMODAL_PROMPT
+        ],
+        generation_config={"response_mime_type": "application/json"},
+        estimated_tokens=max(1000, len(file_data) // 100),
+    )
+    return response.text
+
+
 class FileExtractionToolInput(BaseModel):
     file_path: str = Field(..., description="The parameter is the absolute path to the local file (image, PDF, CSV, or text) that needs to be analyzed.")
 
@@ -23,7 +149,16 @@ class FileExtractionTool(BaseTool):
     def _run(self, file_path: str) -> str:
         """
         Processes the file using Google Gemini API directly for multimodal understanding.
+        Structured rosters (CSV/TSV/XLSX) with recognised headers are parsed locally instead.
         """
+        if is_structured_file(file_path):
+            try:
+                providers = parse_roster(file_path)
+                if providers is not None:
+                    return json.dumps(providers)
+            except Exception as e:
+                print(f"Structured roster parsing failed, falling back to LLM: {e}")
+
         api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
             return "Error: GEMINI_API_KEY not found in environment."
@@ -35,7 +170,7 @@ class FileExtractionTool(BaseTool):
         # Actually proper vision usually works best with 1.5-flash or 2.0-flash. 
         # Let's stick to the verified working one or 1.5-flash which is very stable for vision.
         # User successfully used 2.5-flash-lite (confirmed by 'Model Updated' message).
-        model_name = "gemini-2.5-flash" 
+        model_name = EXTRACTION_MODEL
 
         try:
             # Detect Mime Type
@@ -47,32 +182,16 @@ class FileExtractionTool(BaseTool):
                 else:
                     mime_type = "text/plain"
 
-            # 1. Text/CSV Handling
-            if mime_type.startswith("text/") or mime_type == "text/csv":
-                with open(file_path, "r", errors='ignore') as f:
-                    content = f.read()
-                
-                prompt = f"""
-                Analyze this text/CSV content and extract provider information.
+            # 1. Text/CSV Handling (unrecognised spreadsheet layouts are rendered as CSV text)
+            if mime_type.startswith("text/") or mime_type == "text/csv" or is_structured_file(file_path):
+                if file_path.lower().endswith((".xlsx", ".xlsm")):
+                    content = roster_to_text(file_path, max_chars=None)
+                else:
+                    with open(file_path, "r", errors='ignore') as f:
+                        content = f.read()
                 
-                DATA:
-                {content[:30000]}  # Limit context to avoid overflow
-
-                Return a JSON array of provider objects with these fields:
-                - full_name: The provider's full name
-                - npi: NPI number (digits only, or null if not found)
-                - specialty: Medical specialty
-                - address: Full address
-                - license: License number
-
-                IMPORTANT:
-                - Extract ONLY what is explicitly visible.
-                - If NPI is missing or not clear, set it to null.
-                - Do NOT guess or hallucinate values.
-                """
-                model = genai.GenerativeModel(model_name)
-                response = model.generate_content(prompt, generation_config={"response_mime_type": "application/json"})
-                return response.text
+                # Long files are split into row batches rather than cut off
+                return extract_from_long_text(content, model_name)
 
             # 2. Image/PDF Handling (Multimodal)
             else:
@@ -85,33 +204,7 @@ class FileExtractionTool(BaseTool):
                 with open(file_path, "rb") as f:
                     file_data = f.read()
 
-                model = genai.GenerativeModel(model_name)
-                
-                prompt_text = """
-                Analyze this medical document (Image/PDF) and extract provider information.
-                
-                Return a JSON array of provider objects with these fields:
-                - full_name: The provider's full name
-                - npi: NPI number (digits only, or null if not found)
-                - specialty: Medical specialty
-                - address: Full address
-                - license: License number
-
-                IMPORTANT:
-                - Extract ONLY what is explicitly visible.
-                - If NPI is missing or not clear, set it to null.
-                - Do NOT guess or hallucinate values.
-                """
-                
-                # Construct parts
-                response = model.generate_content(
-                    [
-                        {"mime_type": mime_type, "data": file_data},
-                        prompt_text
-                    ],
-                    generation_config={"response_mime_type": "application/json"}
-                )
-                return response.text
+                return extract_from_bytes(file_data, mime_type, model_name)
 
         except Exception as e:
             return f"Extraction Error: {str(e)}"
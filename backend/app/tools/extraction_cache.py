@@ -0,0 +1,107 @@
+"""
+Durable cache of extraction results keyed by file content.
+
+Identical uploads (same bytes, extraction mode and model) reuse the providers
+extracted the first time instead of going back to Gemini. Entries live in the
+`extraction_cache` table and are evicted least-recently-used once the cache
+exceeds its entry or size budget.
+
+Environment:
+    EXTRACTION_CACHE_ENABLED      "0" disables the cache (default on)
+    EXTRACTION_CACHE_MAX_ENTRIES  Max cached files (default 1000)
+    EXTRACTION_CACHE_MAX_BYTES    Max total size of cached results (default 50 MB)
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import func
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from ..models import ExtractionCacheEntry
+
+EXTRACTION_CACHE_ENABLED = os.getenv("EXTRACTION_CACHE_ENABLED", "1") != "0"
+EXTRACTION_CACHE_MAX_ENTRIES = int(os.getenv("EXTRACTION_CACHE_MAX_ENTRIES", 1000))
+EXTRACTION_CACHE_MAX_BYTES = int(os.getenv("EXTRACTION_CACHE_MAX_BYTES", 50 * 1024 * 1024))
+
+
+def file_sha256(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Stream the file through SHA-256."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(file_hash: str, extraction_mode: str, model_name: str) -> str:
+    return hashlib.sha256(f"{file_hash}:{extraction_mode}:{model_name}".encode()).hexdigest()
+
+
+def get_cached_extraction(db: Session, key: str) -> Optional[list]:
+    """Return the cached provider list for `key` (and bump its LRU position), or None."""
+    if not EXTRACTION_CACHE_ENABLED:
+        return None
+    try:
+        entry = db.get(ExtractionCacheEntry, key)
+        if entry is None:
+            return None
+        entry.hit_count = (entry.hit_count or 0) + 1
+        entry.last_used_at = datetime.utcnow()
+        db.commit()
+        return entry.result
+    except SQLAlchemyError as e:
+        db.rollback()
+        print(f"[ExtractionCache] Read failed: {e}")
+        return None
+
+
+def store_extraction(db: Session, key: str, file_hash: str, extraction_mode: str, model_name: str, providers: list):
+    """Store an extraction result and evict least-recently-used entries beyond the budget."""
+    if not EXTRACTION_CACHE_ENABLED:
+        return
+    size = len(json.dumps(providers))
+    if size > EXTRACTION_CACHE_MAX_BYTES:
+        return
+    try:
+        db.merge(ExtractionCacheEntry(
+            cache_key=key,
+            file_sha256=file_hash,
+            extraction_mode=extraction_mode,
+            model_name=model_name,
+            result=providers,
+            size_bytes=size,
+            hit_count=0,
+            created_at=datetime.utcnow(),
+            last_used_at=datetime.utcnow()
+        ))
+        db.commit()
+        evict(db)
+    except SQLAlchemyError as e:
+        db.rollback()
+        print(f"[ExtractionCache] Write failed: {e}")
+
+
+def evict(db: Session) -> int:
+    """Delete least-recently-used entries until the cache fits its entry and byte budgets."""
+    count, total = db.query(func.count(ExtractionCacheEntry.cache_key), func.coalesce(func.sum(ExtractionCacheEntry.size_bytes), 0)).one()
+    if count <= EXTRACTION_CACHE_MAX_ENTRIES and total <= EXTRACTION_CACHE_MAX_BYTES:
+        return 0
+
+    evicted = []
+    rows = db.query(ExtractionCacheEntry.cache_key, ExtractionCacheEntry.size_bytes).order_by(ExtractionCacheEntry.last_used_at)
+    for key, size in rows.all():
+        if count <= EXTRACTION_CACHE_MAX_ENTRIES and total <= EXTRACTION_CACHE_MAX_BYTES:
+            break
+        evicted.append(key)
+        count -= 1
+        total -= size or 0
+
+    if evicted:
+        db.query(ExtractionCacheEntry).filter(ExtractionCacheEntry.cache_key.in_(evicted)).delete(synchronize_session=False)
+        db.commit()
+    return len(evicted)
@@ -0,0 +1,118 @@
+"""
+Image preprocessing before multimodal extraction.
+
+Phone photos of license documents are often 8-12 MB at resolutions far beyond
+what OCR needs, and every byte is uploaded inline to Gemini. Before extraction,
+images are:
+
+    * rotated according to their EXIF orientation (the metadata is dropped on re-encode)
+    * downscaled so the longest side is at most IMAGE_MAX_DIMENSION
+    * converted to grayscale when they carry little colour (scans, photos of paper)
+    * re-encoded as JPEG at IMAGE_JPEG_QUALITY
+
+The original is kept whenever the re-encoded image would not be smaller.
+
+Environment:
+    IMAGE_PREP_ENABLED    "false" to send images unchanged (default true)
+    IMAGE_MAX_DIMENSION   Longest side in pixels (default 2048)
+    IMAGE_JPEG_QUALITY    JPEG quality 1-95 (default 80)
+    IMAGE_GRAYSCALE       "auto" (low-saturation images only), "always" or "never" (default auto)
+"""
+
+import io
+import os
+from typing import Optional, Tuple
+
+IMAGE_PREP_ENABLED = os.getenv("IMAGE_PREP_ENABLED", "true").lower() != "false"
+IMAGE_MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", 2048))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", 80))
+IMAGE_GRAYSCALE = os.getenv("IMAGE_GRAYSCALE", "auto").lower()
+
+# Mean HSV saturation (0-255) below which an image is treated as monochrome in "auto" mode
+GRAYSCALE_SATURATION = 24
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".bmp", ".tif", ".tiff")
+
+
+def is_image_file(file_path: str) -> bool:
+    return file_path.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def _is_low_colour(image) -> bool:
+    from PIL import ImageStat
+    sample = image.copy()
+    sample.thumbnail((256, 256))
+    saturation = sample.convert("HSV").getchannel("S")
+    return ImageStat.Stat(saturation).mean[0] < GRAYSCALE_SATURATION
+
+
+def prepare_image(data: bytes, max_dimension: int = IMAGE_MAX_DIMENSION, quality: int = IMAGE_JPEG_QUALITY,
+                  grayscale: str = IMAGE_GRAYSCALE) -> Tuple[bytes, Optional[str], dict]:
+    """
+    Downscale and recompress an image for extraction.
+
+    Args:
+        data: Original image bytes
+        max_dimension: Longest side after resizing
+        quality: JPEG quality
+        grayscale: "auto", "always" or "never"
+
+    Returns:
+        (bytes, mime_type, stats). mime_type is None when the original is kept;
+        stats holds original/prepared sizes, dimensions and bytes_saved.
+    """
+    from PIL import Image, ImageOps
+
+    stats = {"original_bytes": len(data), "prepared_bytes": len(data), "bytes_saved": 0}
+    with Image.open(io.BytesIO(data)) as image:
+        stats["original_size"] = image.size
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "L"):
+            background = Image.new("RGB", image.size, "white")  # Flatten transparency onto white
+            rgba = image.convert("RGBA")
+            background.paste(rgba, mask=rgba.getchannel("A"))
+            image = background
+
+        resized = max(image.size) > max_dimension
+        if resized:
+            image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+        if image.mode != "L" and (grayscale == "always" or (grayscale == "auto" and _is_low_colour(image))):
+            image = image.convert("L")
+        stats["prepared_size"] = image.size
+        stats["grayscale"] = image.mode == "L"
+
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=quality, optimize=True)
+        prepared = buffer.getvalue()
+
+    if len(prepared) >= len(data):
+        return data, None, stats
+    stats["prepared_bytes"] = len(prepared)
+    stats["bytes_saved"] = len(data) - len(prepared)
+    return prepared, "image/jpeg", stats
+
+
+def prepare_image_file(file_path: str) -> Tuple[str, dict]:
+    """
+    Preprocess an image file, writing the result next to it.
+
+    Returns:
+        (path to send to extraction, stats). The path is the original file when
+        preprocessing is disabled, Pillow is missing or nothing was saved.
+    """
+    with open(file_path, "rb") as f:
+        data = f.read()
+    if not IMAGE_PREP_ENABLED:
+        return file_path, {"original_bytes": len(data), "prepared_bytes": len(data), "bytes_saved": 0}
+    try:
+        prepared, mime_type, stats = prepare_image(data)
+    except ImportError:
+        print("Pillow is not installed; sending image unchanged (pip install Pillow)")
+        return file_path, {"original_bytes": len(data), "prepared_bytes": len(data), "bytes_saved": 0}
+    if mime_type is None:
+        return file_path, stats
+
+    prepared_path = os.path.splitext(file_path)[0] + ".prepared.jpg"
+    with open(prepared_path, "wb") as f:
+        f.write(prepared)
+    return prepared_path, stats
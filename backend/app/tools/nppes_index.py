@@ -0,0 +1,316 @@
+"""
+Offline NPI registry backed by the CMS NPPES dissemination file.
+
+The NPPES CSV (~8M rows) is ingested once into a compact on-disk index:
+
+    records.dat  Concatenated compact JSON records, already in the
+                 NPIRegistrySearchTool output shape
+    npi.idx      Header + fixed-width entries (npi u64, offset u64, length u32)
+                 sorted by NPI
+
+Both files are memory-mapped; a lookup is a binary search over npi.idx plus one
+slice of records.dat, so it runs in microseconds without touching the network.
+
+Weekly NPPES delta files are applied incrementally: changed records are appended
+to records.dat and a merged npi.idx is written and atomically swapped in.
+Deactivated NPIs are dropped from the index. A full `build` compacts records.dat.
+
+Usage:
+    python -m app.tools.nppes_index build npidata_pfile.csv [--taxonomy nucc_taxonomy.csv]
+    python -m app.tools.nppes_index update npidata_pfile_weekly.csv [--taxonomy nucc_taxonomy.csv]
+    python -m app.tools.nppes_index lookup 1234567890
+
+Environment:
+    NPPES_INDEX_DIR  Index location (default ./nppes_index)
+"""
+
+import argparse
+import csv
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+from typing import Dict, Iterator, Optional, Tuple
+
+NPPES_INDEX_DIR = os.getenv("NPPES_INDEX_DIR", os.path.join(os.getcwd(), "nppes_index"))
+
+INDEX_FILE = "npi.idx"
+RECORDS_FILE = "records.dat"
+MAGIC = b"AVENPI01"
+HEADER = struct.Struct("<8sQ")  # magic, entry count
+ENTRY = struct.Struct("<QQI")  # npi, offset, length
+
+csv.field_size_limit(sys.maxsize)
+
+
+def load_taxonomy(path: Optional[str]) -> Dict[str, str]:
+    """Load NUCC taxonomy code -> description (NPPES rows only carry the codes)."""
+    if not path:
+        return {}
+    taxonomy = {}
+    with open(path, newline="", encoding="utf-8-sig", errors="ignore") as f:
+        for row in csv.DictReader(f):
+            code = (row.get("Code") or "").strip()
+            desc = (row.get("Display Name") or row.get("Specialization") or row.get("Classification") or "").strip()
+            if code and desc:
+                taxonomy[code] = desc
+    return taxonomy
+
+
+def format_nppes_row(row: dict, taxonomy: Dict[str, str]) -> Optional[dict]:
+    """Convert one NPPES CSV row to the NPIRegistrySearchTool output dict (None if deactivated)."""
+    npi = (row.get("NPI") or "").strip()
+    if not npi.isdigit():
+        return None
+    if (row.get("NPI Deactivation Date") or "").strip() and not (row.get("NPI Reactivation Date") or "").strip():
+        return None
+
+    entity_type = (row.get("Entity Type Code") or "").strip()
+    first = (row.get("Provider First Name") or "").strip()
+    last = (row.get("Provider Last Name (Legal Name)") or "").strip()
+    credential = (row.get("Provider Credential Text") or "").strip()
+    organization = (row.get("Provider Organization Name (Legal Business Name)") or "").strip()
+
+    addr_parts = [
+        row.get("Provider First Line Business Practice Location Address", ""),
+        row.get("Provider Second Line Business Practice Location Address", ""),
+        row.get("Provider Business Practice Location Address City Name", ""),
+        row.get("Provider Business Practice Location Address State Name", ""),
+        row.get("Provider Business Practice Location Address Postal Code", ""),
+    ]
+    full_address = ", ".join([p.strip() for p in addr_parts if p and p.strip()])
+
+    # Primary taxonomy slot (1-15), falling back to the first populated one
+    primary_slot = None
+    for i in range(1, 16):
+        code = (row.get(f"Healthcare Provider Taxonomy Code_{i}") or "").strip()
+        if not code:
+            continue
+        if primary_slot is None or (row.get(f"Healthcare Provider Primary Taxonomy Switch_{i}") or "").strip() == "Y":
+            primary_slot = i
+            if (row.get(f"Healthcare Provider Primary Taxonomy Switch_{i}") or "").strip() == "Y":
+                break
+
+    primary_specialty = "Unknown"
+    license_number = ""
+    if primary_slot:
+        code = row[f"Healthcare Provider Taxonomy Code_{primary_slot}"].strip()
+        primary_specialty = taxonomy.get(code, code)
+        license_number = (row.get(f"Provider License Number_{primary_slot}") or "").strip()
+        license_state = (row.get(f"Provider License Number State Code_{primary_slot}") or "").strip()
+        if license_number and license_state:
+            license_number = f"{license_state}-{license_number}"
+
+    return {
+        "npi_number": npi,
+        "provider_name": f"{first} {last} {credential}".strip() or organization,
+        "enumeration_type": {"1": "NPI-1", "2": "NPI-2"}.get(entity_type, ""),
+        "primary_specialty": primary_specialty,
+        "organization_name": organization,
+        "address": full_address,
+        "license": license_number,
+        "status": "A",
+        "registry_found": True,
+    }
+
+
+def _iter_rows(csv_path: str) -> Iterator[dict]:
+    with open(csv_path, newline="", encoding="utf-8", errors="ignore") as f:
+        yield from csv.DictReader(f)
+
+
+def _write_index(path: str, npis: array, offsets: array, lengths: array, order):
+    """Write entries in `order` (sorted by NPI) to `path` via a temp file + atomic rename."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(order)))
+        for i in order:
+            f.write(ENTRY.pack(npis[i], offsets[i], lengths[i]))
+    os.replace(tmp_path, path)
+
+
+def _append_records(records_path: str, csv_path: str, taxonomy: Dict[str, str], mode: str):
+    """Append formatted records; returns (npis, offsets, lengths, deactivated npi set)."""
+    npis, offsets, lengths = array("Q"), array("Q"), array("I")
+    deactivated = set()
+    with open(records_path, mode) as out:
+        offset = out.tell()
+        for row in _iter_rows(csv_path):
+            record = format_nppes_row(row, taxonomy)
+            if record is None:
+                npi = (row.get("NPI") or "").strip()
+                if npi.isdigit():
+                    deactivated.add(int(npi))
+                continue
+            data = json.dumps(record, separators=(",", ":")).encode("utf-8")
+            out.write(data)
+            npis.append(int(record["npi_number"]))
+            offsets.append(offset)
+            lengths.append(len(data))
+            offset += len(data)
+    return npis, offsets, lengths, deactivated
+
+
+def build_index(csv_path: str, index_dir: str = NPPES_INDEX_DIR, taxonomy_path: Optional[str] = None) -> int:
+    """Build a fresh index from a full NPPES dissemination CSV. Returns the entry count."""
+    os.makedirs(index_dir, exist_ok=True)
+    taxonomy = load_taxonomy(taxonomy_path)
+    records_tmp = os.path.join(index_dir, RECORDS_FILE + ".tmp")
+    npis, offsets, lengths, _ = _append_records(records_tmp, csv_path, taxonomy, "wb")
+
+    # Last row wins for duplicate NPIs
+    latest = {}
+    for i, npi in enumerate(npis):
+        latest[npi] = i
+    order = sorted(latest.values(), key=npis.__getitem__)
+
+    os.replace(records_tmp, os.path.join(index_dir, RECORDS_FILE))
+    _write_index(os.path.join(index_dir, INDEX_FILE), npis, offsets, lengths, order)
+    return len(order)
+
+
+def apply_delta(csv_path: str, index_dir: str = NPPES_INDEX_DIR, taxonomy_path: Optional[str] = None) -> Tuple[int, int]:
+    """
+    Apply an NPPES weekly update file to an existing index.
+
+    Returns:
+        Tuple of (records upserted, records removed)
+    """
+    taxonomy = load_taxonomy(taxonomy_path)
+    index = NPPESIndex(index_dir)
+    try:
+        delta_npis, delta_offsets, delta_lengths, deactivated = _append_records(
+            os.path.join(index_dir, RECORDS_FILE), csv_path, taxonomy, "ab"
+        )
+        delta = {}
+        for i, npi in enumerate(delta_npis):
+            delta[npi] = i
+        removed = deactivated - delta.keys()
+
+        # Merge the existing sorted entries with the sorted delta (delta wins)
+        npis, offsets, lengths = array("Q"), array("Q"), array("I")
+        delta_sorted = sorted(delta.items())
+        dropped = 0
+        d = 0
+        for npi, offset, length in index.entries():
+            while d < len(delta_sorted) and delta_sorted[d][0] < npi:
+                j = delta_sorted[d][1]
+                npis.append(delta_npis[j]); offsets.append(delta_offsets[j]); lengths.append(delta_lengths[j])
+                d += 1
+            if d < len(delta_sorted) and delta_sorted[d][0] == npi:
+                j = delta_sorted[d][1]
+                npis.append(delta_npis[j]); offsets.append(delta_offsets[j]); lengths.append(delta_lengths[j])
+                d += 1
+            elif npi in removed:
+                dropped += 1
+            else:
+                npis.append(npi); offsets.append(offset); lengths.append(length)
+        for _, j in delta_sorted[d:]:
+            npis.append(delta_npis[j]); offsets.append(delta_offsets[j]); lengths.append(delta_lengths[j])
+    finally:
+        index.close()
+
+    _write_index(os.path.join(index_dir, INDEX_FILE), npis, offsets, lengths, range(len(npis)))
+    return len(delta), dropped
+
+
+class NPPESIndex:
+    """Read-only, memory-mapped view of an index directory."""
+
+    def __init__(self, index_dir: str = NPPES_INDEX_DIR):
+        self.index_dir = index_dir
+        self.index_path = os.path.join(index_dir, INDEX_FILE)
+        self.mtime = os.stat(self.index_path).st_mtime_ns
+        with open(self.index_path, "rb") as f:
+            self._index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with open(os.path.join(index_dir, RECORDS_FILE), "rb") as f:
+            self._records = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+        magic, self.count = HEADER.unpack_from(self._index, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Not an NPPES index: {self.index_path}")
+
+    def __len__(self):
+        return self.count
+
+    def _entry(self, i: int) -> Tuple[int, int, int]:
+        return ENTRY.unpack_from(self._index, HEADER.size + i * ENTRY.size)
+
+    def entries(self) -> Iterator[Tuple[int, int, int]]:
+        for i in range(self.count):
+            yield self._entry(i)
+
+    def lookup(self, npi_number: str) -> Optional[dict]:
+        """Return the registry dict for `npi_number`, or None if it isn't in the index."""
+        npi_number = str(npi_number).strip()
+        if not npi_number.isdigit():
+            return None
+        target = int(npi_number)
+        lo, hi = 0, self.count - 1
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            npi, offset, length = self._entry(mid)
+            if npi < target:
+                lo = mid + 1
+            elif npi > target:
+                hi = mid - 1
+            else:
+                return json.loads(self._records[offset:offset + length])
+        return None
+
+    def close(self):
+        self._index.close()
+        if isinstance(self._records, mmap.mmap):
+            self._records.close()
+
+
+_index: Optional[NPPESIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_nppes_index(index_dir: str = NPPES_INDEX_DIR) -> Optional[NPPESIndex]:
+    """Shared index for this process, reopened when a build/update swaps npi.idx (None if not built)."""
+    global _index
+    index_path = os.path.join(index_dir, INDEX_FILE)
+    try:
+        mtime = os.stat(index_path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _index_lock:
+        if _index is None or _index.index_dir != index_dir or _index.mtime != mtime:
+            # Old maps are left to the GC so in-flight lookups on other threads stay valid
+            _index = NPPESIndex(index_dir)
+        return _index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and query the offline NPPES registry index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (("build", "Build a fresh index from a full NPPES CSV"),
+                            ("update", "Apply an NPPES weekly delta CSV")):
+        cmd = sub.add_parser(name, help=help_text)
+        cmd.add_argument("csv_path")
+        cmd.add_argument("--taxonomy", help="NUCC taxonomy CSV for specialty descriptions")
+        cmd.add_argument("--index-dir", default=NPPES_INDEX_DIR)
+    lookup = sub.add_parser("lookup", help="Look up one NPI")
+    lookup.add_argument("npi")
+    lookup.add_argument("--index-dir", default=NPPES_INDEX_DIR)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        print(f"Indexed {build_index(args.csv_path, args.index_dir, args.taxonomy)} NPIs into {args.index_dir}")
+    elif args.command == "update":
+        upserted, removed = apply_delta(args.csv_path, args.index_dir, args.taxonomy)
+        print(f"Applied delta: {upserted} upserted, {removed} removed")
+    else:
+        index = get_nppes_index(args.index_dir)
+        if index is None:
+            print(f"No index found in {args.index_dir}")
+            return
+        print(json.dumps(index.lookup(args.npi), indent=2))
+
+
+if __name__ == "__main__":
+    main()
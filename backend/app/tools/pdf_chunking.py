@@ -0,0 +1,163 @@
+"""
+Page-split parallel extraction for large PDFs.
+
+A long credentialing PDF sent as one inline blob is slow and can exceed the
+model's output-token limit, silently dropping providers. Here the PDF is split
+into page ranges that are extracted concurrently (each call still goes through
+the shared Gemini rate limiter). A chunk whose output doesn't parse as JSON -
+typically truncated output - is split in half and retried, down to single
+pages, so every page is covered. Per-chunk provider lists are merged and
+de-duplicated by NPI; rows without an NPI are only merged with a matching row
+(name plus license or address) of the previous chunk.
+
+Environment:
+    PDF_CHUNK_PAGES    Pages per chunk; PDFs with more pages are split (default 10)
+    PDF_CHUNK_WORKERS  Chunks extracted in parallel (default 4)
+"""
+
+import contextvars
+import io
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from .extraction import extract_from_bytes
+
+PDF_CHUNK_PAGES = int(os.getenv("PDF_CHUNK_PAGES", 10))
+PDF_CHUNK_WORKERS = int(os.getenv("PDF_CHUNK_WORKERS", 4))
+
+
+def count_pdf_pages(file_path: str) -> int:
+    from pypdf import PdfReader
+    return len(PdfReader(file_path).pages)
+
+
+def pdf_page_range(reader, start: int, end: int) -> bytes:
+    """Write pages [start, end) of an open PdfReader to a new in-memory PDF."""
+    from pypdf import PdfWriter
+    writer = PdfWriter()
+    for i in range(start, end):
+        writer.add_page(reader.pages[i])
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def parse_provider_json(text: str) -> list:
+    """Parse an extraction response into a provider list (raises ValueError if it isn't one)."""
+    text = text.strip()
+    if text.startswith("```json"):
+        text = text[7:]
+    if text.endswith("```"):
+        text = text[:-3]
+    data = json.loads(text.strip())
+    if isinstance(data, dict):
+        data = [data]
+    if not isinstance(data, list):
+        raise ValueError("Extraction response is not a JSON list")
+    return [p for p in data if isinstance(p, dict)]
+
+
+def _normalized(value) -> str:
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", str(value or "").lower()).split())
+
+
+def _fill_missing(existing: dict, provider: dict):
+    for field, value in provider.items():
+        if value not in (None, "", "null") and existing.get(field) in (None, "", "null"):
+            existing[field] = value
+
+
+def _boundary_keys(provider: dict) -> list:
+    """(name, field, value) keys that identify a row repeated across a chunk boundary."""
+    name = _normalized(provider.get("full_name"))
+    if not name or name == "unknown":
+        return []
+    return [(name, field, _normalized(provider.get(field))) for field in ("license", "address")
+            if _normalized(provider.get(field))]
+
+
+def merge_providers(chunks: List[list]) -> list:
+    """
+    Merge per-chunk lists in page order.
+
+    Rows with the same NPI are one provider; later rows fill in missing fields.
+    Rows without an NPI stay separate providers (namesakes are different people),
+    except a row repeated across a chunk boundary: same name plus same license or
+    address as a row without an NPI in the previous chunk.
+    """
+    merged = []
+    by_npi = {}
+    previous_chunk = {}
+    for providers in chunks:
+        current_chunk = {}
+        for provider in providers:
+            npi = re.sub(r"\D", "", str(provider.get("npi") or ""))
+            if npi:
+                if npi in by_npi:
+                    _fill_missing(by_npi[npi], provider)
+                else:
+                    by_npi[npi] = dict(provider)
+                    merged.append(by_npi[npi])
+                continue
+            keys = _boundary_keys(provider)
+            entry = next((previous_chunk[key] for key in keys if key in previous_chunk), None)
+            if entry is None:
+                entry = dict(provider)
+                merged.append(entry)
+            else:
+                _fill_missing(entry, provider)
+            for key in keys:
+                current_chunk.setdefault(key, entry)
+        previous_chunk = current_chunk
+    return merged
+
+
+def extract_pdf_chunked(file_path: str, pages_per_chunk: int = PDF_CHUNK_PAGES, max_workers: int = PDF_CHUNK_WORKERS,
+                        on_progress: Optional[Callable[[str], None]] = None) -> list:
+    """
+    Extract all providers from a PDF by page range.
+
+    Args:
+        file_path: Path to the PDF
+        pages_per_chunk: Pages sent per Gemini request
+        max_workers: Chunks extracted concurrently
+        on_progress: Optional callback receiving progress messages (e.g. for job logs)
+
+    Returns:
+        Merged, de-duplicated provider list
+    """
+    from pypdf import PdfReader
+    reader = PdfReader(file_path)
+    total_pages = len(reader.pages)
+    ranges = [(start, min(start + pages_per_chunk, total_pages)) for start in range(0, total_pages, pages_per_chunk)]
+    log = on_progress or (lambda message: None)
+    log(f"Splitting {total_pages}-page PDF into {len(ranges)} chunks of up to {pages_per_chunk} pages")
+
+    # pypdf readers aren't thread-safe: build chunk bytes up front, extract in parallel
+    chunk_bytes = {r: pdf_page_range(reader, *r) for r in ranges}
+
+    def extract_range(page_range) -> list:
+        start, end = page_range
+        data = chunk_bytes.pop(page_range, None) or pdf_page_range(PdfReader(file_path), start, end)
+        try:
+            providers = parse_provider_json(extract_from_bytes(data, "application/pdf"))
+        except ValueError as e:  # Includes JSONDecodeError from truncated output
+            if end - start <= 1:
+                raise ValueError(f"Page {start + 1} could not be extracted: {e}")
+            middle = (start + end) // 2
+            log(f"Pages {start + 1}-{end}: incomplete output, re-splitting")
+            return extract_range((start, middle)) + extract_range((middle, end))
+        log(f"Pages {start + 1}-{end}: {len(providers)} providers")
+        return providers
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        # copy_context keeps per-job LLM call counting (rate_limit.CallCounter) across threads
+        futures = [executor.submit(contextvars.copy_context().run, extract_range, r) for r in ranges]
+        per_chunk = [future.result() for future in futures]
+
+    merged = merge_providers(per_chunk)
+    log(f"Merged {sum(len(c) for c in per_chunk)} chunk results into {len(merged)} unique providers")
+    return merged
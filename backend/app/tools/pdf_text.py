@@ -0,0 +1,157 @@
+"""
+Local text-layer extraction for digitally generated PDFs.
+
+Most uploaded PDFs already carry a text layer, so shipping the raw PDF to the
+multimodal endpoint is the slowest and most token-expensive option. This stage
+classifies each page:
+
+    * tabular text pages  -> parsed locally with the roster header mapping (no LLM)
+    * other text pages    -> compact text sent to the Gemini text path
+    * scanned/image pages -> re-packed into a PDF and sent through vision
+                             (page-chunked, see pdf_chunking.py)
+
+Results are merged and de-duplicated like chunked extraction.
+
+Environment:
+    PDF_TEXT_MIN_CHARS   Non-whitespace characters for a page to count as text (default 40)
+    PDF_TEXT_BATCH_CHARS Max characters of page text per Gemini text request (default 30000)
+"""
+
+import contextvars
+import io
+import os
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from .extraction import extract_from_text
+from .pdf_chunking import PDF_CHUNK_WORKERS, extract_pdf_chunked, merge_providers, parse_provider_json
+from .roster_parser import map_headers, row_to_provider
+
+PDF_TEXT_MIN_CHARS = int(os.getenv("PDF_TEXT_MIN_CHARS", 40))
+PDF_TEXT_BATCH_CHARS = int(os.getenv("PDF_TEXT_BATCH_CHARS", 30000))
+
+_COLUMN_SPLIT = re.compile(r"\t|\s*\|\s*|\s{2,}")
+
+
+def page_texts(file_path: str) -> List[str]:
+    """Extracted text of every page ("" for pages without a text layer)."""
+    from pypdf import PdfReader
+    texts = []
+    for page in PdfReader(file_path).pages:
+        try:
+            texts.append(page.extract_text() or "")
+        except Exception:
+            texts.append("")
+    return texts
+
+
+def pdf_pages(file_path: str, page_numbers: List[int]) -> bytes:
+    """Write the given (0-based) pages of a PDF to a new in-memory PDF."""
+    from pypdf import PdfReader, PdfWriter
+    reader = PdfReader(file_path)
+    writer = PdfWriter()
+    for i in page_numbers:
+        writer.add_page(reader.pages[i])
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def has_text(text: str) -> bool:
+    return len(re.sub(r"\s+", "", text)) >= PDF_TEXT_MIN_CHARS
+
+
+def parse_text_table(text: str) -> Optional[list]:
+    """Parse a page laid out as a roster table (columns separated by tabs, pipes or 2+ spaces)."""
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    for h, line in enumerate(lines[:10]):
+        header = [c for c in _COLUMN_SPLIT.split(line) if c]
+        mapping = map_headers(header)
+        if not mapping:
+            continue
+        providers = []
+        for row_line in lines[h + 1:]:
+            row = [c for c in _COLUMN_SPLIT.split(row_line) if c]
+            if len(row) != len(header):
+                return None  # Ragged rows: let the LLM read it
+            provider = row_to_provider(row, mapping)
+            if provider:
+                providers.append(provider)
+        return providers or None
+    return None
+
+
+def _batch_pages(pages: List[tuple], max_chars: int) -> List[List[tuple]]:
+    batches, current, size = [], [], 0
+    for page in pages:
+        if current and size + len(page[1]) > max_chars:
+            batches.append(current)
+            current, size = [], 0
+        current.append(page)
+        size += len(page[1])
+    if current:
+        batches.append(current)
+    return batches
+
+
+def extract_pdf_text_layer(file_path: str, on_progress: Optional[Callable[[str], None]] = None) -> Optional[list]:
+    """
+    Extract providers from a PDF using its text layer where available.
+
+    Returns:
+        Merged provider list, or None if no page has a usable text layer
+        (callers should then use the vision path for the whole document)
+    """
+    log = on_progress or (lambda message: None)
+    texts = page_texts(file_path)
+    text_pages = [(i, t) for i, t in enumerate(texts) if has_text(t)]
+    if not text_pages:
+        return None
+    image_pages = [i for i, t in enumerate(texts) if not has_text(t)]
+
+    # 1. Tabular pages are parsed locally
+    results = []
+    llm_pages = []
+    for i, text in text_pages:
+        table = parse_text_table(text)
+        if table:
+            results.append(table)
+        else:
+            llm_pages.append((i, text))
+    table_pages = len(text_pages) - len(llm_pages)
+
+    pdf_bytes = os.path.getsize(file_path)
+    text_chars = sum(len(t) for _, t in llm_pages)
+    log(f"PDF text layer: {len(text_pages)}/{len(texts)} pages ({table_pages} parsed as tables), "
+        f"{len(image_pages)} scanned pages; sending {text_chars} chars of text instead of {pdf_bytes} PDF bytes")
+
+    # 2. Remaining text pages go to the text path, batched under the context budget
+    def extract_batch(batch) -> list:
+        content = "\n\n".join(f"--- Page {i + 1} ---\n{t}" for i, t in batch)
+        try:
+            return parse_provider_json(extract_from_text(content))
+        except ValueError:
+            if len(batch) <= 1:
+                raise
+            middle = len(batch) // 2  # Truncated output: retry as two smaller requests
+            return extract_batch(batch[:middle]) + extract_batch(batch[middle:])
+
+    batches = _batch_pages(llm_pages, PDF_TEXT_BATCH_CHARS)
+    with ThreadPoolExecutor(max_workers=max(1, PDF_CHUNK_WORKERS)) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, extract_batch, b) for b in batches]
+        results.extend(future.result() for future in futures)
+
+    # 3. Scanned pages go through vision
+    if image_pages:
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+            tmp.write(pdf_pages(file_path, image_pages))
+        try:
+            results.append(extract_pdf_chunked(tmp.name, on_progress=log))
+        finally:
+            os.remove(tmp.name)
+
+    merged = merge_providers(results)
+    log(f"Text-layer extraction found {len(merged)} unique providers")
+    return merged
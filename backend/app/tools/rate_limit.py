@@ -0,0 +1,275 @@
+"""
+Process-wide adaptive rate limiting for external APIs (Gemini, CMS NPI Registry).
+
+Each upstream API gets one shared AdaptiveRateLimiter holding two token buckets:
+requests/minute and (optionally) tokens/minute. Callers wrap outbound calls with
+`limiter.call(fn, ...)`, which waits for budget, retries on 429 / quota errors with
+backoff, and adapts the allowed rate from observed responses (AIMD: halve on
+throttle, creep back up on success).
+
+Requests made through `limiter.call` are also tallied in the active CallCounter
+(if any), which the pipeline uses to report LLM round-trips per stage.
+
+Inside a job the limiter also honours the job's CancelToken (see cancellation.py):
+waits and backoffs end, and in-flight requests are abandoned, once it is cancelled.
+"""
+
+import os
+import re
+import random
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional
+
+from .cancellation import call_cancellable, cancellable_sleep, check_cancelled
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a call is still throttled after all retries are used up."""
+
+
+# Gemini / litellm quota text; "429" only counts next to a throttling phrase
+_RATE_LIMIT_MESSAGE = re.compile(
+    r"\b429\b[^\n]{0,40}\b(Too Many Requests|Resource has been exhausted|quota)"
+    r"|\bToo Many Requests\b[^\n]{0,40}\b429\b"
+    r"|\bRESOURCE_EXHAUSTED\b|\bQuota exceeded\b",
+    re.IGNORECASE,
+)
+
+
+def _status_code(exc: Exception) -> Optional[int]:
+    for value in (getattr(getattr(exc, "response", None), "status_code", None),
+                  getattr(exc, "status_code", None), getattr(exc, "code", None)):
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def is_rate_limit_error(exc: Exception) -> bool:
+    """Detect 429 / quota errors from google-generativeai, litellm/CrewAI, httpx and requests."""
+    # HTTP status (requests / httpx HTTPStatusError response, litellm, google api_core .code)
+    status = _status_code(exc)
+    if status is not None:
+        return status == 429
+    if type(exc).__name__ in ("ResourceExhausted", "TooManyRequests", "RateLimitError"):
+        return True
+    return bool(_RATE_LIMIT_MESSAGE.search(str(exc)))
+
+
+def retry_after_seconds(exc: Exception) -> Optional[float]:
+    """Extract the server-suggested wait from a throttling error, if any."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("Retry-After") if hasattr(headers, "get") else None
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    # Gemini embeds e.g. "retry_delay { seconds: 23 }" or "Please retry in 23.4s"
+    match = re.search(r"retry_delay\s*\{\s*seconds:\s*(\d+)", str(exc)) or \
+        re.search(r"retry in ([\d.]+)s", str(exc))
+    if match:
+        return float(match.group(1))
+    return None
+
+
+class CallCounter:
+    """
+    Counts upstream requests per limiter name made within a `with` block.
+
+    The counter lives in a ContextVar, so it sees calls made in the current
+    thread; work handed to a thread pool is included when it is submitted with
+    `contextvars.copy_context().run`.
+    """
+
+    def __init__(self):
+        self.counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._token = None
+
+    def add(self, name: str, count: int = 1):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + count
+
+    def get(self, name: str) -> int:
+        return self.counts.get(name, 0)
+
+    def __enter__(self):
+        self._token = _call_counter.set(self)
+        return self
+
+    def __exit__(self, *exc):
+        _call_counter.reset(self._token)
+
+
+_call_counter: ContextVar[Optional[CallCounter]] = ContextVar("call_counter", default=None)
+
+
+def record_calls(name: str, count: int = 1):
+    """Add requests made outside `limiter.call` (e.g. CrewAI's internal LLM turns) to the active counter."""
+    counter = _call_counter.get()
+    if counter is not None and count:
+        counter.add(name, count)
+
+
+class TokenBucket:
+    """Continuously refilling bucket sized to a per-minute budget."""
+
+    def __init__(self, per_minute: float):
+        self.per_minute = float(per_minute)
+        self.available = float(per_minute)
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        elapsed = now - self.updated
+        self.updated = now
+        self.available = min(self.per_minute, self.available + elapsed * self.per_minute / 60.0)
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` is available (0 if available now)."""
+        amount = min(amount, self.per_minute)  # Oversized requests only need a full bucket
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) * 60.0 / self.per_minute
+
+    def take(self, amount: float):
+        self.available -= min(amount, self.per_minute)
+
+
+class AdaptiveRateLimiter:
+    """
+    Shared limiter for one upstream API.
+
+    Args:
+        name: Label used in log output
+        requests_per_minute: Quota ceiling for requests
+        tokens_per_minute: Quota ceiling for tokens (None = not tracked)
+        max_retries: Retries on 429 before giving up
+        min_fraction: Lowest fraction of the ceiling the adaptive rate may drop to
+    """
+
+    def __init__(self, name: str, requests_per_minute: float, tokens_per_minute: Optional[float] = None,
+                 max_retries: int = 5, min_fraction: float = 0.1):
+        self.name = name
+        self.ceiling_rpm = float(requests_per_minute)
+        self.max_retries = max_retries
+        self.min_rpm = max(1.0, self.ceiling_rpm * min_fraction)
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+        # Counters for observability
+        self.total_calls = 0
+        self.throttled_calls = 0
+
+    @property
+    def current_rpm(self) -> float:
+        return self.requests.per_minute
+
+    def acquire(self, tokens: int = 0):
+        """Block until one request (and `tokens` tokens) fit within the budget."""
+        while True:
+            check_cancelled()
+            with self.lock:
+                now = time.monotonic()
+                self.requests.refill(now)
+                wait = max(self.paused_until - now, self.requests.wait_time(1))
+                if self.tokens and tokens:
+                    self.tokens.refill(now)
+                    wait = max(wait, self.tokens.wait_time(tokens))
+                if wait <= 0:
+                    self.requests.take(1)
+                    if self.tokens and tokens:
+                        self.tokens.take(tokens)
+                    self.total_calls += 1
+                    return
+            cancellable_sleep(min(wait, 5.0))
+
+    def record_tokens(self, actual: int, estimated: int):
+        """Reconcile an up-front token estimate with the usage the API reported."""
+        if not self.tokens:
+            return
+        with self.lock:
+            self.tokens.available -= (actual - estimated)
+
+    def on_success(self):
+        """Additive increase back towards the configured ceiling."""
+        with self.lock:
+            if self.requests.per_minute < self.ceiling_rpm:
+                self.requests.per_minute = min(self.ceiling_rpm, self.requests.per_minute + self.ceiling_rpm * 0.05)
+
+    def on_throttle(self, retry_after: Optional[float] = None, attempt: int = 0):
+        """Multiplicative decrease and a shared pause so every caller backs off together."""
+        with self.lock:
+            self.throttled_calls += 1
+            self.requests.per_minute = max(self.min_rpm, self.requests.per_minute / 2)
+            self.requests.available = min(self.requests.available, 0.0)
+            backoff = retry_after if retry_after is not None else min(60.0, 2 ** attempt + random.uniform(0, 1))
+            self.paused_until = max(self.paused_until, time.monotonic() + backoff)
+        print(f"[RateLimiter:{self.name}] Throttled, backing off {backoff:.1f}s (rate now {self.requests.per_minute:.0f}/min)")
+
+    def call(self, fn: Callable, *args, estimated_tokens: int = 0, counted: bool = True, **kwargs):
+        """
+        Run `fn(*args, **kwargs)` within the budget, retrying on throttling errors.
+
+        Each attempt is recorded in the active CallCounter unless `counted` is
+        False (for wrappers such as a Crew kickoff that report their own requests).
+
+        Raises:
+            RateLimitExceeded: If the call is still throttled after `max_retries` retries
+            JobCancelled: If the current job is cancelled while waiting or in flight
+        """
+        for attempt in range(self.max_retries + 1):
+            self.acquire(estimated_tokens)
+            if counted:
+                record_calls(self.name)
+            try:
+                result = call_cancellable(fn, *args, **kwargs)
+            except Exception as e:
+                if not is_rate_limit_error(e):
+                    raise
+                if attempt >= self.max_retries:
+                    raise RateLimitExceeded(f"{self.name} quota exceeded after {attempt + 1} attempts: {e}") from e
+                self.on_throttle(retry_after_seconds(e), attempt)
+                continue
+
+            usage = getattr(result, "usage_metadata", None)
+            if usage is not None and getattr(usage, "total_token_count", None):
+                self.record_tokens(usage.total_token_count, estimated_tokens)
+            self.on_success()
+            return result
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token)."""
+    return max(1, len(text) // 4)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+# Defaults per upstream; override with e.g. GEMINI_REQUESTS_PER_MINUTE / NPI_REQUESTS_PER_MINUTE
+_DEFAULTS = {
+    "gemini": {"requests_per_minute": 60, "tokens_per_minute": 1_000_000},
+    "npi": {"requests_per_minute": 300, "tokens_per_minute": None},
+}
+
+
+def get_rate_limiter(name: str) -> AdaptiveRateLimiter:
+    """Return the process-wide limiter for `name` ("gemini" or "npi"), creating it on first use."""
+    with _limiters_lock:
+        if name not in _limiters:
+            defaults = _DEFAULTS.get(name, {"requests_per_minute": 60, "tokens_per_minute": None})
+            prefix = name.upper()
+            rpm = float(os.getenv(f"{prefix}_REQUESTS_PER_MINUTE", defaults["requests_per_minute"]))
+            tpm = os.getenv(f"{prefix}_TOKENS_PER_MINUTE", defaults["tokens_per_minute"])
+            _limiters[name] = AdaptiveRateLimiter(
+                name,
+                requests_per_minute=rpm,
+                tokens_per_minute=float(tpm) if tpm else None,
+                max_retries=int(os.getenv(f"{prefix}_MAX_RETRIES", 5)),
+            )
+        return _limiters[name]
@@ -1,8 +1,108 @@
 from crewai.tools import BaseTool
-from typing import Type
+from typing import Optional, Type
 from pydantic import BaseModel, Field
 import requests
 import json
+import os
+import threading
+from .rate_limit import get_rate_limiter
+from .registry_cache import registry_cache
+from .nppes_index import get_nppes_index
+
+# "api" (CMS web API), "nppes" (offline NPPES index only) or
+# "nppes_then_api" (offline index, falling back to the API for NPIs it doesn't have)
+NPI_REGISTRY_BACKEND = os.getenv("NPI_REGISTRY_BACKEND", "api")
+
+NPI_REGISTRY_URL = "https://npiregistry.cms.hhs.gov/api/"
+
+_local = threading.local()
+
+
+def _session() -> requests.Session:
+    """Per-thread keep-alive session so repeat lookups reuse the TCP+TLS connection."""
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def _fetch_registry(url: str) -> dict:
+    response = _session().get(url, timeout=10)
+    response.raise_for_status()  # 429 surfaces as HTTPError for the limiter to retry
+    return response.json()
+
+
+def registry_url(npi_number: str) -> str:
+    return f"{NPI_REGISTRY_URL}?version=2.1&number={npi_number}"
+
+
+def lookup_offline(npi_number: str) -> Optional[dict]:
+    """
+    Answer from the offline NPPES index when NPI_REGISTRY_BACKEND enables it.
+
+    Returns None when the web API should be asked instead.
+    """
+    if NPI_REGISTRY_BACKEND not in ("nppes", "nppes_then_api"):
+        return None
+    index = get_nppes_index()
+    record = index.lookup(npi_number) if index else None
+    if record is not None:
+        return record
+    if NPI_REGISTRY_BACKEND == "nppes":
+        return {
+            "npi_number": npi_number,
+            "registry_found": False,
+            "status": "Not Found" if index else "Not Found (NPPES index not built)"
+        }
+    return None
+
+
+def format_registry_response(npi_number: str, data: dict) -> dict:
+    """Convert a raw CMS NPI Registry API response into the tool's output dict."""
+    # Check results
+    if "results" not in data or not data["results"]:
+        return {
+            "npi_number": npi_number,
+            "registry_found": False,
+            "status": "Not Found"
+        }
+
+    result = data["results"][0]
+    basic = result.get("basic", {})
+    addresses = result.get("addresses", [])
+    taxonomies = result.get("taxonomies", [])
+
+    # Extract primary address (usually purpose='LOCATION')
+    primary_address = next((addr for addr in addresses if addr.get("address_purpose") == "LOCATION"), addresses[0] if addresses else {})
+
+    # Construct formatted address
+    addr_parts = [
+        primary_address.get("address_1", ""),
+        primary_address.get("address_2", ""),
+        primary_address.get("city", ""),
+        primary_address.get("state", ""),
+        primary_address.get("postal_code", "")
+    ]
+    full_address = ", ".join([p for p in addr_parts if p]).strip()
+
+    # Extract primary specialty (and the license recorded against it)
+    primary_taxonomy = next((t for t in taxonomies if t.get("primary")), {})
+    primary_specialty = primary_taxonomy.get("desc") or "Unknown"
+    license_number = primary_taxonomy.get("license", "")
+    if license_number and primary_taxonomy.get("state"):
+        license_number = f"{primary_taxonomy['state']}-{license_number}"
+
+    return {
+        "npi_number": str(result.get("number")),
+        "provider_name": f"{basic.get('first_name', '')} {basic.get('last_name', '')} {basic.get('credential', '')}".strip() or basic.get("organization_name", ""),
+        "enumeration_type": result.get("enumeration_type", ""),
+        "primary_specialty": primary_specialty,
+        "organization_name": basic.get("organization_name", ""),
+        "address": full_address,
+        "license": license_number,
+        "status": basic.get("status", ""),
+        "registry_found": True
+    }
+
 
 class NPIRegistrySearchToolInput(BaseModel):
     npi_number: str = Field(..., description="The 10-digit NPI number to search for.")
@@ -18,56 +118,24 @@ class NPIRegistrySearchTool(BaseTool):
     def _run(self, npi_number: str) -> str:
         """
         Queries the CMS NPI Registry API for the given NPI number.
+        Answers (found or "Not Found") are served from / stored in the registry cache.
+        With NPI_REGISTRY_BACKEND set to "nppes" or "nppes_then_api" the offline
+        NPPES index (app/tools/nppes_index.py) is consulted first.
         """
-        url = f"https://npiregistry.cms.hhs.gov/api/?version=2.1&number={npi_number}"
-        
+        offline = lookup_offline(npi_number)
+        if offline is not None:
+            return json.dumps(offline, indent=2)
+
+        cached = registry_cache.get(npi_number)
+        if cached is not None:
+            return json.dumps(cached, indent=2)
+
         try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            # Check results
-            if "results" not in data or not data["results"]:
-                return json.dumps({
-                    "npi_number": npi_number,
-                    "registry_found": False,
-                    "status": "Not Found"
-                })
-            
-            result = data["results"][0]
-            basic = result.get("basic", {})
-            addresses = result.get("addresses", [])
-            taxonomies = result.get("taxonomies", [])
-            
-            # Extract primary address (usually purpose='LOCATION')
-            primary_address = next((addr for addr in addresses if addr.get("address_purpose") == "LOCATION"), addresses[0] if addresses else {})
-            
-            # Construct formatted address
-            addr_parts = [
-                primary_address.get("address_1", ""),
-                primary_address.get("address_2", ""),
-                primary_address.get("city", ""),
-                primary_address.get("state", ""),
-                primary_address.get("postal_code", "")
-            ]
-            full_address = ", ".join([p for p in addr_parts if p]).strip()
-            
-            # Extract primary specialty
-            primary_specialty = next((t.get("desc") for t in taxonomies if t.get("primary")), "Unknown")
-            
-            output = {
-                "npi_number": str(result.get("number")),
-                "provider_name": f"{basic.get('first_name', '')} {basic.get('last_name', '')} {basic.get('credential', '')}".strip() or basic.get("organization_name", ""),
-                "enumeration_type": result.get("enumeration_type", ""),
-                "primary_specialty": primary_specialty,
-                "organization_name": basic.get("organization_name", ""),
-                "address": full_address,
-                "status": basic.get("status", ""),
-                "registry_found": True
-            }
-            
+            data = get_rate_limiter("npi").call(_fetch_registry, registry_url(npi_number))
+            output = format_registry_response(npi_number, data)
+            registry_cache.put(npi_number, output)
             return json.dumps(output, indent=2)
-            
+
         except Exception as e:
             return json.dumps({
                 "npi_number": npi_number,
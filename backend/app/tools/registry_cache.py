@@ -0,0 +1,135 @@
+"""
+Two-tier cache for NPI registry lookups.
+
+Tier 1 is an in-process LRU; tier 2 is the `registry_cache` table, shared by every
+API/worker process on the same database. Found records and "Not Found" answers
+have separate TTLs; transient errors are never cached.
+
+Environment:
+    NPI_CACHE_TTL_SECONDS           TTL for found records (default 7 days)
+    NPI_CACHE_NEGATIVE_TTL_SECONDS  TTL for "Not Found" answers (default 1 day)
+    NPI_CACHE_MAX_ENTRIES           In-memory LRU size (default 10000)
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from ..database import SessionLocal
+from ..models import RegistryCacheEntry
+
+
+class RegistryCache:
+    def __init__(self, ttl_seconds: float, negative_ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.max_entries = max_entries
+        self._memory = OrderedDict()  # npi -> (expires_at monotonic, payload)
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "db_hits": 0, "misses": 0, "stores": 0}
+
+    def _ttl(self, payload: dict) -> float:
+        return self.ttl_seconds if payload.get("registry_found") else self.negative_ttl_seconds
+
+    def _remember(self, npi: str, payload: dict, age_seconds: float = 0.0):
+        expires_at = time.monotonic() + self._ttl(payload) - age_seconds
+        with self._lock:
+            self._memory[npi] = (expires_at, payload)
+            self._memory.move_to_end(npi)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, npi: str) -> Optional[dict]:
+        """Return the cached registry payload for `npi`, or None on a miss/expiry."""
+        with self._lock:
+            entry = self._memory.get(npi)
+            if entry:
+                if entry[0] > time.monotonic():
+                    self._memory.move_to_end(npi)
+                    self.stats["memory_hits"] += 1
+                    return entry[1]
+                del self._memory[npi]
+
+        db = SessionLocal()
+        try:
+            row = db.get(RegistryCacheEntry, npi)
+            if row and row.fetched_at:
+                age = (datetime.utcnow() - row.fetched_at).total_seconds()
+                if age < self._ttl(row.payload or {}):
+                    self._remember(npi, row.payload, age)
+                    with self._lock:
+                        self.stats["db_hits"] += 1
+                    return row.payload
+        except SQLAlchemyError as e:
+            print(f"[RegistryCache] Read failed for {npi}: {e}")
+        finally:
+            db.close()
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def put(self, npi: str, payload: dict):
+        """Store a found or "Not Found" payload in both tiers."""
+        self._remember(npi, payload)
+        db = SessionLocal()
+        try:
+            db.merge(RegistryCacheEntry(
+                npi=npi,
+                payload=payload,
+                registry_found=bool(payload.get("registry_found")),
+                fetched_at=datetime.utcnow()
+            ))
+            db.commit()
+            with self._lock:
+                self.stats["stores"] += 1
+        except SQLAlchemyError as e:
+            # Another worker may have stored the same NPI concurrently; the memory tier still has it
+            db.rollback()
+            print(f"[RegistryCache] Write failed for {npi}: {e}")
+        finally:
+            db.close()
+
+    def purge_expired(self) -> int:
+        """Delete expired rows from the durable tier."""
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            deleted = db.query(RegistryCacheEntry).filter(
+                ((RegistryCacheEntry.registry_found == True) & (RegistryCacheEntry.fetched_at < now - timedelta(seconds=self.ttl_seconds))) |
+                ((RegistryCacheEntry.registry_found == False) & (RegistryCacheEntry.fetched_at < now - timedelta(seconds=self.negative_ttl_seconds)))
+            ).delete(synchronize_session=False)
+            db.commit()
+            return deleted
+        finally:
+            db.close()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        db = SessionLocal()
+        try:
+            db.query(RegistryCacheEntry).delete()
+            db.commit()
+        finally:
+            db.close()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["db_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["db_hits"]) / lookups, 3) if lookups else 0.0
+        return stats
+
+
+registry_cache = RegistryCache(
+    ttl_seconds=float(os.getenv("NPI_CACHE_TTL_SECONDS", 7 * 24 * 3600)),
+    negative_ttl_seconds=float(os.getenv("NPI_CACHE_NEGATIVE_TTL_SECONDS", 24 * 3600)),
+    max_entries=int(os.getenv("NPI_CACHE_MAX_ENTRIES", 10000)),
+)
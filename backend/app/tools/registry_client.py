@@ -0,0 +1,130 @@
+"""
+Async NPI registry client for batch enrichment.
+
+One client is created per job: it keeps a pooled keep-alive HTTP connection,
+bounds concurrent requests, and coalesces lookups so every distinct NPI is
+fetched at most once per job (concurrent callers for the same NPI await the same
+in-flight request). Results go through the same offline index, cache and rate
+limiter as NPIRegistrySearchTool and have the same dict shape.
+
+    async with AsyncRegistryClient() as client:
+        results = await client.lookup_many(["1234567890", "1987654321"])
+
+Environment:
+    NPI_REGISTRY_CONCURRENCY  Max concurrent registry requests per job (default 10)
+"""
+
+import asyncio
+import os
+from typing import Dict, Iterable
+
+import httpx
+
+from .cancellation import run_cancellable
+from .rate_limit import get_rate_limiter, is_rate_limit_error, retry_after_seconds
+from .registry import format_registry_response, lookup_offline, registry_url
+from .registry_cache import registry_cache
+
+NPI_REGISTRY_CONCURRENCY = int(os.getenv("NPI_REGISTRY_CONCURRENCY", 10))
+
+
+class AsyncRegistryClient:
+    def __init__(self, max_concurrency: int = NPI_REGISTRY_CONCURRENCY, timeout: float = 10.0):
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+        self._client = None
+        self._semaphore = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._results: Dict[str, dict] = {}
+        self.network_requests = 0
+
+    async def __aenter__(self):
+        self._client = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency),
+        )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self):
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+
+    async def lookup(self, npi_number: str) -> dict:
+        """Return the registry dict for one NPI, sharing any in-flight request for it."""
+        npi_number = str(npi_number).strip()
+        if npi_number in self._results:
+            return self._results[npi_number]
+        if npi_number in self._inflight:
+            return await asyncio.shield(self._inflight[npi_number])
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[npi_number] = future
+        try:
+            result = await self._resolve(npi_number)
+            future.set_result(result)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved so waiter-less failures aren't reported as unhandled
+            raise
+        finally:
+            del self._inflight[npi_number]
+        self._results[npi_number] = result
+        return result
+
+    async def lookup_many(self, npi_numbers: Iterable[str]) -> Dict[str, dict]:
+        """Look up many NPIs concurrently; duplicates are fetched once."""
+        unique = list(dict.fromkeys(str(n).strip() for n in npi_numbers))
+        results = await asyncio.gather(*(self.lookup(n) for n in unique))
+        return dict(zip(unique, results))
+
+    async def _resolve(self, npi_number: str) -> dict:
+        offline = lookup_offline(npi_number)
+        if offline is not None:
+            return offline
+
+        cached = await asyncio.to_thread(registry_cache.get, npi_number)
+        if cached is not None:
+            return cached
+
+        try:
+            output = format_registry_response(npi_number, await self._fetch(npi_number))
+        except Exception as e:
+            return {"npi_number": npi_number, "registry_found": False, "error": str(e)}
+        await asyncio.to_thread(registry_cache.put, npi_number, output)
+        return output
+
+    async def _fetch(self, npi_number: str) -> dict:
+        if self._client is None:
+            raise RuntimeError("AsyncRegistryClient must be used as 'async with AsyncRegistryClient() as client'")
+        limiter = get_rate_limiter("npi")
+        async with self._semaphore:
+            for attempt in range(limiter.max_retries + 1):
+                await asyncio.to_thread(limiter.acquire)
+                self.network_requests += 1
+                try:
+                    response = await self._client.get(registry_url(npi_number))
+                    response.raise_for_status()
+                except httpx.HTTPStatusError as e:
+                    if not is_rate_limit_error(e) or attempt >= limiter.max_retries:
+                        raise
+                    limiter.on_throttle(retry_after_seconds(e), attempt)
+                    continue
+                limiter.on_success()
+                return response.json()
+
+
+def prefetch_registry(npi_numbers: Iterable[str], max_concurrency: int = NPI_REGISTRY_CONCURRENCY) -> Dict[str, dict]:
+    """Synchronous helper for the crew pipeline: resolve all NPIs of a batch concurrently."""
+    async def _run():
+        async with AsyncRegistryClient(max_concurrency) as client:
+            # In-flight requests are cancelled with the job
+            return await run_cancellable(client.lookup_many(npi_numbers))
+    return asyncio.run(_run())
@@ -0,0 +1,198 @@
+"""
+Deterministic parser for structured provider rosters (CSV/TSV/XLSX).
+
+Rosters already carry the provider fields as columns, so instead of sending the
+file to Gemini we stream the rows and map recognised headers ("NPI",
+"Provider Name", "Taxonomy", "License #", ...) onto the extraction schema:
+full_name, npi, specialty, address, license.
+
+`parse_roster` returns None when the header row isn't recognised; callers then
+fall back to LLM extraction (`roster_to_text` renders XLSX for that path).
+"""
+
+import csv
+import re
+import sys
+from typing import Dict, Iterator, List, Optional
+
+csv.field_size_limit(sys.maxsize)
+
+STRUCTURED_EXTENSIONS = (".csv", ".tsv", ".xlsx", ".xlsm")
+
+# Normalized header -> schema field. Address parts are joined in this order.
+HEADER_ALIASES = {
+    "npi": ["npi", "npi number", "npi no", "npi num", "npi id", "provider npi", "individual npi", "national provider identifier", "type 1 npi"],
+    "full_name": ["provider name", "name", "full name", "provider full name", "provider", "physician", "physician name",
+                  "practitioner", "practitioner name", "clinician", "clinician name", "doctor", "doctor name"],
+    "first_name": ["first name", "provider first name", "first", "given name"],
+    "middle_name": ["middle name", "middle initial", "mi"],
+    "last_name": ["last name", "provider last name", "last", "surname", "family name"],
+    "credential": ["credential", "credentials", "degree", "suffix", "title"],
+    "specialty": ["specialty", "speciality", "primary specialty", "provider specialty", "taxonomy", "taxonomy description",
+                  "primary taxonomy", "taxonomy desc", "specialty description", "practice specialty"],
+    "address": ["address", "practice address", "street address", "address 1", "address line 1", "address1", "street",
+                "practice location", "location address", "office address", "service address"],
+    "address_2": ["address 2", "address line 2", "address2", "suite", "suite unit"],
+    "city": ["city", "practice city"],
+    "state": ["state", "st", "practice state"],
+    "zip": ["zip", "zip code", "zipcode", "postal code", "postal", "practice zip"],
+    "license": ["license", "license number", "license no", "license num", "license id", "state license", "state license number",
+                "medical license", "medical license number", "lic", "lic no", "lic number"],
+}
+
+_ALIAS_LOOKUP = {alias: field for field, aliases in HEADER_ALIASES.items() for alias in aliases}
+
+
+def normalize_header(header: str) -> str:
+    header = (header or "").strip().lower().replace("#", " number ")
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", header).split())
+
+
+def map_headers(headers: List[str]) -> Optional[Dict[str, int]]:
+    """
+    Map schema fields to column indexes.
+
+    Returns None unless the layout has an identity column (NPI or a name) plus
+    at least one other provider field.
+    """
+    mapping = {}
+    for i, header in enumerate(headers):
+        field = _ALIAS_LOOKUP.get(normalize_header(header))
+        if field and field not in mapping:
+            mapping[field] = i
+
+    has_name = "full_name" in mapping or "last_name" in mapping
+    if not ("npi" in mapping or has_name):
+        return None
+    other_fields = {"npi", "full_name", "last_name", "specialty", "address", "license"} & mapping.keys()
+    if len(other_fields) < 2:
+        return None
+    return mapping
+
+
+def _cell(row: list, mapping: Dict[str, int], field: str) -> str:
+    i = mapping.get(field)
+    if i is None or i >= len(row) or row[i] is None:
+        return ""
+    value = row[i]
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # XLSX stores NPIs as numbers
+    return str(value).strip()
+
+
+def row_to_provider(row: list, mapping: Dict[str, int]) -> Optional[dict]:
+    """Provider dict for one data row under a `map_headers` mapping (None for a blank row)."""
+    full_name = _cell(row, mapping, "full_name")
+    if not full_name:
+        parts = [_cell(row, mapping, f) for f in ("first_name", "middle_name", "last_name", "credential")]
+        full_name = " ".join(p for p in parts if p)
+
+    npi = re.sub(r"\D", "", _cell(row, mapping, "npi")) or None
+
+    address_parts = [_cell(row, mapping, f) for f in ("address", "address_2", "city", "state", "zip")]
+    address = ", ".join(p for p in address_parts if p) or None
+
+    provider = {
+        "full_name": full_name or None,
+        "npi": npi,
+        "specialty": _cell(row, mapping, "specialty") or None,
+        "address": address,
+        "license": _cell(row, mapping, "license") or None,
+    }
+    if not provider["full_name"] and not provider["npi"]:
+        return None  # Blank / separator row
+    return provider
+
+
+def _iter_csv(file_path: str) -> Iterator[list]:
+    with open(file_path, newline="", encoding="utf-8-sig", errors="ignore") as f:
+        sample = f.read(8192)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",\t;|")
+        except csv.Error:
+            dialect = csv.excel_tab if file_path.lower().endswith(".tsv") else csv.excel
+        yield from csv.reader(f, dialect)
+
+
+def _iter_xlsx(file_path: str) -> Iterator[list]:
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise RuntimeError("openpyxl is required to read XLSX rosters (pip install openpyxl)")
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            yield list(row)
+    finally:
+        workbook.close()
+
+
+def iter_rows(file_path: str) -> Iterator[list]:
+    """Stream raw rows (header first) from a CSV/TSV/XLSX file."""
+    if file_path.lower().endswith((".xlsx", ".xlsm")):
+        return _iter_xlsx(file_path)
+    return _iter_csv(file_path)
+
+
+def is_structured_file(file_path: str) -> bool:
+    return file_path.lower().endswith(STRUCTURED_EXTENSIONS)
+
+
+def parse_roster(file_path: str, extraction_mode: str = "batch", header_scan_rows: int = 10) -> Optional[list]:
+    """
+    Parse a structured roster without the LLM.
+
+    The header row is searched for within the first `header_scan_rows` rows
+    (rosters often start with a title line). In "single" mode only the first
+    provider is returned.
+
+    Returns:
+        List of provider dicts, or None if the layout isn't recognised
+    """
+    rows = iter_rows(file_path)
+    mapping = None
+    for _ in range(header_scan_rows):
+        header = next(rows, None)
+        if header is None:
+            return None
+        mapping = map_headers([str(h) if h is not None else "" for h in header])
+        if mapping:
+            break
+    if not mapping:
+        return None
+
+    providers = []
+    for row in rows:
+        provider = row_to_provider(row, mapping)
+        if provider:
+            providers.append(provider)
+            if extraction_mode == "single":
+                break
+    return providers
+
+
+def roster_to_text(file_path: str, max_chars: Optional[int] = 30000) -> str:
+    """Render a roster as CSV text for the LLM fallback path (`max_chars=None` renders every row)."""
+    lines, size = [], 0
+    for row in iter_rows(file_path):
+        line = ",".join("" if v is None else str(v) for v in row)
+        size += len(line) + 1
+        if max_chars is not None and size > max_chars:
+            break
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def describe_mapping(file_path: str) -> str:
+    """Human-readable summary of the recognised columns (for job logs)."""
+    rows = iter_rows(file_path)
+    for _ in range(10):
+        header = next(rows, None)
+        if header is None:
+            break
+        header = [str(h) if h is not None else "" for h in header]
+        mapping = map_headers(header)
+        if mapping:
+            return ", ".join(f"{header[i]!r}->{field}" for field, i in mapping.items())
+    return "unrecognised"
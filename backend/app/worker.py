@@ -0,0 +1,338 @@
+"""
+Durable validation job queue backed by the validation_jobs table.
+
+The API only stores the upload and inserts a "queued" ValidationJob row.
+Workers claim queued rows with a conditional UPDATE (so any number of worker
+processes, on any number of nodes sharing the database, never run the same job
+twice), run the CrewAI pipeline and keep a heartbeat on the row. Jobs whose
+worker died mid-run are re-queued once their heartbeat goes stale.
+
+Run standalone workers with:
+    python -m app.worker --workers 2
+
+Environment:
+    UPLOAD_DIR              Where uploads are stored (must be shared between API and workers)
+    AVE_EMBEDDED_WORKERS    Worker threads started inside the API process (default 1, 0 = none)
+    AVE_WORKER_POLL_SECONDS Idle poll interval (default 2)
+    AVE_JOB_STALE_SECONDS   Heartbeat age after which a running job is re-queued (default 300)
+    AVE_JOB_MAX_ATTEMPTS    Claims per job before it is marked as error (default 3)
+    AVE_MAX_UPLOAD_MB       Largest accepted upload (default 100)
+    AVE_JOB_CANCEL_POLL_SECONDS  How often a running job checks its row for a cancel
+                            made by another process (default 2)
+"""
+
+import argparse
+import os
+import re
+import uuid
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import BinaryIO, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal, engine, Base
+from .models import ValidationJob
+from .log_sink import LogScope, log_sink, maybe_prune_agent_logs
+from .events import publish_job
+from .job_state import JOB_PROGRESS_PERSIST_SECONDS, job_states
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", os.path.join(os.getcwd(), "uploads"))
+POLL_SECONDS = float(os.getenv("AVE_WORKER_POLL_SECONDS", 2))
+STALE_SECONDS = float(os.getenv("AVE_JOB_STALE_SECONDS", 300))
+MAX_ATTEMPTS = int(os.getenv("AVE_JOB_MAX_ATTEMPTS", 3))
+HEARTBEAT_SECONDS = max(1.0, STALE_SECONDS / 5)
+CANCEL_POLL_SECONDS = float(os.getenv("AVE_JOB_CANCEL_POLL_SECONDS", 2))
+MAX_UPLOAD_BYTES = int(float(os.getenv("AVE_MAX_UPLOAD_MB", 100)) * 1024 * 1024)
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+def store_upload(stream: BinaryIO, filename: str, max_bytes: int = MAX_UPLOAD_BYTES) -> str:
+    """
+    Copy an upload stream into UPLOAD_DIR in fixed-size chunks.
+
+    The file is written as "<name>.part" and renamed once complete, so workers
+    and orphan cleanup never see a partial upload. Memory use is one chunk
+    regardless of the upload size.
+
+    Returns:
+        Path of the stored file
+
+    Raises:
+        UploadTooLarge: if the stream exceeds `max_bytes` (nothing is left on disk)
+    """
+    clean_filename = re.sub(r'[^a-zA-Z0-9_.-]', '_', filename or "upload")
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    file_path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4()}_{clean_filename}")
+    part_path = file_path + ".part"
+    size = 0
+    try:
+        with open(part_path, "wb") as f:
+            while True:
+                chunk = stream.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"Upload exceeds the {max_bytes // (1024 * 1024)} MB limit")
+                f.write(chunk)
+        os.replace(part_path, file_path)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    return file_path
+
+
+def remove_orphaned_uploads(db: Session, min_age_seconds: float = 3600) -> int:
+    """Delete stored uploads (and abandoned .part files) that no queued or running job refers to."""
+    if not os.path.isdir(UPLOAD_DIR):
+        return 0
+    active = {
+        path for (path,) in db.query(ValidationJob.file_path)
+        .filter(ValidationJob.status.in_(["queued", "running"]))
+    }
+    cutoff = time.time() - min_age_seconds
+    removed = 0
+    for name in os.listdir(UPLOAD_DIR):
+        path = os.path.join(UPLOAD_DIR, name)
+        if path in active or not os.path.isfile(path) or os.path.getmtime(path) > cutoff:
+            continue
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError:
+            pass
+    if removed:
+        print(f"[Worker] Removed {removed} orphaned upload(s) from {UPLOAD_DIR}")
+    return removed
+
+
+def enqueue_job(db: Session, filename: str, file_path: str) -> ValidationJob:
+    """Insert a queued job for an upload already stored at `file_path`."""
+    job = ValidationJob(filename=filename, file_path=file_path, status="queued", current_step="queued")
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    publish_job(job)
+    return job
+
+
+def claim_next_job(db: Session, worker_id: str) -> Optional[ValidationJob]:
+    """
+    Atomically claim the oldest queued job.
+
+    The UPDATE only matches while the row is still "queued", so when several
+    workers race for the same row exactly one sees rowcount == 1.
+    """
+    while True:
+        candidate = (
+            db.query(ValidationJob.id)
+            .filter(ValidationJob.status == "queued")
+            .order_by(ValidationJob.id)
+            .first()
+        )
+        if not candidate:
+            return None
+
+        now = datetime.utcnow()
+        result = db.execute(
+            update(ValidationJob)
+            .where(ValidationJob.id == candidate.id, ValidationJob.status == "queued")
+            .values(
+                status="running",
+                current_step="starting",
+                worker_id=worker_id,
+                claimed_at=now,
+                heartbeat_at=now,
+                attempts=ValidationJob.attempts + 1,
+            )
+        )
+        db.commit()
+        if result.rowcount == 1:
+            job = db.query(ValidationJob).filter(ValidationJob.id == candidate.id).first()
+            publish_job(job)
+            return job
+        # Lost the race to another worker; try the next queued row
+
+
+def requeue_stale_jobs(db: Session, stale_seconds: float = STALE_SECONDS) -> int:
+    """Return jobs whose worker stopped heart-beating to the queue (or fail them after MAX_ATTEMPTS)."""
+    cutoff = datetime.utcnow() - timedelta(seconds=stale_seconds)
+    stale = ValidationJob.status == "running", ValidationJob.heartbeat_at < cutoff
+
+    failed = db.execute(
+        update(ValidationJob)
+        .where(*stale, ValidationJob.attempts >= MAX_ATTEMPTS)
+        .values(status="error", current_step="failed")
+    ).rowcount
+    requeued = db.execute(
+        update(ValidationJob)
+        .where(*stale, ValidationJob.attempts < MAX_ATTEMPTS)
+        .values(status="queued", current_step="queued", worker_id=None)
+    ).rowcount
+    db.commit()
+
+    if requeued or failed:
+        log_sink.emit("System", f"Recovered stale jobs: {requeued} re-queued, {failed} failed after {MAX_ATTEMPTS} attempts.", "WARN")
+    return requeued
+
+
+def _heartbeat(job_id: int, stop: threading.Event):
+    """
+    Keep the claimed row fresh so other workers don't treat it as abandoned.
+
+    The same thread writes the job's in-memory progress (app/job_state.py) and
+    picks up cancellations made by other processes, so the pipeline itself never
+    queries validation_jobs for either.
+    """
+    tick = max(0.1, min(CANCEL_POLL_SECONDS, JOB_PROGRESS_PERSIST_SECONDS, HEARTBEAT_SECONDS))
+    last_beat = last_poll = time.monotonic()
+    while not stop.wait(tick):
+        job_states.persist(job_id, min_age=JOB_PROGRESS_PERSIST_SECONDS)
+        now = time.monotonic()
+        if now - last_poll < CANCEL_POLL_SECONDS and now - last_beat < HEARTBEAT_SECONDS:
+            continue
+        db = SessionLocal()
+        try:
+            if now - last_poll >= CANCEL_POLL_SECONDS:
+                last_poll = now
+                status = db.query(ValidationJob.status).filter(ValidationJob.id == job_id).scalar()
+                if status == "cancelled" and job_states.cancel(job_id):
+                    print(f"[Worker] Job {job_id} was cancelled, stopping its in-flight requests")
+            if now - last_beat >= HEARTBEAT_SECONDS:
+                last_beat = now
+                db.execute(
+                    update(ValidationJob)
+                    .where(ValidationJob.id == job_id, ValidationJob.status == "running")
+                    .values(heartbeat_at=datetime.utcnow())
+                )
+                db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"[Worker] Heartbeat failed for job {job_id}: {e}")
+        finally:
+            db.close()
+
+
+def process_job(job: ValidationJob, db: Session):
+    """Run the validation pipeline for a claimed job and finalise its row."""
+    # CrewAI/Gemini are only imported once a worker actually runs a job, so the API
+    # process (which imports this module for enqueue_job/store_upload) starts fast
+    from .crew.crew import run_validation_crew
+
+    # Progress and cancellation live in memory while the job runs (app/job_state.py)
+    state = job_states.start(job)
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(job.id, stop), daemon=True)
+    heartbeat.start()
+    try:
+        with LogScope(job.id), state.token:
+            run_validation_crew(job.file_path, job.filename, db, job.id)
+    except Exception as e:
+        job_states.finish(job.id)
+        db.rollback()
+        print(f"[Worker] Job {job.id} failed: {e}")
+        db.query(ValidationJob).filter(ValidationJob.id == job.id).update(
+            {"status": "error", "current_step": "failed"}
+        )
+        db.commit()
+        publish_job(db.query(ValidationJob).filter(ValidationJob.id == job.id).first())
+        with LogScope(job.id):
+            log_sink.emit("System", f"Job failed: {e}", "ERROR")
+    finally:
+        stop.set()
+        job_states.finish(job.id)
+        # The job is finished (or failed): make its whole log stream visible now
+        log_sink.flush()
+
+    # Job reached a terminal state: the stored upload is no longer needed for retries
+    db.expire_all()
+    job = db.query(ValidationJob).filter(ValidationJob.id == job.id).first()
+    if job and job.status != "queued" and job.file_path and os.path.exists(job.file_path):
+        os.remove(job.file_path)
+
+
+def run_worker(worker_id: str, stop: Optional[threading.Event] = None, once: bool = False):
+    """Claim and run jobs until `stop` is set (or the queue is empty when `once` is True)."""
+    stop = stop or threading.Event()
+    print(f"[Worker] {worker_id} started")
+    while not stop.is_set():
+        db = SessionLocal()
+        try:
+            requeue_stale_jobs(db)
+            maybe_prune_agent_logs(db)
+            job = claim_next_job(db, worker_id)
+            if job:
+                print(f"[Worker] {worker_id} claimed job {job.id} ({job.filename})")
+                process_job(job, db)
+                continue
+        except Exception as e:
+            print(f"[Worker] {worker_id} error: {e}")
+        finally:
+            db.close()
+
+        if once:
+            break
+        stop.wait(POLL_SECONDS)
+
+
+def make_worker_id(index: int = 0) -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{index}"
+
+
+def start_worker_threads(count: int) -> threading.Event:
+    """Start `count` daemon worker threads in this process; set the returned event to stop them."""
+    stop = threading.Event()
+    if count > 0:
+        db = SessionLocal()
+        try:
+            remove_orphaned_uploads(db)
+        finally:
+            db.close()
+    for i in range(count):
+        threading.Thread(target=run_worker, args=(make_worker_id(i), stop), daemon=True).start()
+    return stop
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AVE validation job worker")
+    parser.add_argument("--workers", type=int, default=1, help="Worker threads in this process")
+    parser.add_argument("--once", action="store_true", help="Drain the queue and exit")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+    if args.once:
+        db = SessionLocal()
+        try:
+            remove_orphaned_uploads(db)
+        finally:
+            db.close()
+        run_worker(make_worker_id(), once=True)
+        return
+
+    stop = start_worker_threads(args.workers)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("[Worker] Shutting down (running jobs will be re-queued once their heartbeat expires)")
+        stop.set()
+        log_sink.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Database concurrency benchmark: API read latency while a job writes.
+
+For each engine profile (DB_ENGINE_PROFILE, see app/database.py), against a
+throwaway database:
+  1. seeds --providers providers
+  2. runs a writer process doing what a validation job does: chunks of
+     validation results (save_validation_results), agent log batches and
+     job progress updates
+  3. runs --readers reader processes issuing the queries behind the Registry
+     and Dashboard GET endpoints (provider pages, name search, dashboard
+     stats, recent logs), timing each one
+
+Reports read latency percentiles, "database is locked" errors and the
+writer's throughput.
+
+Usage (from backend/):
+    python benchmark_db_concurrency.py --seconds 10 --readers 8
+    DATABASE_URL=postgresql://... python benchmark_db_concurrency.py --profiles tuned
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+DEFAULT_SQLITE_PATH = "/tmp/ave_db_benchmark_{profile}.db"
+
+
+def child_command(role: str, args) -> list:
+    return [sys.executable, __file__, "--role", role, "--seconds", str(args.seconds), "--providers", str(args.providers)]
+
+
+def child_output(process: subprocess.Popen, name: str) -> dict:
+    stdout, stderr = process.communicate(None if process.stdin is None or process.stdin.closed else "")
+    if process.returncode != 0:
+        raise RuntimeError(f"{name} failed:\n{stderr[-2000:]}")
+    return json.loads(stdout.strip().splitlines()[-1])
+
+
+def run_profile(profile: str, args) -> dict:
+    env = dict(os.environ, DB_ENGINE_PROFILE=profile, AVE_EMBEDDED_WORKERS="0")
+    if "DATABASE_URL" not in os.environ:
+        path = DEFAULT_SQLITE_PATH.format(profile=profile)
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        env["DATABASE_URL"] = f"sqlite:///{path}"
+
+    def spawn(role: str) -> subprocess.Popen:
+        return subprocess.Popen(child_command(role, args), env=env, text=True,
+                                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    child_output(spawn("seed"), "seed")
+    # Separate processes, like the API and a worker: no shared GIL, only the database between them
+    writer = spawn("writer")
+    readers = [spawn("reader") for _ in range(args.readers)]
+    # Each child prints "ready" once imported and connected, then waits for "go"
+    for process in [writer] + readers:
+        if process.stdout.readline().strip() != "ready":
+            raise RuntimeError(f"Benchmark process failed to start:\n{process.stderr.read()[-2000:]}")
+    for process in [writer] + readers:
+        process.stdin.write("go\n")
+        process.stdin.flush()
+    write_stats = child_output(writer, "writer")
+    read_stats = [child_output(reader, "reader") for reader in readers]
+
+    latencies = sorted(ms for stats in read_stats for ms in stats["latencies"])
+    percentile = lambda p: round(latencies[min(len(latencies) - 1, int(len(latencies) * p))], 2) if latencies else None
+    errors = write_stats["errors"] + [error for stats in read_stats for error in stats["errors"]]
+    return {
+        "reads": len(latencies),
+        "read_p50_ms": percentile(0.50),
+        "read_p95_ms": percentile(0.95),
+        "read_p99_ms": percentile(0.99),
+        "read_max_ms": round(latencies[-1], 2) if latencies else None,
+        "read_mean_ms": round(statistics.mean(latencies), 2) if latencies else None,
+        "write_chunks_per_s": round(write_stats["chunks"] / args.seconds, 1),
+        "locked_errors": sum("locked" in error for error in errors),
+        "other_errors": sum("locked" not in error for error in errors),
+    }
+
+
+def child(role: str, args) -> dict:
+    from sqlalchemy.exc import OperationalError
+
+    from app.database import Base, SessionLocal, engine
+    from app.models import AgentLog, ValidationJob
+    from app.provider_search import ensure_search_index, search_providers
+    from app.provider_stats import dashboard_stats
+
+    def result(n: int, status: str) -> tuple:
+        provider = {"full_name": f"Provider {n} Smith", "npi": str(1000000000 + n), "specialty": "Cardiology",
+                    "address": f"{n} Main St", "license": f"L{n}"}
+        return provider, {"registry_found": True}, {"status": status, "confidence_score": n % 100, "discrepancies": []}, None
+
+    db = SessionLocal()
+    errors = []
+
+    def wait_for_start() -> float:
+        print("ready", flush=True)
+        sys.stdin.readline()
+        return time.monotonic() + args.seconds
+
+    if role == "seed":
+        from app.crew.crew import save_validation_results
+        Base.metadata.create_all(bind=engine)
+        ensure_search_index(engine)
+        db.add(ValidationJob(filename="benchmark", status="running"))
+        db.commit()
+        for start in range(0, args.providers, 500):
+            save_validation_results(db, [result(n, "Validated") for n in range(start, min(start + 500, args.providers))])
+        return {}
+
+    if role == "writer":
+        from app.crew.crew import save_validation_results
+        job_id = db.query(ValidationJob.id).scalar()
+        n, chunks = args.providers, 0
+        db.rollback()
+        deadline = wait_for_start()
+        while time.monotonic() < deadline:
+            try:
+                # A persist chunk (half updates, half new providers), a log flush and a progress write
+                batch = [result(random.randrange(n), random.choice(("Validated", "Flagged"))) for _ in range(12)]
+                batch += [result(n + i, "Flagged") for i in range(13)]
+                n += 13
+                save_validation_results(db, batch)
+                db.bulk_insert_mappings(AgentLog, [
+                    {"agent_name": "Benchmark", "message": f"log line {i}", "level": "INFO", "job_id": job_id}
+                    for i in range(50)
+                ])
+                db.query(ValidationJob).filter(ValidationJob.id == job_id).update({"processed_providers": n})
+                db.commit()
+                chunks += 1
+            except OperationalError as e:
+                db.rollback()
+                errors.append(f"write: {e.orig}")
+        return {"chunks": chunks, "errors": errors}
+
+    # Reader: the queries behind the Registry and Dashboard GET endpoints
+    ensure_search_index(engine)
+    dashboard_stats(db)
+    db.rollback()
+    latencies = []
+    deadline = wait_for_start()
+    while time.monotonic() < deadline:
+        query = random.choice(("page", "search", "stats", "logs"))
+        started = time.perf_counter()
+        try:
+            if query == "page":
+                search_providers(db, status=random.choice((None, "Flagged")), limit=100)
+            elif query == "search":
+                search_providers(db, q=f"provider {random.randrange(1, 99)}", limit=20)
+            elif query == "stats":
+                dashboard_stats(db)
+            else:
+                db.execute(AgentLog.__table__.select().order_by(AgentLog.id.desc()).limit(50)).all()
+            db.rollback()  # end the read transaction, like a request's session close
+            latencies.append((time.perf_counter() - started) * 1000)
+        except OperationalError as e:
+            db.rollback()
+            errors.append(f"read: {e.orig}")
+    return {"latencies": latencies, "errors": errors}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--providers", type=int, default=20000, help="Providers seeded before measuring")
+    parser.add_argument("--profiles", default="default,tuned", help="Comma-separated DB_ENGINE_PROFILE values")
+    parser.add_argument("--role", choices=("seed", "writer", "reader"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.role:
+        print(json.dumps(child(args.role, args)))
+        return
+
+    print(f"{args.readers} readers, 1 writer, {args.seconds:g}s per profile, {args.providers} seeded providers\n")
+    columns = ("reads", "read_p50_ms", "read_p95_ms", "read_p99_ms", "read_max_ms", "write_chunks_per_s",
+               "locked_errors", "other_errors")
+    print(f"{'profile':<10}" + "".join(f"{column:>20}" for column in columns))
+    for profile in args.profiles.split(","):
+        stats = run_profile(profile, args)
+        print(f"{profile:<10}" + "".join(f"{str(stats[column]):>20}" for column in columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+API cold-start benchmark.
+
+Measures, in fresh interpreter processes:
+  1. import time of app.main (what every uvicorn worker pays before serving)
+  2. import time of the worker-only pipeline (app.crew.crew) for comparison
+  3. time from launching uvicorn until GET / answers 200 (replica readiness)
+
+Usage (from backend/):
+    python benchmark_startup.py --runs 5
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+
+
+def bench_env() -> dict:
+    env = dict(os.environ)
+    # Readiness of the API alone: no embedded workers, throwaway database
+    env.setdefault("AVE_EMBEDDED_WORKERS", "0")
+    env.setdefault("DATABASE_URL", "sqlite:////tmp/ave_startup_benchmark.db")
+    return env
+
+
+def import_time(module: str) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET.format(module=module)],
+        capture_output=True, text=True, check=True, env=bench_env(),
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def readiness_time(timeout: float = 60.0) -> float:
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=bench_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.02)
+        raise TimeoutError(f"API not ready after {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def report(label: str, samples: list):
+    print(f"{label:<32} median {statistics.median(samples):6.3f}s   min {min(samples):6.3f}s   max {max(samples):6.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure AVE API cold start")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    report("import app.main", [import_time("app.main") for _ in range(args.runs)])
+    report("import app.crew.crew (worker)", [import_time("app.crew.crew") for _ in range(args.runs)])
+    report("uvicorn start -> GET / 200", [readiness_time() for _ in range(args.runs)])
+
+
+if __name__ == "__main__":
+    main()
@@ -7,19 +7,97 @@ load_dotenv()
 
 from app.database import SQLALCHEMY_DATABASE_URL
 
+# (table, column, DDL type) - applied in order, skipped if already present
+COLUMN_MIGRATIONS = [
+    ("system_config", "extraction_mode", "VARCHAR DEFAULT 'batch'"),
+    ("system_config", "validation_concurrency", "INTEGER DEFAULT 4"),
+    ("system_config", "qa_mode", "VARCHAR DEFAULT 'crew'"),
+    ("system_config", "pipeline_mode", "VARCHAR DEFAULT 'crew'"),
+    ("validation_jobs", "file_path", "VARCHAR"),
+    ("validation_jobs", "worker_id", "VARCHAR"),
+    ("validation_jobs", "attempts", "INTEGER DEFAULT 0"),
+    ("validation_jobs", "claimed_at", "TIMESTAMP"),
+    ("validation_jobs", "heartbeat_at", "TIMESTAMP"),
+    ("validation_jobs", "image_bytes_saved", "INTEGER DEFAULT 0"),
+    ("validation_jobs", "stage_metrics", "JSON"),
+    ("agent_logs", "job_id", "INTEGER REFERENCES validation_jobs(id) ON DELETE SET NULL"),
+    ("agent_logs", "validation_id", "INTEGER REFERENCES validations(id) ON DELETE SET NULL"),
+    ("providers", "latest_validation_id", "INTEGER"),
+    ("validations", "job_id", "INTEGER REFERENCES validation_jobs(id) ON DELETE SET NULL"),
+]
+
+# (index name, table, columns) - created with IF NOT EXISTS
+INDEX_MIGRATIONS = [
+    ("ix_validation_jobs_status", "validation_jobs", "status"),
+    ("ix_agent_logs_job_id_id", "agent_logs", "job_id, id"),
+    ("ix_agent_logs_validation_id_id", "agent_logs", "validation_id, id"),
+    ("ix_agent_logs_timestamp", "agent_logs", "timestamp"),
+    ("ix_providers_last_updated_id", "providers", "last_updated, id"),
+    ("ix_validations_provider_id", "validations", "provider_id"),
+    ("ix_providers_status_last_updated_id", "providers", "status, last_updated, id"),
+    ("ix_providers_specialty_last_updated_id", "providers", "specialty, last_updated, id"),
+    ("ix_providers_confidence_score", "providers", "confidence_score"),
+    ("ix_validations_job_id", "validations", "job_id"),
+]
+
+# (description, statement) - idempotent data backfills, run after the schema changes
+DATA_MIGRATIONS = [
+    # Keyset pagination orders by last_updated, which must not be NULL
+    ("providers.last_updated backfill", "UPDATE providers SET last_updated = CURRENT_TIMESTAMP WHERE last_updated IS NULL"),
+    ("providers.latest_validation_id backfill", """
+        UPDATE providers SET latest_validation_id = (
+            SELECT v.id FROM validations v
+            WHERE v.provider_id = providers.id
+            ORDER BY v.timestamp DESC, v.id DESC
+            LIMIT 1
+        )
+        WHERE latest_validation_id IS NULL
+    """),
+]
+
+def add_column(conn, table: str, column: str, ddl: str):
+    try:
+        print(f"Adding {column} column to {table}...")
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+        conn.commit()
+        print(f"Migration successful: Added {column} column.")
+    except Exception as e:
+        conn.rollback()
+        if "duplicate column" in str(e) or "already exists" in str(e):
+            print("Column already exists. Skipping.")
+        else:
+            print(f"Migration failed: {e}")
+
+def add_index(conn, name: str, table: str, columns: str):
+    try:
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"))
+        conn.commit()
+        print(f"Index ready: {name}")
+    except Exception as e:
+        conn.rollback()
+        print(f"Index {name} failed: {e}")
+
+def run_data_migration(conn, description: str, statement: str):
+    try:
+        result = conn.execute(text(statement))
+        conn.commit()
+        print(f"Data migration done: {description} ({result.rowcount} rows)")
+    except Exception as e:
+        conn.rollback()
+        print(f"Data migration {description} failed: {e}")
+
 def migrate():
     engine = create_engine(SQLALCHEMY_DATABASE_URL)
     with engine.connect() as conn:
-        try:
-            print("Adding extraction_mode column to system_config...")
-            conn.execute(text("ALTER TABLE system_config ADD COLUMN extraction_mode VARCHAR DEFAULT 'batch'"))
-            conn.commit()
-            print("Migration successful: Added extraction_mode column.")
-        except Exception as e:
-            if "duplicate column" in str(e):
-                print("Column already exists. Skipping.")
-            else:
-                print(f"Migration failed: {e}")
+        for table, column, ddl in COLUMN_MIGRATIONS:
+            add_column(conn, table, column, ddl)
+        for name, table, columns in INDEX_MIGRATIONS:
+            add_index(conn, name, table, columns)
+        for description, statement in DATA_MIGRATIONS:
+            run_data_migration(conn, description, statement)
+    # Name search index for the dialect (FTS5 tables / pg_trgm GIN index)
+    from app.provider_search import ensure_search_index
+    print(f"Provider search backend: {ensure_search_index(engine)}")
 
 if __name__ == "__main__":
     migrate()
@@ -1,5 +1,6 @@
 from app.database import SessionLocal, engine, Base
 from app.models import Provider, Validation, SystemConfig
+from app.provider_stats import rebuild_provider_stats
 from datetime import datetime
 
 # Initialize DB
@@ -85,7 +86,11 @@ def seed():
             timestamp=datetime.utcnow()
         )
         db.add(validation)
+        db.flush()
+        provider.latest_validation_id = validation.id
 
+    # Dashboard counters
+    rebuild_provider_stats(db)
     db.commit()
     print("Seeding complete.")
 
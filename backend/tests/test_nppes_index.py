@@ -0,0 +1,104 @@
+"""Offline NPPES index: build, lookup and weekly delta against a synthetic dissemination file."""
+
+import csv
+
+import pytest
+
+from app.tools.nppes_index import NPPESIndex, apply_delta, build_index
+
+COLUMNS = [
+    "NPI", "Entity Type Code", "Provider Organization Name (Legal Business Name)",
+    "Provider Last Name (Legal Name)", "Provider First Name", "Provider Credential Text",
+    "Provider First Line Business Practice Location Address",
+    "Provider Business Practice Location Address City Name",
+    "Provider Business Practice Location Address State Name",
+    "Provider Business Practice Location Address Postal Code",
+    "NPI Deactivation Date", "NPI Reactivation Date",
+    "Healthcare Provider Taxonomy Code_1", "Provider License Number_1",
+    "Provider License Number State Code_1", "Healthcare Provider Primary Taxonomy Switch_1",
+]
+
+
+def provider_row(npi, first, last, deactivated="", reactivated=""):
+    return {
+        "NPI": npi, "Entity Type Code": "1", "Provider Last Name (Legal Name)": last,
+        "Provider First Name": first, "Provider Credential Text": "MD",
+        "Provider First Line Business Practice Location Address": "1 Main St",
+        "Provider Business Practice Location Address City Name": "Boston",
+        "Provider Business Practice Location Address State Name": "MA",
+        "Provider Business Practice Location Address Postal Code": "02118",
+        "NPI Deactivation Date": deactivated, "NPI Reactivation Date": reactivated,
+        "Healthcare Provider Taxonomy Code_1": "207RC0000X", "Provider License Number_1": "12345",
+        "Provider License Number State Code_1": "MA", "Healthcare Provider Primary Taxonomy Switch_1": "Y",
+    }
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS, restval="")
+        writer.writeheader()
+        writer.writerows(rows)
+    return str(path)
+
+
+@pytest.fixture
+def index_dir(tmp_path):
+    full = write_csv(tmp_path / "npidata_pfile.csv", [
+        provider_row("1003000126", "Ada", "Lovelace"),
+        provider_row("1003000134", "Alan", "Turing"),
+        provider_row("1003000142", "Grace", "Hopper", deactivated="01/01/2020"),
+        provider_row("1003000159", "Edsger", "Dijkstra"),
+    ])
+    directory = str(tmp_path / "index")
+    assert build_index(full, directory) == 3
+    return directory
+
+
+def lookup(index_dir, npi):
+    index = NPPESIndex(index_dir)
+    try:
+        return index.lookup(npi)
+    finally:
+        index.close()
+
+
+def test_lookup_hits(index_dir):
+    record = lookup(index_dir, "1003000134")
+    assert record["npi_number"] == "1003000134"
+    assert record["provider_name"] == "Alan Turing MD"
+    assert record["license"] == "MA-12345"
+    assert record["address"] == "1 Main St, Boston, MA, 02118"
+    assert record["registry_found"] is True
+    # First and last entries of the sorted index
+    assert lookup(index_dir, "1003000126")["provider_name"] == "Ada Lovelace MD"
+    assert lookup(index_dir, "1003000159")["provider_name"] == "Edsger Dijkstra MD"
+
+
+@pytest.mark.parametrize("npi", ["1003000100", "1003000135", "9999999999", "not-an-npi", ""])
+def test_lookup_misses(index_dir, npi):
+    assert lookup(index_dir, npi) is None
+
+
+def test_deactivated_npi_is_not_indexed(index_dir):
+    assert lookup(index_dir, "1003000142") is None
+
+
+def test_apply_delta(index_dir, tmp_path):
+    delta = write_csv(tmp_path / "npidata_pfile_weekly.csv", [
+        provider_row("1003000134", "Alan", "Turing-Updated"),  # changed
+        provider_row("1003000159", "Edsger", "Dijkstra", deactivated="02/02/2024"),  # deactivated
+        provider_row("1003000142", "Grace", "Hopper", deactivated="01/01/2020", reactivated="03/03/2024"),
+        provider_row("1003000167", "Barbara", "Liskov"),  # new
+    ])
+    assert apply_delta(delta, index_dir) == (3, 1)
+
+    assert lookup(index_dir, "1003000134")["provider_name"] == "Alan Turing-Updated MD"
+    assert lookup(index_dir, "1003000159") is None
+    assert lookup(index_dir, "1003000142")["provider_name"] == "Grace Hopper MD"
+    assert lookup(index_dir, "1003000167")["provider_name"] == "Barbara Liskov MD"
+    assert lookup(index_dir, "1003000126")["provider_name"] == "Ada Lovelace MD"
+    index = NPPESIndex(index_dir)
+    try:
+        assert [npi for npi, _, _ in index.entries()] == [1003000126, 1003000134, 1003000142, 1003000167]
+    finally:
+        index.close()
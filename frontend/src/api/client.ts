@@ -3,6 +3,9 @@ import type { Provider, ValidationReport, AgentLog, DashboardStats } from '../ty
 
 const API_BASE_URL = `http://${window.location.hostname}:8001/api`;
 
+// Server-Sent Events stream of agent logs and job progress (see hooks/useEventStream)
+export const EVENTS_URL = `${API_BASE_URL}/events`;
+
 export const api = axios.create({
     baseURL: API_BASE_URL,
     headers: {
@@ -15,9 +18,27 @@ export const fetchStats = async (): Promise<DashboardStats> => {
     return response.data;
 };
 
-export const fetchProviders = async (): Promise<Provider[]> => {
-    const response = await api.get('/providers');
-    return response.data;
+export interface ProviderPage {
+    items: Provider[];
+    nextCursor: string | null;
+}
+
+// Keyset-paginated: pass the previous page's nextCursor to continue.
+// With `q`, the server-side search matches name word prefixes or an NPI prefix.
+export const fetchProvidersPage = async (cursor?: string | null, limit = 100, status?: string, q?: string): Promise<ProviderPage> => {
+    const response = await api.get(q ? '/providers/search' : '/providers', {
+        params: {
+            limit,
+            cursor: cursor || undefined,
+            status: status && status !== 'All' ? status : undefined,
+            q: q || undefined,
+        },
+    });
+    return { items: response.data, nextCursor: response.headers['x-next-cursor'] ?? null };
+};
+
+export const fetchProviders = async (limit = 100): Promise<Provider[]> => {
+    return (await fetchProvidersPage(null, limit)).items;
 };
 
 export const fetchLogs = async (): Promise<AgentLog[]> => {
@@ -68,6 +89,14 @@ export const clearRegistry = async (): Promise<void> => {
     await api.delete('/providers');
 };
 
+// Deletes the providers matching the filters (status and/or the job that validated them)
+export const deleteProviders = async (filters: { status?: string; jobId?: number }): Promise<number> => {
+    const response = await api.delete('/providers/bulk', {
+        params: { status: filters.status, job_id: filters.jobId },
+    });
+    return response.data.deleted;
+};
+
 export const fetchConfig = async (): Promise<any> => {
     const response = await api.get('/config');
     return response.data;
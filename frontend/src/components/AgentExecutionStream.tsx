@@ -15,11 +15,11 @@ const AgentExecutionStream = () => {
         queryClient.invalidateQueries({ queryKey: ['agentLogs'] });
     };
 
-    // Poll logs every 2 seconds
+    // Initial load only; new entries are pushed by the event stream (useEventStream)
     const { data: logs } = useQuery({
         queryKey: ['agentLogs'],
         queryFn: fetchLogs,
-        refetchInterval: 2000,
+        staleTime: Infinity,
     });
 
     useEffect(() => {
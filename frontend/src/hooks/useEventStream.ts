@@ -0,0 +1,54 @@
+import { useEffect } from 'react';
+import { useQueryClient } from '@tanstack/react-query';
+import { EVENTS_URL } from '../api/client';
+import type { AgentLog } from '../types';
+
+const MAX_LOGS = 50;
+
+/**
+ * Subscribe to the backend's Server-Sent Events stream and push agent logs and
+ * job progress straight into the react-query cache ('agentLogs', 'activeJob').
+ * EventSource reconnects on its own and resumes from the last event id.
+ */
+export const useEventStream = () => {
+    const queryClient = useQueryClient();
+
+    useEffect(() => {
+        const source = new EventSource(EVENTS_URL);
+
+        // Logs are kept newest-first, like GET /logs
+        const addLogs = (incoming: AgentLog[]) => {
+            queryClient.setQueryData<AgentLog[]>(['agentLogs'], (current = []) => {
+                const seen = new Set(current.map((log) => log.id));
+                const fresh = incoming.filter((log) => !seen.has(log.id)).reverse();
+                return [...fresh, ...current].slice(0, MAX_LOGS);
+            });
+        };
+
+        source.addEventListener('snapshot', (e) => {
+            const { logs, job } = JSON.parse((e as MessageEvent).data);
+            queryClient.setQueryData(['agentLogs'], logs);
+            queryClient.setQueryData(['activeJob'], job);
+        });
+
+        source.addEventListener('log', (e) => {
+            addLogs([JSON.parse((e as MessageEvent).data)]);
+        });
+
+        source.addEventListener('job', (e) => {
+            const job = JSON.parse((e as MessageEvent).data);
+            queryClient.setQueryData(['activeJob'], job);
+            if (!job.active) {
+                // A job just finished: refresh the tables it changed
+                queryClient.invalidateQueries({ queryKey: ['stats'] });
+                queryClient.invalidateQueries({ queryKey: ['providers'] });
+            }
+        });
+
+        source.addEventListener('logs_cleared', () => {
+            queryClient.setQueryData(['agentLogs'], []);
+        });
+
+        return () => source.close();
+    }, [queryClient]);
+};
@@ -1,7 +1,7 @@
 import { ArrowLeft, CheckCircle, AlertTriangle, Shield, Activity } from 'lucide-react';
 import { Link } from 'react-router-dom';
 import { useQuery } from '@tanstack/react-query';
-import { fetchConfig, fetchProviders } from '../api/client';
+import { fetchConfig, fetchStats } from '../api/client';
 
 const ConfidenceExplainer = () => {
     const { data: config } = useQuery({
@@ -9,21 +9,18 @@ const ConfidenceExplainer = () => {
         queryFn: fetchConfig
     });
 
-    const { data: providers } = useQuery({
-        queryKey: ['providers'],
-        queryFn: fetchProviders
+    // Registry-wide counts from the provider_stats counters (not a page of providers)
+    const { data: dashboardStats } = useQuery({
+        queryKey: ['stats'],
+        queryFn: fetchStats
     });
 
     const threshold = config?.confidence_threshold ? Math.round(config.confidence_threshold * 100) : 78;
 
-    const stats = providers ? providers.reduce((acc: any, p: any) => {
-        if (p.confidence_score >= threshold) {
-            acc.validated++;
-        } else {
-            acc.flagged++;
-        }
-        return acc;
-    }, { validated: 0, flagged: 0 }) : { validated: 0, flagged: 0 };
+    const stats = {
+        validated: dashboardStats?.validated ?? 0,
+        flagged: dashboardStats?.action_required ?? 0,
+    };
 
     return (
         <div className="space-y-8 max-w-4xl mx-auto pb-12">
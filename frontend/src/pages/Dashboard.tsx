@@ -2,6 +2,7 @@ import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
 import { Link } from 'react-router-dom';
 import { fetchStats, fetchProviders, uploadFile, fetchActiveJob, cancelJob, deleteProvider, fetchValidationById } from '../api/client';
 import AgentExecutionStream from '../components/AgentExecutionStream';
+import { useEventStream } from '../hooks/useEventStream';
 import ValidationReportPanel from '../components/ValidationReportPanel';
 import { UploadCloud, CheckCircle, AlertCircle, FileText, Activity, StopCircle, Loader2, Trash2, Download } from 'lucide-react';
 import clsx from 'clsx';
@@ -35,15 +36,18 @@ const Dashboard = () => {
     });
 
     const { data: providers } = useQuery({
-        queryKey: ['providers'],
-        queryFn: fetchProviders,
+        queryKey: ['providers', 'recent'],
+        queryFn: () => fetchProviders(5),
         refetchInterval: 5000
     });
 
+    // Live logs and job progress are pushed over Server-Sent Events
+    useEventStream();
+
     const { data: activeJob } = useQuery({
         queryKey: ['activeJob'],
         queryFn: fetchActiveJob,
-        refetchInterval: 2000  // Poll every 2 seconds for real-time progress
+        staleTime: Infinity
     });
 
     const uploadMutation = useMutation({
@@ -1,17 +1,12 @@
-import { useState } from 'react';
+import { useEffect, useState } from 'react';
 import { useSearchParams } from 'react-router-dom';
-import { useQuery, useQueryClient } from '@tanstack/react-query';
-import { fetchProviders, deleteProvider, clearRegistry, fetchValidationById } from '../api/client';
+import { useInfiniteQuery, useQueryClient } from '@tanstack/react-query';
+import { fetchProvidersPage, deleteProvider, deleteProviders, clearRegistry, fetchValidationById } from '../api/client';
 import { Search, Filter, AlertTriangle, CheckCircle, Trash2, ChevronDown, Download } from 'lucide-react';
 import clsx from 'clsx';
 import ValidationReportPanel from '../components/ValidationReportPanel';
 
 const Registry = () => {
-    const { data: providers } = useQuery({
-        queryKey: ['providers'],
-        queryFn: fetchProviders
-    });
-
     const [search, setSearch] = useState('');
     const [selectedValidationId, setSelectedValidationId] = useState<number | null>(null);
     const queryClient = useQueryClient();
@@ -20,6 +15,22 @@ const Registry = () => {
     // Get status from URL or default to 'All'
     const statusFilter = searchParams.get('status') || 'All';
 
+    // Search runs on the server (indexed), once typing pauses
+    const [debouncedSearch, setDebouncedSearch] = useState('');
+    useEffect(() => {
+        const timer = setTimeout(() => setDebouncedSearch(search.trim()), 300);
+        return () => clearTimeout(timer);
+    }, [search]);
+
+    // Pages of 100, newest first; search and status filter are applied by the API
+    const { data, fetchNextPage, hasNextPage, isFetchingNextPage } = useInfiniteQuery({
+        queryKey: ['providers', 'registry', statusFilter, debouncedSearch],
+        queryFn: ({ pageParam }) => fetchProvidersPage(pageParam, 100, statusFilter, debouncedSearch),
+        initialPageParam: null as string | null,
+        getNextPageParam: (lastPage) => lastPage.nextCursor,
+    });
+    const providers = data?.pages.flatMap((page) => page.items);
+
     const handleDelete = async (id: number) => {
         if (confirm('Are you sure you want to delete this provider?')) {
             await deleteProvider(id);
@@ -29,6 +40,14 @@ const Registry = () => {
     };
 
     const handleClearAll = async () => {
+        // With a status filter selected, only the providers shown by it are deleted
+        if (statusFilter !== 'All') {
+            if (!confirm(`Are you sure you want to delete all ${statusFilter} providers? This cannot be undone.`)) return;
+            await deleteProviders({ status: statusFilter });
+            queryClient.invalidateQueries({ queryKey: ['providers'] });
+            queryClient.invalidateQueries({ queryKey: ['stats'] });
+            return;
+        }
         if (confirm('Are you sure you want to delete ALL providers? This cannot be undone.')) {
             await clearRegistry();
             queryClient.invalidateQueries({ queryKey: ['providers'] });
@@ -36,14 +55,7 @@ const Registry = () => {
         }
     };
 
-    // Registry.tsx imports: `import { useState } from 'react';` `import { useQuery } from '@tanstack/react-query';`
-    // I need to add `useQueryClient` to imports.
-
-    const filteredProviders = providers?.filter(p => {
-        const matchesSearch = p.full_name.toLowerCase().includes(search.toLowerCase()) || p.npi.includes(search);
-        const matchesStatus = statusFilter === 'All' || p.status === statusFilter;
-        return matchesSearch && matchesStatus;
-    });
+    const filteredProviders = providers;
 
     return (
         <div className="space-y-6">
@@ -57,7 +69,7 @@ const Registry = () => {
                     <Search className="absolute left-3 top-2.5 w-5 h-5 text-gray-500" />
                     <input
                         type="text"
-                        placeholder="Search by Name, NPI, or File..."
+                        placeholder="Search by Name or NPI..."
                         className="w-full bg-[#0D1117] border border-gray-700 rounded-lg py-2 pl-10 pr-4 text-white focus:outline-none focus:border-primary"
                         value={search}
                         onChange={(e) => setSearch(e.target.value)}
@@ -98,7 +110,7 @@ const Registry = () => {
                     className="flex items-center gap-2 px-4 py-2 bg-red-900/20 border border-red-900/50 text-red-400 rounded-lg text-sm font-medium hover:bg-red-900/40 transition-colors"
                 >
                     <Trash2 className="w-4 h-4" />
-                    Clear Registry
+                    {statusFilter === 'All' ? 'Clear Registry' : `Delete ${statusFilter}`}
                 </button>
             </div>
 
@@ -182,6 +194,17 @@ const Registry = () => {
                         ))}
                     </tbody>
                 </table>
+                {hasNextPage && (
+                    <div className="p-4 border-t border-gray-800 flex justify-center">
+                        <button
+                            onClick={() => fetchNextPage()}
+                            disabled={isFetchingNextPage}
+                            className="px-4 py-2 text-sm text-gray-300 bg-gray-800 hover:bg-gray-700 rounded-lg disabled:opacity-50"
+                        >
+                            {isFetchingNextPage ? 'Loading...' : 'Load more'}
+                        </button>
+                    </div>
+                )}
             </div>
 
             {/* Validation Report Slide-out */}
@@ -28,6 +28,8 @@ export interface AgentLog {
   message: string;
   level: 'INFO' | 'WARN' | 'ERROR' | 'SUCCESS';
   timestamp: string;
+  job_id?: number | null;
+  validation_id?: number | null;
 }
 
 export interface DashboardStats {